@@ -1 +1,49 @@
-from .apifacade import ApiFacade
+import importlib
+
+# the public classes are imported from their modules on first access, so "import radiobrowserpy" stays cheap and e.g.
+# requests or aiohttp are only loaded by code which uses them
+_EXPORTS = {
+    'ApiFacade': 'apifacade',
+    'AsyncApiFacade': 'apifacade',
+    'ResponseCache': 'cache',
+    'ValidatorStore': 'cache',
+    'MemoryCache': 'cache',
+    'DiskCache': 'cache',
+    'StationIndex': 'index',
+    'StationSync': 'sync',
+    'StationTable': 'table',
+    'Snapshot': 'snapshot',
+    'write_snapshot': 'snapshot',
+    'RequestScheduler': 'scheduler',
+    'TokenBucket': 'scheduler',
+    'MirrorPool': 'mirrors',
+    'dns_resolver': 'mirrors',
+    'TransferStats': 'compression',
+    'Instrumentation': 'instrumentation',
+    'MetricsAggregator': 'instrumentation',
+    'Pipeline': 'pipeline',
+    'PagedJob': 'pipeline',
+    'SingleJob': 'pipeline',
+    'PerItemJob': 'pipeline',
+    'JsonlSink': 'pipeline',
+    'CsvSink': 'pipeline',
+    'ColumnarSink': 'pipeline',
+    'StationProber': 'health',
+    'ProbeResult': 'health',
+    'PlayableUrlResolver': 'resolver',
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
@@ -1,57 +1,81 @@
-import sys
-import functools
+from collections import OrderedDict, namedtuple
+from functools import wraps
 
 from .request import *
 from .constants import *
-from builtins import super
-
-if sys.version_info[0:2] >= (3, 4):  # Python v3.4+?
-    wraps = functools.wraps  # built-in has __wrapped__ attribute
-else:
-    def wraps(wrapped, assigned=functools.WRAPPER_ASSIGNMENTS,
-              updated=functools.WRAPPER_UPDATES):
-        def wrapper(f):
-            f = functools.wraps(wrapped, assigned, updated)(f)
-            f.__wrapped__ = wrapped  # set attribute missing in earlier versions
-            return f
-
-        return wrapper
 
 
 class RequestDecorator:
     def __init__(self, endpoint, nested=False):
         self.endpoint = endpoint
         self.nested = nested
+        self.static = '{}' not in endpoint
+        # url templates per api url, i.e. per output format of the api
+        self._templates = {}
 
     def __call__(self, f):
         @wraps(f)
         def make_request(innerself, *args, **kwargs):
-            url, selector, params = f(innerself, *args, **kwargs)
-            if isinstance(selector, list):
-                filter_endpoint = self.endpoint.format(*selector)
-            else:
-                filter_endpoint = self.endpoint.format(selector)
-            url += filter_endpoint
+            stream = kwargs.pop('stream', False)
+            encoding = kwargs.pop('encoding', innerself.encoding)
+            url, selector, params = self.build(f, innerself, *args, **kwargs)
             if self.nested:
                 return url, selector, params
-            return innerself.radiorequest(url, outputformat=innerself.output_format, encoding=innerself.encoding,
-                                          params=params)
+            return innerself.radiorequest(url, outputformat=innerself.output_format, encoding=encoding,
+                                          params=params, endpoint=f.__name__, family=innerself.family, stream=stream)
+
+        def build(innerself, *args, **kwargs):
+            return self.build(f, innerself, *args, **kwargs)
 
+        make_request.build = build
+        make_request.endpoint = self.endpoint
         return make_request
 
+    def build(self, f, innerself, *args, **kwargs):
+        """
+        Builds the request of an api method without sending it.
+
+        :return: tuple of url, selector and params of the request
+        """
+        # per-call options of make_request, they are no arguments of the api method
+        kwargs.pop('stream', None)
+        kwargs.pop('encoding', None)
+        url, selector, params = f(innerself, *args, **kwargs)
+        template = self._templates.get(url)
+        if template is None:
+            template = self._compile(url)
+        if self.static:
+            return template, selector, params
+        if isinstance(selector, list):
+            return template.format(*selector), selector, params
+        return template.format(selector), selector, params
+
+    def _compile(self, url):
+        if self.static:
+            template = url + self.endpoint
+        else:
+            template = url.replace('{', '{{').replace('}', '}}') + self.endpoint
+        self._templates[url] = template
+        return template
+
 
 class Format(object):
     formats = ['json', 'xml']
+    family = None
 
-    def __init__(self, output_format, encoding, app_name, app_version):
+    def __init__(self, output_format, encoding, app_name, app_version, radiorequest=None):
         """
         Inits Api class
 
         :param str output_format: response format of the webservice
         :param bool encoding: if True, the Api encodes the response in the given output format if supported
+        :param RadioBrowserRequest radiorequest: request object used for all calls, e.g. to share one connection pool
+            between several api instances. A new one is created if not set
         """
         self.encoding = encoding
-        self.radiorequest = RadioBrowserRequest(app_name, app_version)
+        if radiorequest is None:
+            radiorequest = RadioBrowserRequest(app_name, app_version)
+        self.radiorequest = radiorequest
         self.output_format = output_format
 
     def __call__(self, encoding, params, endpoint, outputformat=None):
@@ -100,8 +124,8 @@ class PlayFormat(Format):
 
     formats = ['json', 'xml', 'm3u', 'pls']
 
-    def __init__(self, output_format, encoding, app_name, app_version):
-        super().__init__(output_format, encoding, app_name, app_version)
+    def __init__(self, output_format, encoding, app_name, app_version, radiorequest=None):
+        super().__init__(output_format, encoding, app_name, app_version, radiorequest)
 
 
 class SearchFormat(PlayFormat):
@@ -110,11 +134,13 @@ class SearchFormat(PlayFormat):
 
     formats = ['json', 'xml', 'm3u', 'pls', 'xspf', 'ttl']
 
-    def __init__(self, output_format, encoding, app_name, app_version):
-        super().__init__(output_format, encoding, app_name, app_version)
+    def __init__(self, output_format, encoding, app_name, app_version, radiorequest=None):
+        super().__init__(output_format, encoding, app_name, app_version, radiorequest)
 
 
 class RadioApi(Format):
+    family = 'radio'
+
     def _update_api_url(self):
         self.api_url = BASEURL + self.output_format + '/'
 
@@ -126,9 +152,9 @@ class RadioApi(Format):
                '\t:return: list of all {} in the database\n' \
                ''
 
-    def __init__(self, output_format, encoding, app_name, app_version):
+    def __init__(self, output_format, encoding, app_name, app_version, radiorequest=None):
         self.api_url = BASEURL + output_format + '/'
-        super().__init__(output_format, encoding, app_name, app_version)
+        super().__init__(output_format, encoding, app_name, app_version, radiorequest)
 
     @RequestDecorator('countries/{}')
     def countries(self, selector='', order='value', reverse=False, hidebroken=False):
@@ -315,13 +341,15 @@ class RadioApi(Format):
     list_funcs = [countries, codecs, languages, tags]
     for func in list_funcs:
         func.__doc__ = base_doc.format(func.__name__, func.__name__)
+    del func
 
 
 class PlayRadioApi(PlayFormat):
+    family = 'play'
 
-    def __init__(self, output_format, encoding, app_name, app_version):
+    def __init__(self, output_format, encoding, app_name, app_version, radiorequest=None):
         self.api_url = BASEURL + 'v2/' + output_format + '/'
-        super().__init__(output_format, encoding, app_name, app_version)
+        super().__init__(output_format, encoding, app_name, app_version, radiorequest)
 
     def _update_api_url(self):
         self.api_url = BASEURL + 'v2/' + self.output_format + '/'
@@ -339,6 +367,8 @@ class PlayRadioApi(PlayFormat):
 
 
 class SearchRadioApi(SearchFormat):
+    family = 'search'
+
     base_doc = '\n\tWill get a list of radio stations that match the search. The variants with "exact" will only search ' \
                '\n' \
                '\tfor perfect matches. The others will match if the station attribute contains the searchterm. Please ' \
@@ -355,9 +385,9 @@ class SearchRadioApi(SearchFormat):
                '\t:param int limit: number of returned datarows (stations) starting with offset\n' \
                '\t:return list of search results from the webservice\n'
 
-    def __init__(self, output_format, encoding, app_name, app_version):
+    def __init__(self, output_format, encoding, app_name, app_version, radiorequest=None):
         self.api_url = BASEURL + output_format + '/stations/'
-        super().__init__(output_format, encoding, app_name, app_version)
+        super().__init__(output_format, encoding, app_name, app_version, radiorequest)
 
     def _update_api_url(self):
         self.api_url = BASEURL + self.output_format + '/stations/'
@@ -549,3 +579,28 @@ class SearchRadioApi(SearchFormat):
                       stations_bystate, stations_bystateexact, stations_bytag, stations_bytagexact]
     for func in __search_funcs:
         func.__doc__ = base_doc
+    del func
+
+
+Endpoint = namedtuple('Endpoint', ['name', 'path', 'api', 'family', 'formats'])
+
+
+def endpoint_registry(*api_classes):
+    """
+    Collects the api methods of the given classes. If several classes have a method with the same name, the first
+    class wins.
+
+    :return: OrderedDict mapping method names to Endpoint tuples of the name, the path template, the api class, the
+        endpoint family and the supported output formats
+    """
+    registry = OrderedDict()
+    for api_class in api_classes:
+        for name, func in sorted(vars(api_class).items()):
+            path = getattr(func, 'endpoint', None)
+            # only the methods under their own name, not e.g. aliases left over in the class body
+            if path is not None and name == func.__name__ and name not in registry:
+                registry[name] = Endpoint(name, path, api_class, api_class.family, tuple(api_class.formats))
+    return registry
+
+
+ENDPOINTS = endpoint_registry(RadioApi, PlayRadioApi, SearchRadioApi)
@@ -1,9 +1,21 @@
-from .api import RadioApi, PlayRadioApi, SearchRadioApi
+import threading
+from urllib.parse import urlsplit
+
+from .api import ENDPOINTS, RadioApi, PlayRadioApi, SearchRadioApi
+from .request import RadioBrowserRequest
+from .pagination import paginate, apaginate
+from .constants import BASEURL
 
 
 class ApiFacade:
+    request_class = RadioBrowserRequest
+    paginator = staticmethod(paginate)
+    pagination_options = ('page_size', 'prefetch', 'retries', 'offset', 'limit')
+
     def __init__(self, output_format='json', playable_format='json',
-                 search_format='json', encoding=False, appname='radiobrowserpy', appversion='0.0.1'):
+                 search_format='json', encoding=False, appname='radiobrowserpy', appversion='0.0.1', pool_size=10,
+                 keep_alive=True, headers=None, timeout=None, cache=None, conditional=False, scheduler=None,
+                 mirrors=None, coalesce=False, json_backend='auto', instrumentation=None):
         """
         Creates a new ApiFacade instance for making requests to Radio-browser.info webservice. The responses are json
         strings by default.
@@ -29,28 +41,95 @@ class ApiFacade:
         api responses
         :param search_format in ['json', 'xml', 'm3u', 'pls', 'ttl', 'xspf']: output format for search requests.
         :param encoding: if True and output format is supported, the returned api response becomes encoded
-            in related python objects
+            in related python objects: lists of dicts for json and the playlist formats m3u, pls, xspf and ttl, an
+            element for xml. 'table' encodes station lists in a compact columnar StationTable
         :param appname name of your application (will be send in the header of each http request).
         :param appversion version of your application (will be send in the header of each http request)
+        :param pool_size: maximum number of pooled connections kept open to the webservice. All api methods of the
+            facade share this pool.
+        :param keep_alive: if False, connections are closed after every request instead of being reused
+        :param headers: dict of additional headers sent with every request
+        :param timeout: default timeout in seconds for every request, either a float or a (connect, read) tuple
+        :param cache: a ResponseCache for the responses of read-only endpoints like countries or tags. True uses an
+            in-memory cache with the default time to live per endpoint
+        :param conditional: if True, repeated requests send the ETag and Last-Modified validators of the last response
+            and an unchanged response is served from memory without downloading and parsing it again. A ValidatorStore
+            can be given instead to configure the storage
+        :param scheduler: a RequestScheduler which rate limits all requests per endpoint family, bounds their
+            concurrency and retries transient failures with backoff
+        :param mirrors: mirrors of the webservice to route requests to, either a list of base urls, a function
+            returning such a list (e.g. mirrors.dns_resolver) or a MirrorPool. Every request goes to the fastest
+            healthy mirror and fails over to the next one
+        :param coalesce: if True, identical calls running at the same time (e.g. from many threads) share one request
+            to the webservice and its result. The callers get the same python object, so it must not be modified.
+            Calls of endpoints with side effects (votes, clicks, station edits) are never coalesced
+        :param json_backend: library decoding json responses. 'auto' uses the fastest installed one of orjson, ujson
+            and the stdlib json, a name forces this library, a function taking the response bytes is used as is
+        :param instrumentation: an Instrumentation whose hooks are called before and after every request with the
+            endpoint, url, params, status, bytes and timings. True aggregates counters and latency histograms per
+            endpoint in a MetricsAggregator, see the metrics attribute
 
         Example:
             from radiobrowserlib import ApiFacade
             facade = ApiFacade()
             facade.countries() -> returns a list of available countries in the database as a string
 
+            # decode a single response regardless of the encoding setting of the facade
+            facade.countries(encoding=True)
+
+            # stream a large result, one decoded station at a time
+            for station in ApiFacade(encoding=True).stations(stream=True):
+                ...
+
+            # latency per endpoint in the prometheus text format
+            facade = ApiFacade(instrumentation=True)
+            facade.countries()
+            facade.metrics.to_prometheus()
+
             # arbitrary request
             facade(encoding=True, params=None, endpoint='countries', output_format='json') -> returns a list of all
                 countries as a python list
 
         """
-        self._radio_api = RadioApi(output_format, encoding, appname, appversion)
-        self._play_api = PlayRadioApi(playable_format, encoding, appname, appversion)
-        self._search_api = SearchRadioApi(search_format, encoding, appname, appversion)
+        # optional features are imported only when they are used
+        if cache is True:
+            from .cache import ResponseCache
+            cache = ResponseCache()
+        if conditional is True:
+            from .cache import ValidatorStore
+            conditional = ValidatorStore()
+        if mirrors is not None:
+            from .mirrors import MirrorPool
+            if callable(mirrors):
+                mirrors = MirrorPool(resolver=mirrors)
+            elif not isinstance(mirrors, MirrorPool):
+                mirrors = MirrorPool(mirrors)
+        if instrumentation is True:
+            from .instrumentation import Instrumentation, MetricsAggregator
+            instrumentation = Instrumentation(aggregator=MetricsAggregator())
+        request_class = self._get_request_class()
+        self._radiorequest = request_class(appname, appversion, pool_maxsize=pool_size, keep_alive=keep_alive,
+                                           headers=headers, timeout=timeout, cache=cache,
+                                           validators=conditional or None, scheduler=scheduler, mirrors=mirrors,
+                                           coalesce=coalesce, json_backend=json_backend,
+                                           instrumentation=instrumentation)
+        self._radio_api = RadioApi(output_format, encoding, appname, appversion, self._radiorequest)
+        self._play_api = PlayRadioApi(playable_format, encoding, appname, appversion, self._radiorequest)
+        self._search_api = SearchRadioApi(search_format, encoding, appname, appversion, self._radiorequest)
         self.__api_list = [self._radio_api, self._play_api, self._search_api]
         self.__all_api_funcs = []
         self.__init_api_funcs()
 
+    @property
+    def endpoints(self):
+        """
+        :return: the registry of all api methods, an OrderedDict mapping their names to Endpoint tuples with the path
+            template, api class, endpoint family and supported output formats
+        """
+        return ENDPOINTS
+
     def __getattr__(self, item):
+        # api methods are bound to the instance by __init_api_funcs, only other attributes of the apis end up here
         for api in self.__api_list:
             if hasattr(api, item):
                 return getattr(api, item)
@@ -60,6 +139,118 @@ class ApiFacade:
             msg += '\t' + alt + '\n'
         raise AttributeError(msg[:-1])
 
+    @classmethod
+    def _get_request_class(cls):
+        return cls.request_class
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes all pooled connections to the webservice.
+        """
+        self._radiorequest.close()
+
+    @property
+    def transfer_stats(self):
+        """
+        :return: TransferStats with the bytes received on the wire and after decompression
+        """
+        return self._radiorequest.transfer_stats
+
+    @property
+    def instrumentation(self):
+        return self._radiorequest.instrumentation
+
+    @property
+    def metrics(self):
+        """
+        :return: the MetricsAggregator of the instrumentation or None
+        """
+        instrumentation = self._radiorequest.instrumentation
+        return None if instrumentation is None else instrumentation.aggregator
+
+    def batch(self, calls, max_workers=8, per_host=None):
+        """
+        Runs many api calls concurrently on a bounded thread pool.
+
+        Each call is either the name of an api method or a tuple (name, args) or (name, args, kwargs), where args is a
+        list or tuple of positional arguments and kwargs a dict of keyword arguments. The results are returned in the
+        order of the calls. A call which raised an exception has the exception instance as its result, so one failing
+        lookup does not abort the whole batch.
+
+        The connection pool of the facade (pool_size) should be at least as large as max_workers, otherwise additional
+        connections are opened and closed for every call.
+
+        :param calls: iterable of api calls
+        :param int max_workers: maximum number of calls running at the same time
+        :param int per_host: if set, maximum number of calls running at the same time against one host. The host is the
+            one of the url the call is built for. With mirrors, the mirror is only chosen when the request is sent, so
+            per_host then limits all calls of the batch together, whichever mirrors they reach
+        :return: list of results or exceptions, one per call
+
+        Example:
+            facade.batch([('stations_byuuid', [uuid]) for uuid in uuids] + ['countries'], max_workers=16)
+        """
+        calls = [self._parse_call(call) for call in calls]
+        host_limits = {}
+        host_lock = threading.Lock()
+
+        def run(call):
+            func, args, kwargs = call
+            try:
+                if per_host is None:
+                    return func(*args, **kwargs)
+                host = self._host_of(func, args, kwargs)
+                with host_lock:
+                    limit = host_limits.setdefault(host, threading.BoundedSemaphore(per_host))
+                with limit:
+                    return func(*args, **kwargs)
+            except Exception as e:
+                return e
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run, calls))
+
+    def paginate(self, method, *args, **kwargs):
+        """
+        Iterates lazily over all results of an api method with offset and limit parameters, e.g. 'stations', 'search'
+        or one of the 'stations_by...' methods. The results are requested page by page, the next pages are prefetched
+        in the background while the current one is consumed. Results are always decoded, dicts for json and elements
+        for xml.
+
+        :param str method: name of the api method
+        :param args: positional arguments of the api method
+        :param kwargs: keyword arguments of the api method and the pagination options page_size (default 500),
+            prefetch (number of pages requested ahead, default 2), retries (retries of a failing page, default 2),
+            offset (index of the first result, default 0) and limit (maximum number of results, default all)
+        :return: iterator of the results
+
+        Example:
+            for station in facade.paginate('stations_bytag', 'jazz', page_size=200):
+                ...
+        """
+        options = dict((key, kwargs.pop(key)) for key in self.pagination_options if key in kwargs)
+        return self.paginator(getattr(self, method), args, kwargs, **options)
+
+    def iter_stations(self, **kwargs):
+        """
+        Iterates lazily over all stations, see paginate for the keyword arguments.
+        """
+        return self.paginate('stations', **kwargs)
+
+    def iter_search(self, **kwargs):
+        """
+        Iterates lazily over all search results, see paginate for the keyword arguments.
+        """
+        return self.paginate('search', **kwargs)
+
     def set_output_format(self, value):
         """
         Sets the output format for basic api requests
@@ -99,10 +290,28 @@ class ApiFacade:
             print(func.__doc__ + '\n\n')
 
     def __init_api_funcs(self):
+        apis = {RadioApi: self._radio_api, PlayRadioApi: self._play_api, SearchRadioApi: self._search_api}
         del self.__all_api_funcs[:]
-        for api in self.__api_list:
-            self.__all_api_funcs.extend([getattr(api, func) for func in dir(api)
-                                         if callable(getattr(api, func)) and not func.startswith("_")])
+        for name, endpoint in ENDPOINTS.items():
+            func = getattr(apis[endpoint.api], name)
+            self.__all_api_funcs.append(func)
+            if not hasattr(type(self), name):
+                self.__dict__[name] = func
+
+    def _parse_call(self, call):
+        if isinstance(call, str):
+            call = (call,)
+        name = call[0]
+        args = call[1] if len(call) > 1 else ()
+        kwargs = call[2] if len(call) > 2 else {}
+        return getattr(self, name), args, kwargs
+
+    @staticmethod
+    def _host_of(func, args, kwargs):
+        url = BASEURL
+        if hasattr(func, 'build'):
+            url = func.build(func.__self__, *args, **kwargs)[0]
+        return urlsplit(url).netloc
 
     def __search_func(self, value):
         if len(value) == 1:
@@ -110,5 +319,72 @@ class ApiFacade:
         return [func.__name__ for func in self.__all_api_funcs if func.__name__.find(value) != -1]
 
 
+class AsyncApiFacade(ApiFacade):
+    """
+    asyncio variant of ApiFacade. It offers the same api methods with the same parameters, but every method returns
+    an awaitable. All requests run on one shared aiohttp connection pool, so many lookups can run concurrently on a
+    single event loop. Requires aiohttp.
+
+    Example:
+        async with AsyncApiFacade(encoding=True, pool_size=50) as facade:
+            countries, stations = await asyncio.gather(facade.countries(), facade.stations_bytag('jazz'))
+            async for station in facade.iter_stations(page_size=500):
+                ...
+    """
+    # AsyncRadioBrowserRequest, imported on first use because importing aiohttp is slow
+    request_class = None
+    paginator = staticmethod(apaginate)
+
+    @classmethod
+    def _get_request_class(cls):
+        if cls.request_class is not None:
+            return cls.request_class
+        from .asyncrequest import AsyncRadioBrowserRequest
+        return AsyncRadioBrowserRequest
+
+    def __enter__(self):
+        raise TypeError('AsyncApiFacade has to be used with "async with"')
+
+    async def batch(self, calls, max_workers=8, per_host=None):
+        """
+        Runs many api calls concurrently as tasks of the running event loop. Takes the same arguments and returns the
+        same results as ApiFacade.batch, max_workers bounds the number of calls awaited at the same time.
+
+        Example:
+            stations = await facade.batch([('stations_byuuid', [uuid]) for uuid in uuids], max_workers=32)
+        """
+        import asyncio
+
+        calls = [self._parse_call(call) for call in calls]
+        limit = asyncio.Semaphore(max_workers)
+        host_limits = {}
+
+        async def run(call):
+            func, args, kwargs = call
+            try:
+                async with limit:
+                    if per_host is None:
+                        return await func(*args, **kwargs)
+                    host = self._host_of(func, args, kwargs)
+                    async with host_limits.setdefault(host, asyncio.Semaphore(per_host)):
+                        return await func(*args, **kwargs)
+            except Exception as e:
+                return e
+
+        return await asyncio.gather(*[run(call) for call in calls])
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes all pooled connections to the webservice.
+        """
+        await self._radiorequest.close()
+
+
 if __name__ == '__main__':
     facade = ApiFacade()
@@ -0,0 +1,334 @@
+import asyncio
+import codecs
+import time
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from .compression import Decompressor, TransferStats, accept_encoding
+from .constants import MUTATING_ENDPOINTS
+from .jsonbackend import load_backend
+from .request import BaseRequest, BufferedResponse, coalesced, normalize_params, request_key
+from .singleflight import AsyncSingleFlight
+from .streaming import STREAM_CHUNK_SIZE
+
+TRANSIENT_ERRORS = (asyncio.TimeoutError,) if aiohttp is None else (aiohttp.ClientConnectionError,
+                                                                     asyncio.TimeoutError)
+
+# raised before a request was sent, safe to retry for endpoints with side effects. ConnectionTimeoutError exists
+# since aiohttp 3.10
+CONNECT_ERRORS = () if aiohttp is None else (aiohttp.ClientConnectorError,) + tuple(
+    getattr(aiohttp, name) for name in ('ConnectionTimeoutError',) if hasattr(aiohttp, name))
+
+
+class StreamedResponse(object):
+    """
+    aiohttp response whose body was not read yet, with the attributes of a requests response the scheduler and the
+    mirror failover use.
+    """
+
+    def __init__(self, response, latency):
+        """
+        :param aiohttp.ClientResponse response: the response
+        :param float latency: seconds until the response headers arrived
+        """
+        self.response = response
+        self.status_code = response.status
+        self.headers = response.headers
+        self.latency = latency
+
+    def close(self):
+        self.response.close()
+
+
+class AsyncRadioBrowserRequest(BaseRequest):
+
+    def __init__(self, app_name, app_version, pool_maxsize=100, keep_alive=True, headers=None, timeout=None,
+                 cache=None, validators=None, scheduler=None, mirrors=None, coalesce=False, json_backend='auto',
+                 instrumentation=None):
+        """
+        Inits an asyncio request object. Calling it returns a coroutine, so api classes which use it as their
+        radiorequest return awaitables from every endpoint method. All requests share one aiohttp connection pool,
+        which is created on first use inside the running event loop.
+
+        :param str app_name: name of the application, sent in the user-agent header
+        :param str app_version: version of the application, sent in the user-agent header
+        :param int pool_maxsize: maximum number of simultaneously open connections
+        :param bool keep_alive: if False, connections are closed after every request
+        :param dict headers: additional default headers sent with every request
+        :param timeout: default timeout in seconds for every request, either a float or a (connect, read) tuple
+        :param ResponseCache cache: if set, responses of read-only endpoints are served from this cache
+        :param ValidatorStore validators: if set, responses are revalidated with ETag and Last-Modified validators
+        :param RequestScheduler scheduler: if set, all requests are rate limited and retried by this scheduler
+        :param MirrorPool mirrors: if set, requests are sent to the fastest healthy mirror of the pool and fail over to
+            the next mirror
+        :param bool coalesce: if True, concurrent identical requests are sent only once and share the result, see
+            RadioBrowserRequest
+        :param json_backend: library decoding json responses, see RadioBrowserRequest
+        :param Instrumentation instrumentation: if set, its hooks are called with a RequestEvent before and after every
+            request. Unlike with RadioBrowserRequest, the events include dns and connect times
+
+        Like RadioBrowserRequest, responses are requested compressed and the transferred bytes are counted in
+        transfer_stats.
+        """
+        if aiohttp is None:
+            raise ImportError('the asyncio client requires aiohttp: pip install radiobrowserpy[async]')
+        self.header = {'user-agent': app_name + '/' + app_version, 'accept-encoding': accept_encoding()}
+        if headers is not None:
+            self.header.update(headers)
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.cache = cache
+        self.validators = validators
+        self.scheduler = scheduler
+        self.transient_errors = TRANSIENT_ERRORS
+        self.mirrors = mirrors
+        self.singleflight = AsyncSingleFlight() if coalesce else None
+        self.json_backend, self.json_loads = load_backend(json_backend)
+        self.transfer_stats = TransferStats()
+        self.instrumentation = instrumentation
+        self.session = None
+
+    def __call__(self, url, outputformat='json', encoding=False, params=None, timeout=None, endpoint=None,
+                 family=None, stream=False):
+        """
+        Sends a request to the webservice. The arguments are the same as of RadioBrowserRequest.
+
+        :return: a coroutine or, if stream is True, an asynchronous iterator of the decoded elements of the response
+        """
+        if stream:
+            return self._stream(url, self.stream_parser(outputformat, encoding, stream), params, timeout, endpoint,
+                                family)
+        return self._request(url, outputformat, encoding, params, timeout, endpoint, family)
+
+    async def _stream(self, url, parser, params, timeout, endpoint, family):
+        # the download time of a stream includes the time the consumer spends between the items
+        if timeout is None:
+            timeout = self.timeout
+        event = self._start_event(endpoint, family, url, params)
+        event.stream = True
+        error = None
+        start = time.time()
+        try:
+            r = (await self._send(family, url, params, timeout, None, event, endpoint)).response
+            try:
+                r.raise_for_status()
+                start = time.time()
+                if parser is None:
+                    decoder = codecs.getincrementaldecoder(r.charset or 'utf-8')('replace')
+                    async for chunk in self._iter_body(r, event):
+                        yield decoder.decode(chunk)
+                    tail = decoder.decode(b'', True)
+                    if tail:
+                        yield tail
+                    return
+                async for chunk in self._iter_body(r, event):
+                    parse_start = time.time()
+                    items = parser.feed(chunk)
+                    event.add_time('parse', time.time() - parse_start)
+                    for item in items:
+                        yield item
+            finally:
+                r.release()
+            parse_start = time.time()
+            items = parser.close()
+            event.add_time('parse', time.time() - parse_start)
+            for item in items:
+                yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if event.timings['ttfb'] is not None:
+                event.timings['download'] = time.time() - start - (event.timings['parse'] or 0.0)
+            self._finish_event(event, error)
+
+    async def _request(self, url, outputformat, encoding, params, timeout, endpoint, family):
+        if timeout is None:
+            timeout = self.timeout
+        event = self._start_event(endpoint, family, url, params)
+        try:
+            if self.singleflight is None or endpoint in MUTATING_ENDPOINTS:
+                result = await self._fetch(url, outputformat, encoding, params, timeout, endpoint, family, event)
+            else:
+                async def fetch():
+                    return await self._fetch(url, outputformat, encoding, params, timeout, endpoint, family,
+                                             event), event
+
+                result, leader = await self.singleflight.do((request_key(url, params), outputformat, encoding),
+                                                            fetch)
+                coalesced(event, leader)
+        except Exception as e:
+            self._finish_event(event, e)
+            raise
+        self._finish_event(event)
+        return result
+
+    async def _fetch(self, url, outputformat, encoding, params, timeout, endpoint, family, event):
+        response, stored, headers = self._lookup(endpoint, url, params)
+        if response is None:
+            response = await self._send(family, url, params, timeout, headers, event, endpoint, read=True)
+            response = self._store(endpoint, url, params, response, stored)
+        else:
+            event.cached = True
+        return self._decode_event(event, response, outputformat, encoding)
+
+    async def _send(self, family, url, params, timeout, headers, event, endpoint, read=False):
+        """
+        Sends a request through the scheduler and the mirrors, if configured, like RadioBrowserRequest._send.
+
+        :param bool read: if True, the body is read while the request holds its scheduler slot and a BufferedResponse
+            is returned. Otherwise a StreamedResponse is returned once the headers arrived
+        """
+        async def send():
+            if self.mirrors is None:
+                response = await self._open(url, params, timeout, headers, event)
+            else:
+                response = await self._send_to_mirrors(url, params, timeout, headers, event, endpoint)
+            return await self._read(response, event) if read else response
+
+        if self.scheduler is None:
+            return await send()
+        return await self.scheduler.acall(family, send, TRANSIENT_ERRORS, endpoint, CONNECT_ERRORS)
+
+    async def _open(self, url, params, timeout, headers, event):
+        """
+        :return: StreamedResponse of the request, once its headers arrived
+        """
+        start = time.time()
+        response = await self._get_session().get(url, params=normalize_params(params), headers=headers,
+                                                 timeout=self._client_timeout(timeout), trace_request_ctx=event)
+        latency = time.time() - start
+        event.status = response.status
+        event.timings['ttfb'] = latency
+        return StreamedResponse(response, latency)
+
+    async def _read(self, response, event):
+        """
+        Reads the body of a StreamedResponse and releases the connection to the pool.
+
+        :return: BufferedResponse with the decompressed body
+        """
+        start = time.time()
+        r = response.response
+        try:
+            content = b''.join([chunk async for chunk in self._iter_body(r, event)])
+        finally:
+            r.release()
+        event.timings['download'] = time.time() - start
+        return BufferedResponse(content, r.charset, r.status, r.headers)
+
+    async def _iter_body(self, response, event):
+        # the async counterpart of compression.decompress_chunks
+        decompressor = Decompressor(response.headers.get('content-encoding'))
+        try:
+            async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                data = decompressor.decompress(chunk)
+                if data:
+                    yield data
+            data = decompressor.flush()
+            if data:
+                yield data
+        finally:
+            decompressor.record([self.transfer_stats, event], str(response.url))
+
+    async def _send_to_mirrors(self, url, params, timeout, headers, event, endpoint=None):
+        if self.mirrors.stale:
+            # resolving and probing the mirrors block, they must not stall the event loop
+            user_agent = self.header['user-agent']
+            await asyncio.get_running_loop().run_in_executor(None, self._refresh_mirrors, user_agent)
+        # like the scheduler, requests with side effects only fail over if they cannot have reached the mirror
+        mutating = endpoint in MUTATING_ENDPOINTS
+        response = None
+        error = None
+        for mirror in self.mirrors.candidates(refresh=False):
+            if response is not None:
+                response.close()
+            try:
+                response = await self._open(self.mirrors.rewrite(url, mirror), params, timeout, headers, event)
+            except TRANSIENT_ERRORS as e:
+                self.mirrors.report(mirror, failed=True)
+                if mutating and not isinstance(e, CONNECT_ERRORS):
+                    raise
+                response, error = None, e
+                continue
+            if response.status_code >= 500:
+                self.mirrors.report(mirror, failed=True)
+                if mutating:
+                    return response
+                continue
+            self.mirrors.report(mirror, response.latency)
+            return response
+        if response is None:
+            if error is None:
+                raise aiohttp.ClientConnectionError('no mirror of the webservice is available')
+            raise error
+        return response
+
+    def _refresh_mirrors(self, user_agent):
+        import requests
+
+        with requests.Session() as session:
+            session.headers['user-agent'] = user_agent
+            self.mirrors.refresh(session)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    async def close(self):
+        """
+        Closes all pooled connections of the session.
+        """
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, force_close=not self.keep_alive)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.header, auto_decompress=False,
+                                                 trace_configs=[self._trace_config()])
+        return self.session
+
+    @staticmethod
+    def _trace_config():
+        """
+        :return: aiohttp TraceConfig recording dns and connect times in the RequestEvent passed as trace_request_ctx
+        """
+        async def dns_start(session, context, params):
+            context.dns_start = time.time()
+
+        async def dns_end(session, context, params):
+            context.dns = time.time() - context.dns_start
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.add_time('dns', context.dns)
+
+        async def connect_start(session, context, params):
+            context.dns = 0.0
+            context.connect_start = time.time()
+
+        async def connect_end(session, context, params):
+            # the dns resolution happens while the connection is created
+            if context.trace_request_ctx is not None:
+                context.trace_request_ctx.add_time('connect', time.time() - context.connect_start - context.dns)
+
+        config = aiohttp.TraceConfig()
+        config.on_dns_resolvehost_start.append(dns_start)
+        config.on_dns_resolvehost_end.append(dns_end)
+        config.on_connection_create_start.append(connect_start)
+        config.on_connection_create_end.append(connect_end)
+        return config
+
+    @staticmethod
+    def _client_timeout(timeout):
+        if timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+        if isinstance(timeout, tuple):
+            return aiohttp.ClientTimeout(sock_connect=timeout[0], sock_read=timeout[1])
+        return aiohttp.ClientTimeout(total=timeout)
@@ -0,0 +1,261 @@
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from .constants import MUTATING_ENDPOINTS
+from .request import BufferedResponse, request_key
+
+DEFAULT_TTLS = {
+    'countries': 3600,
+    'codecs': 3600,
+    'languages': 3600,
+    'states': 3600,
+    'tags': 3600,
+    'top_vote': 300,
+    'top_click': 300,
+    'server_stats': 60,
+}
+
+
+class MemoryCache(object):
+    """
+    Thread safe in-memory cache backend which evicts the least recently used entry once maxsize is reached.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                value = self._entries.pop(key)
+            except KeyError:
+                return None
+            self._entries[key] = value
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache(object):
+    """
+    Cache backend which pickles every entry into its own file of a directory. The modification time of a file is its
+    last use, the least recently used files are removed once more than maxsize entries are stored. Eviction removes a
+    tenth more files than necessary, so the directory is only listed again after that many new entries. Entries
+    written by other processes are counted at the next eviction.
+    """
+
+    def __init__(self, directory, maxsize=1024):
+        self.directory = directory
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        # number of entries, None until it is counted on the first write
+        self._count = None
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                stored_key, value = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if stored_key != key:
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        tmp_path = '%s.%d.%d.tmp' % (path, os.getpid(), threading.current_thread().ident)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump((key, value), f, pickle.HIGHEST_PROTOCOL)
+        added = not os.path.exists(path)
+        os.replace(tmp_path, path)
+        with self._lock:
+            if self._count is None:
+                self._count = len(self._files())
+            elif added:
+                self._count += 1
+            if self._count > self.maxsize:
+                self._evict()
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            return
+        with self._lock:
+            if self._count:
+                self._count -= 1
+
+    def clear(self):
+        for name in self._files():
+            self._delete_file(name)
+        with self._lock:
+            self._count = None
+
+    def _delete_file(self, name):
+        try:
+            os.remove(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def __len__(self):
+        return len(self._files())
+
+    def _files(self):
+        return [name for name in os.listdir(self.directory) if name.endswith('.cache')]
+
+    def _evict(self):
+        files = self._files()
+        self._count = len(files)
+        if len(files) <= self.maxsize:
+            return
+        keep = self.maxsize - self.maxsize // 10
+        files.sort(key=lambda name: os.path.getmtime(os.path.join(self.directory, name)))
+        for name in files[:len(files) - keep]:
+            self._delete_file(name)
+        self._count = keep
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.cache')
+
+
+class ResponseCache(object):
+
+    def __init__(self, backend=None, ttls=None, default_ttl=None):
+        """
+        Caches webservice responses of read-only endpoints. Entries are keyed on the url and the normalized request
+        parameters and expire after the time to live of their endpoint. Mutating endpoints are never cached.
+
+        :param backend: storage of the entries, a MemoryCache by default. Any object with get, set, delete and clear
+            methods works
+        :param dict ttls: time to live in seconds per endpoint name, merged into DEFAULT_TTLS. A ttl of None disables
+            caching for the endpoint
+        :param default_ttl: time to live of endpoints which are not listed in ttls. None disables caching for them
+        """
+        self.backend = MemoryCache() if backend is None else backend
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+
+    def ttl(self, endpoint):
+        """
+        :param str endpoint: name of the api method
+        :return: time to live of the endpoint in seconds or None if its responses are not cached
+        """
+        if endpoint is None or endpoint in MUTATING_ENDPOINTS:
+            return None
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    key = staticmethod(request_key)
+
+    def get(self, endpoint, url, params):
+        """
+        :return: the cached response or None if there is no valid entry
+        """
+        if self.ttl(endpoint) is None:
+            return None
+        entry = self.backend.get(self.key(url, params))
+        if entry is None:
+            return None
+        expires, response = entry
+        if expires < time.time():
+            return None
+        return response
+
+    def set(self, endpoint, url, params, response):
+        ttl = self.ttl(endpoint)
+        if ttl is None:
+            return
+        self.backend.set(self.key(url, params), (time.time() + ttl, response))
+
+    def clear(self):
+        self.backend.clear()
+
+
+class ValidatorStore(object):
+
+    def __init__(self, backend=None, maxsize=64):
+        """
+        Keeps the last response of requests whose responses carry an ETag or Last-Modified validator. The stored body
+        is served again when the webservice answers a conditional request with 304 Not Modified. Its decoded result is
+        memorized, so an unchanged response is neither downloaded nor parsed again. Note that repeated calls therefore
+        return the same python object.
+
+        :param backend: storage of the responses, a MemoryCache with maxsize entries by default
+        :param int maxsize: maximum number of stored responses of the default backend
+        """
+        self.backend = MemoryCache(maxsize) if backend is None else backend
+
+    def get(self, endpoint, url, params):
+        """
+        :return: the stored response of the request or None
+        """
+        if endpoint is None or endpoint in MUTATING_ENDPOINTS:
+            return None
+        return self.backend.get(ResponseCache.key(url, params))
+
+    def set(self, endpoint, url, params, response):
+        """
+        Stores a response if it has validators.
+
+        :return: the response to use for decoding
+        """
+        if endpoint is None or endpoint in MUTATING_ENDPOINTS or not self.conditional_headers(response):
+            return response
+        stored = BufferedResponse(response.content, response.encoding, response.status_code, response.headers,
+                                  decoded={})
+        self.backend.set(ResponseCache.key(url, params), stored)
+        return stored
+
+    @staticmethod
+    def conditional_headers(response):
+        """
+        :return: dict of the conditional request headers for the validators of a response
+        """
+        headers = {}
+        if 'etag' in response.headers:
+            headers['If-None-Match'] = response.headers['etag']
+        if 'last-modified' in response.headers:
+            headers['If-Modified-Since'] = response.headers['last-modified']
+        return headers
+
+    @staticmethod
+    def refresh(stored, response):
+        """
+        Updates the validators of a stored response from a 304 Not Modified response.
+        """
+        for name in ('etag', 'last-modified', 'date', 'cache-control', 'expires'):
+            if name in response.headers:
+                stored.headers[name] = response.headers[name]
+
+    def clear(self):
+        self.backend.clear()
@@ -0,0 +1,161 @@
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+def accept_encoding():
+    """
+    :return: value of the Accept-Encoding header listing all encodings which can be decompressed
+    """
+    if brotli is not None:
+        return 'br, gzip, deflate'
+    return 'gzip, deflate'
+
+
+class Decompressor(object):
+    """
+    Streaming decompressor for the content encodings gzip, deflate and br (if brotli or brotlicffi is installed).
+    Unknown encodings and identity are passed through. It counts the bytes it received and returned, so it is used for
+    exactly one response body.
+    """
+
+    def __init__(self, content_encoding=None):
+        """
+        :param str content_encoding: value of the Content-Encoding header of the response
+        """
+        self.content_encoding = (content_encoding or 'identity').strip().lower()
+        self.wire_bytes = 0
+        self.content_bytes = 0
+        self._decompressor = None
+        self._raw_deflate = False
+        if self.content_encoding in ('gzip', 'x-gzip'):
+            self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self.content_encoding == 'deflate':
+            self._decompressor = zlib.decompressobj()
+        elif self.content_encoding == 'br' and brotli is not None:
+            self._decompressor = brotli.Decompressor()
+
+    def decompress(self, data):
+        """
+        :param bytes data: next compressed chunk
+        :return: the decompressed bytes of the chunk
+        """
+        self.wire_bytes += len(data)
+        data = self._decompress(data)
+        self.content_bytes += len(data)
+        return data
+
+    def _decompress(self, data):
+        if self._decompressor is None or not data:
+            return data
+        if self.content_encoding == 'br':
+            return self._decompressor.process(data)
+        try:
+            return self._decompressor.decompress(data)
+        except zlib.error:
+            if self.content_encoding != 'deflate' or self._raw_deflate:
+                raise
+            # some servers send raw deflate data without zlib header
+            self._raw_deflate = True
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            return self._decompressor.decompress(data)
+
+    def flush(self):
+        """
+        :return: the remaining decompressed bytes
+        """
+        if self._decompressor is None or self.content_encoding == 'br':
+            return b''
+        data = self._decompressor.flush()
+        self.content_bytes += len(data)
+        return data
+
+    def record(self, stats, url=None):
+        """
+        Records the byte counts of the body.
+
+        :param stats: a TransferStats or a list of objects with its record method
+        :param str url: url of the response
+        """
+        if not isinstance(stats, (list, tuple)):
+            stats = [stats]
+        for recorder in stats:
+            recorder.record(url, self.content_encoding, self.wire_bytes, self.content_bytes)
+
+
+class TransferStats(object):
+    """
+    Counts the bytes received on the wire and after decompression. The totals cover all calls, last holds the counts
+    of the last call of the current thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.requests = 0
+        self.wire_bytes = 0
+        self.content_bytes = 0
+
+    def record(self, url, content_encoding, wire_bytes, content_bytes):
+        """
+        Records the transfer of one response body.
+        """
+        with self._lock:
+            self.requests += 1
+            self.wire_bytes += wire_bytes
+            self.content_bytes += content_bytes
+        self._local.last = {'url': url, 'content_encoding': content_encoding, 'wire_bytes': wire_bytes,
+                            'content_bytes': content_bytes}
+
+    @property
+    def last(self):
+        """
+        :return: dict with url, content_encoding, wire_bytes and content_bytes of the last call of this thread or None
+        """
+        return getattr(self._local, 'last', None)
+
+    @property
+    def ratio(self):
+        """
+        :return: wire bytes divided by decompressed bytes of all calls, None before the first call
+        """
+        if not self.content_bytes:
+            return None
+        return float(self.wire_bytes) / self.content_bytes
+
+    def reset(self):
+        with self._lock:
+            self.requests = 0
+            self.wire_bytes = 0
+            self.content_bytes = 0
+
+
+def decompress_chunks(chunks, content_encoding, stats=None, url=None):
+    """
+    Decompresses an iterable of raw body chunks and counts the bytes.
+
+    :param chunks: iterable of bytes as received on the wire
+    :param str content_encoding: value of the Content-Encoding header
+    :param stats: a TransferStats or a list of objects with its record method. The byte counts are recorded there
+        when the body was read or the generator is closed
+    :param str url: url of the response, recorded in stats
+    :return: generator of decompressed chunks
+    """
+    decompressor = Decompressor(content_encoding)
+    try:
+        for chunk in chunks:
+            data = decompressor.decompress(chunk)
+            if data:
+                yield data
+        data = decompressor.flush()
+        if data:
+            yield data
+    finally:
+        decompressor.record([] if stats is None else stats, url)
@@ -1 +1,6 @@
 BASEURL = "http://www.radio-browser.info/webservice/"
+
+# endpoints with side effects: their responses are never cached and their requests are not repeated after they may
+# have reached the webservice
+MUTATING_ENDPOINTS = frozenset(['vote_for_station', 'add_station', 'edit_station', 'delete_station',
+                                'undelete_station', 'revert_station', 'playable_url'])
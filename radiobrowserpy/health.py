@@ -0,0 +1,453 @@
+import asyncio
+import re
+import socket
+import ssl
+from urllib.parse import quote, urljoin, urlsplit
+
+# the time of the first audio bytes is the latency of a stream, ttfb is the time until the response headers arrived
+PHASES = ('dns', 'connect', 'ttfb', 'first_byte', 'total')
+
+# kinds of ProbeResult.error
+ERRORS = ('url', 'dns', 'connect', 'ssl', 'timeout', 'network', 'protocol', 'http', 'redirects', 'empty')
+
+REDIRECT_STATUSES = frozenset([301, 302, 303, 307, 308])
+
+MAX_HEADERS = 100
+
+_NUMBER = re.compile(r'\s*(\d+)')
+_TITLE = re.compile(br"StreamTitle='(.*?)';", re.S)
+
+
+class ProbeError(Exception):
+
+    def __init__(self, kind, message):
+        super(ProbeError, self).__init__(message)
+        self.kind = kind
+
+
+class ProbeResult(object):
+    """
+    Outcome of probing one stream. ok is True if the server answered with a 2xx status and sent stream data before the
+    timeout. Otherwise error is one of ERRORS and message describes the failure.
+
+    The stream properties are taken from the response headers: content_type, the icy headers of shoutcast and
+    icecast servers (icy-name, icy-genre, icy-br, icy-sr, icy-metaint) and ice-audio-info. title is the StreamTitle of
+    the first icy metadata block, it is only read if the prober was created with metadata=True.
+
+    The timings dict maps the PHASES to seconds since the probe started, None if the phase was not reached.
+    """
+
+    def __init__(self, stationuuid, url):
+        self.stationuuid = stationuuid
+        self.url = url
+        self.final_url = url
+        self.ok = False
+        self.error = None
+        self.message = None
+        self.protocol = None
+        self.status = None
+        self.headers = {}
+        self.content_type = None
+        self.bitrate = None
+        self.samplerate = None
+        self.name = None
+        self.genre = None
+        self.metaint = None
+        self.title = None
+        self.redirects = 0
+        self.bytes_read = 0
+        self.timings = dict((phase, None) for phase in PHASES)
+
+    def __repr__(self):
+        if self.ok:
+            return '<ProbeResult %s ok latency=%.3f>' % (self.url, self.latency)
+        return '<ProbeResult %s %s: %s>' % (self.url, self.error, self.message)
+
+    @property
+    def latency(self):
+        """
+        :return: seconds until the first stream data arrived or None
+        """
+        return self.timings['first_byte']
+
+    def as_dict(self):
+        """
+        :return: the result as dict of plain values, e.g. for a json or csv export. The headers are not included
+        """
+        result = dict((key, value) for key, value in self.__dict__.items() if key not in ('headers', 'timings'))
+        for phase, seconds in self.timings.items():
+            result[phase + '_time'] = seconds
+        return result
+
+
+def probe_target(target):
+    """
+    :param target: a station dict, a dict returned by playable_url, a (stationuuid, url) tuple or a url
+    :return: tuple (stationuuid, url). The url_resolved of a station is preferred over its url
+    """
+    if isinstance(target, dict):
+        return target.get('stationuuid'), target.get('url_resolved') or target.get('url')
+    if isinstance(target, (tuple, list)) and len(target) == 2:
+        return target[0], target[1]
+    return None, target
+
+
+def _number(value):
+    match = _NUMBER.match(value or '')
+    return int(match.group(1)) if match else None
+
+
+def audio_info(value):
+    """
+    Parses an ice-audio-info header, e.g. 'ice-samplerate=44100;ice-bitrate=128;ice-channels=2'.
+
+    :return: dict without the ice- prefixes, e.g. {'samplerate': '44100', 'bitrate': '128', 'channels': '2'}
+    """
+    info = {}
+    for item in (value or '').split(';'):
+        key, separator, number = item.partition('=')
+        if separator:
+            key = key.strip().lower()
+            info[key[4:] if key.startswith('ice-') else key] = number.strip()
+    return info
+
+
+class StationProber(object):
+
+    def __init__(self, concurrency=200, per_host=8, timeout=10.0, connect_timeout=5.0, read_bytes=8192,
+                 metadata=False, max_redirects=5, user_agent='radiobrowserpy/0.0.1', verify_ssl=True):
+        """
+        Checks the health of streams from the own network. Every probe opens a raw asyncio connection, sends a plain
+        HTTP/1.0 request, reads the response headers and only the first read_bytes of the stream, then aborts the
+        connection. Name resolutions are cached per host, so the stations of one streaming server resolve it once.
+
+        :param int concurrency: maximum number of simultaneous probes
+        :param int per_host: maximum number of simultaneous connections to the same host, None for unlimited. A
+            probe which is redirected to another host gives up the slot of the previous host and waits for one of the
+            new host. Only waiting for the slot of the first host does not count towards the timeout
+        :param float timeout: seconds after which a probe fails if it did not receive stream data. A stream which
+            already sent data is healthy even if it sent less than read_bytes until then
+        :param float connect_timeout: seconds to establish the connection, including the tls handshake
+        :param int read_bytes: number of stream bytes read
+        :param bool metadata: if True, icy metadata is requested and read to get the current StreamTitle
+        :param int max_redirects: number of redirects followed
+        :param str user_agent: user agent sent to the stream servers
+        :param bool verify_ssl: if False, tls certificates are not verified
+        """
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.read_bytes = read_bytes
+        self.metadata = metadata
+        self.max_redirects = max_redirects
+        self.user_agent = user_agent
+        self.verify_ssl = verify_ssl
+        self._ssl_context = None
+        self._loop = None
+        self._addresses = {}
+        self._host_slots = {}
+
+    async def probe(self, target):
+        """
+        Probes one stream.
+
+        :param target: see probe_target
+        :return: ProbeResult, failures are reported in it instead of raised
+        """
+        stationuuid, url = probe_target(target)
+        result = ProbeResult(stationuuid, url)
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            # cached resolutions and semaphores belong to the loop they were created in
+            self._loop = loop
+            self._addresses = {}
+            self._host_slots = {}
+        try:
+            parts = self._split(url)
+        except ProbeError as e:
+            result.error, result.message = e.kind, str(e)
+            return result
+        slot = self._host_slot(parts.hostname)
+        if slot is not None:
+            await slot.acquire()
+        # _exchange releases the slot, or the slot of the host it was redirected to
+        await self._probe(result, parts, loop, slot)
+        return result
+
+    async def probe_all(self, targets, callback=None):
+        """
+        Probes streams concurrently.
+
+        :param targets: iterable of targets, see probe_target. It is consumed lazily, so e.g. a generator over tens of
+            thousands of stations is never held in memory at once
+        :param callback: function called with every ProbeResult as soon as it is available. If it raises, the
+            probes continue and the first exception is raised once all targets were probed
+        :return: list of the ProbeResults in the order of the targets
+        """
+        results = []
+        targets = enumerate(targets)
+        callback_errors = []
+
+        async def worker():
+            for index, target in targets:
+                results.append(None)
+                result = await self.probe(target)
+                results[index] = result
+                if callback is not None:
+                    try:
+                        callback(result)
+                    except Exception as e:
+                        callback_errors.append(e)
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+        if callback_errors:
+            raise callback_errors[0]
+        return results
+
+    def run(self, targets, callback=None):
+        """
+        Like probe_all, for code which does not use asyncio. Runs the probes in a new event loop.
+        """
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.probe_all(targets, callback))
+        finally:
+            loop.close()
+
+    def _split(self, url):
+        if not url:
+            raise ProbeError('url', 'no stream url')
+        if not isinstance(url, str):
+            raise ProbeError('url', 'stream url %r is no string' % (url,))
+        parts = urlsplit(url.strip())
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            raise ProbeError('url', 'unsupported stream url %r' % url)
+        try:
+            parts.port
+        except ValueError:
+            raise ProbeError('url', 'invalid port in %r' % url)
+        return parts
+
+    def _host_slot(self, host):
+        if self.per_host is None:
+            return None
+        slot = self._host_slots.get(host)
+        if slot is None:
+            slot = self._host_slots[host] = asyncio.Semaphore(self.per_host)
+        return slot
+
+    async def _probe(self, result, parts, loop, slot):
+        start = loop.time()
+        deadline = start + self.timeout
+        try:
+            await self._exchange(result, parts, loop, start, deadline, slot)
+        except ProbeError as e:
+            result.error, result.message = e.kind, str(e)
+        except asyncio.TimeoutError:
+            result.error, result.message = 'timeout', 'no stream data within %s seconds' % self.timeout
+        except ssl.SSLError as e:
+            result.error, result.message = 'ssl', str(e)
+        except (OSError, EOFError) as e:
+            result.error, result.message = 'network', str(e) or type(e).__name__
+        except Exception as e:
+            # a response the parsing does not expect must not abort the other probes of probe_all
+            result.error, result.message = 'protocol', '%s: %s' % (type(e).__name__, e)
+        result.timings['total'] = loop.time() - start
+
+    async def _exchange(self, result, parts, loop, start, deadline, slot):
+        # slot is the acquired slot of the host of parts or None, it is held until the probe of the host ended
+        try:
+            for _ in range(self.max_redirects + 1):
+                reader, writer = await self._connect(result, parts, loop, start, deadline)
+                try:
+                    writer.write(self._request_head(parts))
+                    protocol, status, headers = await self._wait(self._read_head(reader), deadline)
+                    result.timings['ttfb'] = loop.time() - start
+                    location = headers.get('location')
+                    if status in REDIRECT_STATUSES and location:
+                        result.redirects += 1
+                        result.final_url = urljoin(result.final_url, location)
+                        parts = self._split(result.final_url)
+                    else:
+                        self._describe(result, protocol, status, headers)
+                        if not 200 <= status < 300:
+                            raise ProbeError('http', 'status %d' % status)
+                        await self._read_stream(result, reader, loop, start, deadline)
+                        return
+                finally:
+                    writer.transport.abort()
+                host_slot = self._host_slot(parts.hostname)
+                if host_slot is not slot:
+                    if slot is not None:
+                        slot.release()
+                    slot = None
+                    if host_slot is not None:
+                        await self._wait(host_slot.acquire(), deadline)
+                        slot = host_slot
+            raise ProbeError('redirects', 'more than %d redirects' % self.max_redirects)
+        finally:
+            if slot is not None:
+                slot.release()
+
+    async def _connect(self, result, parts, loop, start, deadline):
+        host, https = parts.hostname, parts.scheme == 'https'
+        port = parts.port or (443 if https else 80)
+        try:
+            addresses = await self._wait(self._resolve(host, port, loop), deadline)
+        except socket.gaierror as e:
+            raise ProbeError('dns', 'cannot resolve %s: %s' % (host, e))
+        if result.timings['dns'] is None:
+            result.timings['dns'] = loop.time() - start
+        context = self._context() if https else None
+        connect_deadline = min(deadline, loop.time() + self.connect_timeout)
+        error = None
+        for address in addresses:
+            try:
+                reader, writer = await self._wait(
+                    asyncio.open_connection(address, port, ssl=context, server_hostname=host if https else None),
+                    connect_deadline)
+            except asyncio.TimeoutError:
+                raise ProbeError('timeout', 'no connection to %s:%d within %s seconds' % (host, port,
+                                                                                          self.connect_timeout))
+            except ssl.SSLError as e:
+                raise ProbeError('ssl', str(e))
+            except OSError as e:
+                error = e
+                continue
+            if result.timings['connect'] is None:
+                result.timings['connect'] = loop.time() - start
+            return reader, writer
+        raise ProbeError('connect', 'cannot connect to %s:%d: %s' % (host, port, error))
+
+    async def _resolve(self, host, port, loop):
+        # concurrent probes of streams on one host share one resolution, shielded from the timeouts of single probes
+        key = (host, port)
+        future = self._addresses.get(key)
+        if future is None:
+            future = self._addresses[key] = asyncio.ensure_future(loop.getaddrinfo(host, port,
+                                                                                   type=socket.SOCK_STREAM))
+            # retrieves the error if all waiting probes timed out before the resolution failed
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        infos = await asyncio.shield(future)
+        addresses = []
+        for info in infos:
+            if info[4][0] not in addresses:
+                addresses.append(info[4][0])
+        return addresses
+
+    def _context(self):
+        if self._ssl_context is None:
+            context = ssl.create_default_context()
+            if not self.verify_ssl:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self._ssl_context = context
+        return self._ssl_context
+
+    async def _wait(self, awaitable, deadline):
+        remaining = deadline - asyncio.get_event_loop().time()
+        if remaining <= 0:
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            raise asyncio.TimeoutError()
+        return await asyncio.wait_for(awaitable, remaining)
+
+    def _request_head(self, parts):
+        path = quote(parts.path or '/', safe="/%:@!$&'()*+,;=-._~")
+        if parts.query:
+            path += '?' + quote(parts.query, safe="/%:@!$&'()*+,;=-._~?")
+        host = '[%s]' % parts.hostname if ':' in parts.hostname else parts.hostname
+        if parts.port:
+            host += ':%d' % parts.port
+        # HTTP/1.0, so servers send the stream as it is instead of chunked
+        lines = ['GET %s HTTP/1.0' % path, 'Host: %s' % host, 'User-Agent: %s' % self.user_agent, 'Accept: */*',
+                 'Connection: close']
+        if self.metadata:
+            lines.append('Icy-MetaData: 1')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    async def _read_head(self, reader):
+        try:
+            line = await reader.readline()
+            fields = line.decode('latin-1').split(None, 2)
+            if len(fields) < 2 or not fields[1].isdigit():
+                raise ProbeError('protocol', 'invalid status line %r' % line[:100] if line else 'no response')
+            headers = {}
+            for _ in range(MAX_HEADERS):
+                line = await reader.readline()
+                if not line.strip():
+                    return fields[0], int(fields[1]), headers
+                key, separator, value = line.decode('latin-1').partition(':')
+                if separator:
+                    headers[key.strip().lower()] = value.strip()
+        except ValueError:
+            # raised by the reader if a line exceeds its limit
+            raise ProbeError('protocol', 'header line too long')
+        raise ProbeError('protocol', 'more than %d headers' % MAX_HEADERS)
+
+    def _describe(self, result, protocol, status, headers):
+        info = audio_info(headers.get('ice-audio-info'))
+        result.protocol = protocol
+        result.status = status
+        result.headers = headers
+        result.content_type = headers.get('content-type', '').split(';')[0].strip().lower() or None
+        result.bitrate = _number(headers.get('icy-br')) or _number(info.get('bitrate'))
+        result.samplerate = _number(headers.get('icy-sr')) or _number(info.get('samplerate'))
+        result.name = headers.get('icy-name')
+        result.genre = headers.get('icy-genre')
+        result.metaint = _number(headers.get('icy-metaint'))
+
+    async def _read_stream(self, result, reader, loop, start, deadline):
+        metaint = result.metaint if self.metadata else None
+        limit = max(self.read_bytes, metaint + 1) if metaint else self.read_bytes
+        data = bytearray()
+        while len(data) < limit:
+            try:
+                chunk = await self._wait(reader.read(limit - len(data)), deadline)
+            except asyncio.TimeoutError:
+                if data:
+                    break
+                raise
+            if not chunk:
+                break
+            if not data:
+                result.timings['first_byte'] = loop.time() - start
+            data += chunk
+            if metaint and len(data) > metaint:
+                # the byte after metaint stream bytes is the length of the metadata block in units of 16 bytes
+                limit = max(self.read_bytes, metaint + 1 + data[metaint] * 16)
+        result.bytes_read = len(data)
+        if not data:
+            raise ProbeError('empty', 'the server sent no stream data')
+        if metaint and len(data) > metaint:
+            match = _TITLE.search(bytes(data[metaint + 1:metaint + 1 + data[metaint] * 16]))
+            if match is not None:
+                result.title = match.group(1).decode('utf-8', 'replace')
+        result.ok = True
+
+
+def summarize(results):
+    """
+    :param results: ProbeResults
+    :return: dict with the number of probed, healthy and failed streams, the failures per error kind and the median
+        and 90th percentile latency of the healthy streams in seconds
+    """
+    latencies = sorted(result.latency for result in results if result.ok)
+    errors = {}
+    for result in results:
+        if not result.ok:
+            errors[result.error] = errors.get(result.error, 0) + 1
+    return {
+        'probed': len(latencies) + sum(errors.values()),
+        'ok': len(latencies),
+        'failed': sum(errors.values()),
+        'errors': errors,
+        'latency_p50': latencies[len(latencies) // 2] if latencies else None,
+        'latency_p90': latencies[int(len(latencies) * 0.9)] if latencies else None,
+    }
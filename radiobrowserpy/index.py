@@ -0,0 +1,250 @@
+import bisect
+
+NUMERIC_FIELDS = frozenset(['id', 'votes', 'negativevotes', 'bitrate', 'clickcount', 'clicktrend', 'lastcheckok',
+                            'hls'])
+
+
+def _flag(value):
+    """
+    Interprets the 'true'/'false' strings the webservice accepts as booleans.
+    """
+    if isinstance(value, str):
+        return value.lower() == 'true'
+    return bool(value)
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _sort_key(order):
+    if order in NUMERIC_FIELDS:
+        return lambda station: _number(station.get(order))
+    return lambda station: (station.get(order) or '').lower()
+
+
+class _FieldIndex(object):
+    """
+    Inverted index of one station attribute. Maps each lowercase value to the ids of its stations and each trigram of
+    the values to the values containing it, so exact and substring lookups do not scan all stations.
+    """
+
+    def __init__(self, multi_valued=False):
+        self.multi_valued = multi_valued
+        self._values = {}
+        self._trigrams = {}
+
+    def _split(self, value):
+        if value is None:
+            return []
+        value = str(value).lower()
+        if self.multi_valued:
+            return [v.strip() for v in value.split(',') if v.strip()]
+        return [value] if value else []
+
+    def add(self, row, value):
+        for value in self._split(value):
+            rows = self._values.get(value)
+            if rows is None:
+                rows = self._values[value] = set()
+                for trigram in self._iter_trigrams(value):
+                    self._trigrams.setdefault(trigram, set()).add(value)
+            rows.add(row)
+
+    def remove(self, row, value):
+        for value in self._split(value):
+            rows = self._values.get(value)
+            if rows is None:
+                continue
+            rows.discard(row)
+            if not rows:
+                del self._values[value]
+                for trigram in self._iter_trigrams(value):
+                    values = self._trigrams[trigram]
+                    values.discard(value)
+                    if not values:
+                        del self._trigrams[trigram]
+
+    def exact(self, term):
+        return set(self._values.get(term.lower(), ()))
+
+    def substring(self, term):
+        term = term.lower()
+        if len(term) < 3:
+            values = self._values
+        else:
+            trigram_sets = sorted((self._trigrams.get(t, set()) for t in self._iter_trigrams(term)), key=len)
+            values = set.intersection(*trigram_sets)
+        rows = set()
+        for value in values:
+            if term in value:
+                rows |= self._values[value]
+        return rows
+
+    @staticmethod
+    def _iter_trigrams(value):
+        return set(value[i:i + 3] for i in range(len(value) - 2))
+
+
+class StationIndex(object):
+    """
+    In-memory index of a station list, e.g. a dump of ApiFacade.stations. Answers the search requests of
+    SearchRadioApi locally with the same parameters and returns the same station dicts as the webservice.
+
+    Example:
+        index = StationIndex.from_api(ApiFacade())
+        index.search(tag='jazz', country='Germany', bitrate_min=128, order='votes', reverse='true')
+    """
+    fields = {'name': False, 'country': False, 'state': False, 'language': True, 'tags': True, 'codec': False}
+
+    def __init__(self, stations=()):
+        """
+        :param stations: iterable of station dicts
+        """
+        self._stations = {}
+        self._rows = {}
+        self._next_row = 0
+        self._indexes = dict((field, _FieldIndex(multi)) for field, multi in self.fields.items())
+        self._bitrates = []
+        for station in stations:
+            self.add(station)
+
+    @classmethod
+    def from_api(cls, facade, page_size=10000):
+        """
+        Builds an index of all stations of the webservice.
+
+        :param ApiFacade facade: facade with json output format
+        :param int page_size: number of stations requested per page
+        """
+        return cls(facade.iter_stations(page_size=page_size))
+
+    def __len__(self):
+        return len(self._stations)
+
+    def __iter__(self):
+        return iter(self._stations.values())
+
+    def __contains__(self, stationuuid):
+        return stationuuid in self._rows
+
+    def get(self, stationuuid):
+        """
+        :return: the station with the uuid or None
+        """
+        row = self._rows.get(stationuuid)
+        return None if row is None else self._stations[row]
+
+    def add(self, station):
+        """
+        Adds a station or replaces the station with the same stationuuid.
+        """
+        uuid = station.get('stationuuid')
+        if uuid is not None and uuid in self._rows:
+            self.remove(uuid)
+        row = self._next_row
+        self._next_row += 1
+        self._stations[row] = station
+        if uuid is not None:
+            self._rows[uuid] = row
+        for field, index in self._indexes.items():
+            index.add(row, station.get(field))
+        bisect.insort(self._bitrates, (_number(station.get('bitrate')), row))
+
+    def remove(self, stationuuid):
+        """
+        Removes the station with the uuid, if it is in the index.
+        """
+        row = self._rows.pop(stationuuid, None)
+        if row is None:
+            return
+        station = self._stations.pop(row)
+        for field, index in self._indexes.items():
+            index.remove(row, station.get(field))
+        entry = (_number(station.get('bitrate')), row)
+        del self._bitrates[bisect.bisect_left(self._bitrates, entry)]
+
+    def search(self, name=None, name_exact='false', country=None, country_exact='false', state=None,
+               state_exact='false', language=None, language_exact='false', tag=None, tag_exact='false', tag_list=None,
+               bitrate_min=0, bitrate_max=1000000, order='name', reverse='false', offset=0, limit=100000):
+        """
+        Searches the index like SearchRadioApi.search, see there for the parameters.
+
+        :return: list of matching station dicts
+        """
+        candidates = []
+        for field, term, exact in (('name', name, name_exact), ('country', country, country_exact),
+                                   ('state', state, state_exact), ('language', language, language_exact),
+                                   ('tags', tag, tag_exact)):
+            if term:
+                candidates.append(self._match(field, term, exact))
+        if tag_list:
+            if isinstance(tag_list, str):
+                tag_list = tag_list.split(',')
+            candidates.extend(self._indexes['tags'].exact(t.strip()) for t in tag_list if t.strip())
+        if _number(bitrate_min) > 0 or _number(bitrate_max) < 1000000:
+            candidates.append(self._bitrate_range(_number(bitrate_min), _number(bitrate_max)))
+        return self._result(candidates, order, reverse, offset, limit)
+
+    def stations_by(self, field, searchterm, exact=False, order='name', reverse=False, offset=0, limit=1000000):
+        """
+        Finds stations by one attribute like the stations_by... methods of SearchRadioApi.
+
+        :param str field: one of 'name', 'country', 'state', 'language', 'tags', 'codec' or 'stationuuid'
+        :param str searchterm: search term
+        :param bool exact: if True only exact matches, otherwise all stations containing the search term
+        :return: list of matching station dicts
+        """
+        if field == 'stationuuid':
+            row = self._rows.get(searchterm)
+            candidates = [set() if row is None else set([row])]
+        else:
+            candidates = [self._match(field, searchterm, exact)]
+        return self._result(candidates, order, reverse, offset, limit)
+
+    def _by(field, exact):
+        def stations_by_field(self, searchterm, order='name', reverse=False, offset=0, limit=1000000):
+            return self.stations_by(field, searchterm, exact, order, reverse, offset, limit)
+
+        stations_by_field.__doc__ = 'Local variant of SearchRadioApi.stations_by%s%s.' % (
+            'tag' if field == 'tags' else field, 'exact' if exact else '')
+        return stations_by_field
+
+    stations_byuuid = _by('stationuuid', True)
+    stations_byname = _by('name', False)
+    stations_bynameexact = _by('name', True)
+    stations_bycodec = _by('codec', False)
+    stations_bycodecexact = _by('codec', True)
+    stations_bycountry = _by('country', False)
+    stations_bycountryexact = _by('country', True)
+    stations_bystate = _by('state', False)
+    stations_bystateexact = _by('state', True)
+    stations_bylanguage = _by('language', False)
+    stations_bylanguageexact = _by('language', True)
+    stations_bytag = _by('tags', False)
+    stations_bytagexact = _by('tags', True)
+    del _by
+
+    def _match(self, field, term, exact):
+        index = self._indexes[field]
+        if _flag(exact):
+            return index.exact(term)
+        return index.substring(term)
+
+    def _bitrate_range(self, minimum, maximum):
+        start = bisect.bisect_left(self._bitrates, (minimum, -1))
+        end = bisect.bisect_right(self._bitrates, (maximum, self._next_row))
+        return set(row for _, row in self._bitrates[start:end])
+
+    def _result(self, candidates, order, reverse, offset, limit):
+        if candidates:
+            candidates.sort(key=len)
+            rows = candidates[0].intersection(*candidates[1:])
+        else:
+            rows = self._stations.keys()
+        stations = sorted((self._stations[row] for row in rows), key=_sort_key(order), reverse=_flag(reverse))
+        offset = int(offset)
+        return stations[offset:offset + int(limit)]
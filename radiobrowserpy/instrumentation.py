@@ -0,0 +1,284 @@
+import bisect
+import threading
+import time
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ('dns', 'connect', 'ttfb', 'download', 'parse', 'total')
+
+
+class RequestEvent(object):
+    """
+    Describes one call of an api endpoint. Hooks get the event before the request is sent and after it finished.
+
+    The timings dict maps the phases dns, connect, ttfb (time until the response headers arrived, including dns and
+    connect), download (reading the body), parse (decoding the body) and total to seconds. A phase is None if it was
+    not measured, e.g. dns and connect are only reported by the asyncio client because requests does not expose them,
+    and requests served from a cache have no network phases.
+
+    coalesced is True if the call shared the request of another identical call (see the coalesce option of the
+    clients). Its status is the one of that request, it has no network phases and counts no bytes.
+    """
+
+    def __init__(self, endpoint, family, url, params):
+        self.endpoint = endpoint or 'unknown'
+        self.family = family
+        self.url = url
+        self.params = params
+        self.status = None
+        self.wire_bytes = 0
+        self.content_bytes = 0
+        self.cached = False
+        self.coalesced = False
+        self.stream = False
+        self.error = None
+        self.timings = dict((phase, None) for phase in PHASES)
+        self.start = time.time()
+
+    def __repr__(self):
+        return '<RequestEvent %s %s status=%s total=%s>' % (self.endpoint, self.url, self.status,
+                                                           self.timings['total'])
+
+    def add_time(self, phase, seconds):
+        """
+        Adds seconds to a phase, e.g. to sum up the parse time of a streamed response.
+        """
+        self.timings[phase] = (self.timings[phase] or 0.0) + seconds
+
+    def record(self, url, content_encoding, wire_bytes, content_bytes):
+        """
+        Counts the bytes of a received body, has the signature of TransferStats.record.
+        """
+        self.wire_bytes += wire_bytes
+        self.content_bytes += content_bytes
+
+
+class Instrumentation(object):
+    """
+    Calls hooks before and after every request of a client. A pre hook gets the RequestEvent before the request is
+    sent, a post hook gets it after the response was decoded or the request failed (event.error is set then).
+    Streamed requests finish when the iterator is exhausted or closed.
+    """
+
+    def __init__(self, pre_hooks=None, post_hooks=None, aggregator=None):
+        """
+        :param list pre_hooks: functions called with the event before a request is sent
+        :param list post_hooks: functions called with the event after a request finished
+        :param MetricsAggregator aggregator: if set, it is added as post hook and available as attribute
+        """
+        self.pre_hooks = list(pre_hooks or [])
+        self.post_hooks = list(post_hooks or [])
+        self.aggregator = aggregator
+        if aggregator is not None:
+            self.post_hooks.append(aggregator)
+
+    def add_pre_hook(self, hook):
+        self.pre_hooks.append(hook)
+        return hook
+
+    def add_post_hook(self, hook):
+        self.post_hooks.append(hook)
+        return hook
+
+    def start(self, endpoint, family, url, params):
+        """
+        :return: a new RequestEvent, after the pre hooks were called with it
+        """
+        event = RequestEvent(endpoint, family, url, params)
+        for hook in self.pre_hooks:
+            hook(event)
+        return event
+
+    def finish(self, event, error=None):
+        """
+        Sets the total time of an event and calls the post hooks with it.
+        """
+        event.error = error
+        event.timings['total'] = time.time() - event.start
+        for hook in self.post_hooks:
+            hook(event)
+
+
+class Histogram(object):
+    """
+    Cumulative histogram of observed values with fixed bucket bounds, like a prometheus histogram.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """
+        :return: list of (upper bound, number of values <= bound) including the bound inf
+        """
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """
+        Estimates a quantile by linear interpolation inside the bucket containing it.
+
+        :param float q: quantile between 0 and 1, e.g. 0.99
+        :return: the estimated value or None if nothing was observed
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0.0
+        below = 0
+        for bound, total in self.cumulative():
+            if total >= rank:
+                if bound == float('inf'):
+                    return lower
+                inside = total - below
+                return lower + (bound - lower) * (rank - below) / inside if inside else bound
+            lower, below = bound, total
+        return lower
+
+
+class EndpointMetrics(object):
+    """
+    Counters and a histogram per timing phase of one endpoint.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.requests = 0
+        self.errors = 0
+        self.cached = 0
+        self.statuses = {}
+        # failed requests without http status, e.g. connection errors and timeouts
+        self.unanswered = 0
+        self.wire_bytes = 0
+        self.content_bytes = 0
+        self.timings = dict((phase, Histogram(buckets)) for phase in PHASES)
+
+    def add(self, event):
+        self.requests += 1
+        if event.error is not None:
+            self.errors += 1
+        if event.cached:
+            self.cached += 1
+        if event.status is not None:
+            self.statuses[event.status] = self.statuses.get(event.status, 0) + 1
+        elif event.error is not None:
+            self.unanswered += 1
+        self.wire_bytes += event.wire_bytes
+        self.content_bytes += event.content_bytes
+        for phase, seconds in event.timings.items():
+            if seconds is not None:
+                self.timings[phase].observe(seconds)
+
+    def throughput(self):
+        """
+        :return: received wire bytes per second of download time or None
+        """
+        download = self.timings['download'].sum
+        if not download:
+            return None
+        return self.wire_bytes / download
+
+
+class MetricsAggregator(object):
+    """
+    Post hook aggregating counters and latency histograms per endpoint. Thread safe.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS, prefix='radiobrowser'):
+        """
+        :param buckets: upper bounds in seconds of the histogram buckets
+        :param str prefix: prefix of the metric names in the prometheus export
+        """
+        self.buckets = buckets
+        self.prefix = prefix
+        self.endpoints = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        with self._lock:
+            metrics = self.endpoints.get(event.endpoint)
+            if metrics is None:
+                metrics = self.endpoints[event.endpoint] = EndpointMetrics(self.buckets)
+            metrics.add(event)
+
+    def __getitem__(self, endpoint):
+        return self.endpoints[endpoint]
+
+    def summary(self, quantiles=(0.5, 0.9, 0.99)):
+        """
+        :return: dict mapping endpoint names to dicts with the counters and the estimated quantiles of the total time
+        """
+        with self._lock:
+            result = {}
+            for endpoint, metrics in self.endpoints.items():
+                total = metrics.timings['total']
+                result[endpoint] = {'requests': metrics.requests, 'errors': metrics.errors, 'cached': metrics.cached,
+                                    'wire_bytes': metrics.wire_bytes, 'content_bytes': metrics.content_bytes,
+                                    'throughput': metrics.throughput(),
+                                    'latency': dict((q, total.quantile(q)) for q in quantiles)}
+            return result
+
+    def reset(self):
+        with self._lock:
+            self.endpoints = {}
+
+    def to_prometheus(self):
+        """
+        Exports the metrics in the prometheus text exposition format.
+
+        :return: str
+        """
+        prefix = self.prefix
+        lines = []
+        with self._lock:
+            items = sorted(self.endpoints.items())
+
+            def header(name, kind, text):
+                lines.append('# HELP %s_%s %s' % (prefix, name, text))
+                lines.append('# TYPE %s_%s %s' % (prefix, name, kind))
+
+            header('requests_total', 'counter', 'Requests per endpoint and http status, "error" if none was received.')
+            for endpoint, metrics in items:
+                statuses = sorted(metrics.statuses.items())
+                if metrics.unanswered:
+                    statuses.append(('error', metrics.unanswered))
+                for status, count in statuses:
+                    lines.append('%s_requests_total{endpoint="%s",status="%s"} %d' % (prefix, endpoint, status,
+                                                                                     count))
+            header('errors_total', 'counter', 'Failed requests per endpoint.')
+            for endpoint, metrics in items:
+                lines.append('%s_errors_total{endpoint="%s"} %d' % (prefix, endpoint, metrics.errors))
+            header('cache_hits_total', 'counter', 'Requests served from a cache per endpoint.')
+            for endpoint, metrics in items:
+                lines.append('%s_cache_hits_total{endpoint="%s"} %d' % (prefix, endpoint, metrics.cached))
+            header('response_bytes_total', 'counter', 'Received body bytes per endpoint, on the wire and decompressed.')
+            for endpoint, metrics in items:
+                lines.append('%s_response_bytes_total{endpoint="%s",kind="wire"} %d' % (prefix, endpoint,
+                                                                                         metrics.wire_bytes))
+                lines.append('%s_response_bytes_total{endpoint="%s",kind="content"} %d' % (prefix, endpoint,
+                                                                                            metrics.content_bytes))
+            header('request_duration_seconds', 'histogram', 'Duration of the request phases per endpoint.')
+            for endpoint, metrics in items:
+                for phase in PHASES:
+                    histogram = metrics.timings[phase]
+                    if not histogram.count:
+                        continue
+                    labels = 'endpoint="%s",phase="%s"' % (endpoint, phase)
+                    for bound, total in histogram.cumulative():
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append('%s_request_duration_seconds_bucket{%s,le="%s"} %d' % (prefix, labels, le,
+                                                                                            total))
+                    lines.append('%s_request_duration_seconds_sum{%s} %r' % (prefix, labels, histogram.sum))
+                    lines.append('%s_request_duration_seconds_count{%s} %d' % (prefix, labels, histogram.count))
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,29 @@
+import importlib
+import json
+
+BACKENDS = ('orjson', 'ujson', 'json')
+
+
+def load_backend(backend='auto'):
+    """
+    Looks up the function used to decode json responses. All backends decode straight from the response bytes.
+
+    :param backend: 'auto' picks the fastest installed library of BACKENDS (orjson, ujson, then the stdlib json),
+        a name of BACKENDS forces this library and a callable taking bytes is used as is
+    :return: tuple of the backend name and its loads function
+    :raises ImportError: if a forced backend is not installed
+    :raises ValueError: if the backend is unknown
+    """
+    if callable(backend):
+        return getattr(backend, '__module__', None) or 'custom', backend
+    if backend == 'auto':
+        for name in BACKENDS:
+            try:
+                return name, importlib.import_module(name).loads
+            except ImportError:
+                continue
+    if backend not in BACKENDS:
+        raise ValueError('json backend "%s" not supported! Supported backends: %s' % (backend, str(BACKENDS)))
+    if backend == 'json':
+        return 'json', json.loads
+    return backend, importlib.import_module(backend).loads
@@ -0,0 +1,189 @@
+import functools
+import socket
+import threading
+import time
+
+from .constants import BASEURL
+
+DNS_HOST = 'all.api.radio-browser.info'
+SRV_NAME = '_api._tcp.radio-browser.info'
+
+
+def dns_resolver(host=DNS_HOST, srv_name=SRV_NAME, scheme='https'):
+    """
+    Discovers the mirrors of the webservice from DNS. The SRV records of srv_name are used if dnspython is installed,
+    otherwise the addresses of host are resolved and looked up in reverse to get the mirror host names.
+
+    :return: list of mirror base urls, e.g. ['https://de1.api.radio-browser.info/']
+    """
+    try:
+        import dns.resolver
+    except ImportError:
+        dns = None
+    if dns is not None:
+        try:
+            answers = dns.resolver.resolve(srv_name, 'SRV')
+            return sorted('%s://%s/' % (scheme, str(answer.target).rstrip('.')) for answer in answers)
+        except Exception:
+            pass
+    names = set()
+    for info in socket.getaddrinfo(host, 443, 0, socket.SOCK_STREAM):
+        try:
+            names.add(socket.gethostbyaddr(info[4][0])[0])
+        except (socket.herror, socket.gaierror):
+            continue
+    return sorted('%s://%s/' % (scheme, name) for name in names)
+
+
+class MirrorPool(object):
+
+    def __init__(self, mirrors=None, resolver=None, refresh_interval=3600, failure_cooldown=30, probe_path='json/stats',
+                 probe_timeout=2, smoothing=0.3, user_agent='radiobrowserpy/0.0.1'):
+        """
+        Routes requests to the fastest healthy mirror of the webservice. The latency of every mirror is measured on
+        first use with a probe request and then updated from the time to the first byte of every answered request.
+        Mirrors which fail with a connection error or a 5xx status are skipped for failure_cooldown seconds and the
+        request is sent to the next mirror.
+
+        :param list mirrors: base urls of the mirrors. Paths of request urls after constants.BASEURL are appended to
+            them
+        :param resolver: function returning the list of mirror base urls, e.g. dns_resolver. It is called on first use
+            and again every refresh_interval seconds
+        :param refresh_interval: seconds after which the resolver is called again
+        :param failure_cooldown: seconds a failed mirror is only used if all mirrors failed
+        :param probe_path: path requested to measure the latency of a mirror, None disables probing
+        :param probe_timeout: timeout of a probe request in seconds
+        :param smoothing: weight of a new latency sample in the moving average of a mirror
+        :param str user_agent: user agent of probe requests which are not sent with the session of a client
+
+        Resolving and probing block. The asyncio client runs them in an executor thread, see stale and refresh.
+        """
+        if mirrors is None and resolver is None:
+            raise ValueError('either mirrors or a resolver is required')
+        self.resolver = resolver
+        self.refresh_interval = refresh_interval
+        self.failure_cooldown = failure_cooldown
+        self.probe_path = probe_path
+        self.probe_timeout = probe_timeout
+        self.smoothing = smoothing
+        self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._mirrors = [] if mirrors is None else [self._base(m) for m in mirrors]
+        self._latency = {}
+        self._failed_until = {}
+        self._resolved = None if mirrors is None else time.time()
+        self._probed = False
+
+    @staticmethod
+    def _base(url):
+        return url if url.endswith('/') else url + '/'
+
+    @property
+    def mirrors(self):
+        return list(self._mirrors)
+
+    def latency(self, mirror):
+        """
+        :return: the measured latency of a mirror in seconds or None if it was not measured yet
+        """
+        return self._latency.get(mirror)
+
+    @property
+    def stale(self):
+        """
+        True if the next call of candidates would resolve or probe the mirrors
+        """
+        return self._resolve_due() or not self._probed
+
+    def candidates(self, session=None, refresh=True):
+        """
+        :param session: requests session to send probe requests with
+        :param bool refresh: if False, the mirrors are neither resolved nor probed, e.g. inside an event loop
+        :return: list of the mirrors in the order they should be tried: healthy ones by latency, then failed ones
+        """
+        if refresh:
+            self.refresh(session)
+        now = time.time()
+        with self._lock:
+            unknown = float('inf')
+            healthy = [m for m in self._mirrors if self._failed_until.get(m, 0) <= now]
+            failed = [m for m in self._mirrors if self._failed_until.get(m, 0) > now]
+            healthy.sort(key=lambda m: self._latency.get(m, unknown))
+            failed.sort(key=lambda m: self._failed_until[m])
+        return healthy + failed
+
+    def rewrite(self, url, mirror):
+        """
+        :return: the url with constants.BASEURL replaced by the base url of the mirror
+        """
+        if url.startswith(BASEURL):
+            return mirror + url[len(BASEURL):]
+        return url
+
+    def report(self, mirror, latency=None, failed=False):
+        """
+        Records the outcome of a request to a mirror.
+
+        :param float latency: time to the first byte in seconds
+        :param bool failed: True if the mirror could not answer the request
+        """
+        with self._lock:
+            if failed:
+                self._failed_until[mirror] = time.time() + self.failure_cooldown
+                return
+            self._failed_until.pop(mirror, None)
+            if latency is not None:
+                previous = self._latency.get(mirror)
+                if previous is None:
+                    self._latency[mirror] = latency
+                else:
+                    self._latency[mirror] = previous + self.smoothing * (latency - previous)
+
+    def probe(self, session=None):
+        """
+        Measures the latency of all mirrors with one request each.
+
+        :param session: requests session to send the requests with, e.g. the one of a RadioBrowserRequest so the
+            application's user agent is sent. Without session, user_agent is sent
+        """
+        import requests
+
+        if self.probe_path is None:
+            return
+        if session is None:
+            get = functools.partial(requests.get, headers={'user-agent': self.user_agent})
+        else:
+            get = session.get
+        for mirror in self.mirrors:
+            start = time.time()
+            try:
+                response = get(mirror + self.probe_path, timeout=self.probe_timeout)
+            except requests.exceptions.RequestException:
+                self.report(mirror, failed=True)
+                continue
+            self.report(mirror, time.time() - start, failed=response.status_code >= 500)
+
+    def refresh(self, session=None):
+        """
+        Calls the resolver if the mirror list is due and probes the mirrors if they were not probed since. Concurrent
+        callers wait for one refresh instead of probing again.
+
+        :param session: requests session to send probe requests with
+        """
+        if not self.stale:
+            return
+        with self._refresh_lock:
+            if self._resolve_due():
+                mirrors = [self._base(m) for m in self.resolver()]
+                with self._lock:
+                    self._mirrors = mirrors
+                    self._resolved = time.time()
+                    self._probed = False
+            if not self._probed:
+                self.probe(session)
+                self._probed = True
+
+    def _resolve_due(self):
+        return self.resolver is not None and (self._resolved is None or
+                                              time.time() - self._resolved >= self.refresh_interval)
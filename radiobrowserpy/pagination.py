@@ -0,0 +1,149 @@
+import time
+from collections import deque
+
+# delay in seconds before the first retry of a page, doubled for every further retry
+RETRY_BACKOFF = 0.25
+
+
+class PageRequest(object):
+    """
+    Builds and decodes the pages of a paginated api method, i.e. a method with offset and limit parameters.
+    """
+
+    def __init__(self, method, args, kwargs, page_size, retries=0):
+        """
+        :param method: bound api method, e.g. facade.stations
+        :param args: positional arguments of the method
+        :param dict kwargs: keyword arguments of the method without offset and limit
+        :param int page_size: number of items per page
+        :param int retries: number of retries of a page failing with a connection error or timeout. Ignored if the
+            request object has a scheduler, which retries failed requests itself
+        """
+        self.api = method.__self__
+        if self.api.output_format not in ('json', 'xml'):
+            raise ValueError('pagination requires the output format json or xml, not "%s"' % self.api.output_format)
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.page_size = page_size
+        radiorequest = self.api.radiorequest
+        self.retries = 0 if getattr(radiorequest, 'scheduler', None) is not None else retries
+        self.retry_errors = getattr(radiorequest, 'transient_errors', ())
+
+    def __call__(self, offset):
+        """
+        Sends the request of the page starting at offset.
+
+        :return: the decoded page or for asynchronous apis an awaitable of it
+        """
+        return self.method(*self.args, offset=offset, limit=self.page_size, encoding=True, **self.kwargs)
+
+    @staticmethod
+    def items(page):
+        """
+        :return: list of the items of a decoded json or xml page
+        """
+        return list(page)
+
+    @staticmethod
+    def delay(attempt):
+        """
+        :return: seconds to wait before the retry following the failed attempt
+        """
+        return RETRY_BACKOFF * 2 ** attempt
+
+
+def paginate(method, args, kwargs, page_size=500, prefetch=2, retries=2, offset=0, limit=None):
+    """
+    Iterates lazily over all items of a paginated api method. While the items of one page are consumed, the next
+    prefetch pages are already requested in the background, but no page beyond offset + limit. Iteration stops at the
+    first page with less than page_size items. A page failing with a connection error or timeout is requested again
+    up to retries times with exponential backoff, earlier pages are not requested again. Other errors, e.g. an error
+    page which cannot be decoded, are raised at once. With a RequestScheduler the scheduler retries instead.
+
+    :param method: bound api method with offset and limit parameters, e.g. facade.stations
+    :param args: positional arguments of the method
+    :param dict kwargs: keyword arguments of the method
+    :param int page_size: number of items requested per page
+    :param int prefetch: number of pages requested ahead of the consumer. 0 requests pages only when they are needed
+    :param int retries: number of retries of a page failing with a connection error or timeout
+    :param int offset: index of the first item
+    :param int limit: maximum number of items, None for all
+    :return: generator of the decoded items (dicts for json, elements for xml)
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    request = PageRequest(method, args, kwargs, page_size, retries)
+
+    def fetch(page_offset):
+        for attempt in range(request.retries + 1):
+            try:
+                return request.items(request(page_offset))
+            except request.retry_errors:
+                if attempt == request.retries:
+                    raise
+            time.sleep(request.delay(attempt))
+
+    executor = ThreadPoolExecutor(max_workers=max(prefetch, 1))
+    pending = deque()
+    next_offset = offset
+    end = None if limit is None else offset + limit
+    remaining = limit
+    try:
+        while remaining != 0:
+            while len(pending) < prefetch + 1 and (end is None or next_offset < end):
+                pending.append(executor.submit(fetch, next_offset))
+                next_offset += page_size
+            items = pending.popleft().result()
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+            for item in items:
+                yield item
+            if len(items) < page_size:
+                return
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+async def apaginate(method, args, kwargs, page_size=500, prefetch=2, retries=2, offset=0, limit=None):
+    """
+    Asynchronous variant of paginate for the methods of AsyncApiFacade.
+
+    :return: asynchronous generator of the decoded items
+    """
+    import asyncio
+
+    request = PageRequest(method, args, kwargs, page_size, retries)
+
+    async def fetch(page_offset):
+        for attempt in range(request.retries + 1):
+            try:
+                return request.items(await request(page_offset))
+            except request.retry_errors:
+                if attempt == request.retries:
+                    raise
+            await asyncio.sleep(request.delay(attempt))
+
+    pending = deque()
+    next_offset = offset
+    end = None if limit is None else offset + limit
+    remaining = limit
+    try:
+        while remaining != 0:
+            while len(pending) < prefetch + 1 and (end is None or next_offset < end):
+                pending.append(asyncio.ensure_future(fetch(next_offset)))
+                next_offset += page_size
+            items = await pending.popleft()
+            if remaining is not None:
+                items = items[:remaining]
+                remaining -= len(items)
+            for item in items:
+                yield item
+            if len(items) < page_size:
+                return
+    finally:
+        for task in pending:
+            task.cancel()
@@ -0,0 +1,466 @@
+import csv
+import io
+import json
+import os
+import re
+import time
+from collections import deque, namedtuple
+
+Task = namedtuple('Task', ['stream', 'key', 'method', 'args', 'kwargs'])
+
+
+class PagedJob(object):
+    """
+    Fetches all pages of a paginated api method, e.g. stations. prefetch pages are requested at the same time, the job
+    ends with the first page which has less than page_size items.
+    """
+
+    def __init__(self, stream, method, page_size=10000, prefetch=4, **kwargs):
+        """
+        :param str stream: name of the output stream, selects the sink and transform
+        :param str method: name of the api method
+        :param int page_size: number of items per page
+        :param int prefetch: number of pages requested at the same time
+        :param kwargs: further keyword arguments of the api method
+        """
+        self.stream = stream
+        self.method = method
+        self.page_size = page_size
+        self.prefetch = max(prefetch, 1)
+        self.kwargs = kwargs
+        self.source = None
+        self._next_offset = 0
+        self._finished = False
+
+    def start(self):
+        return [self._next_task() for _ in range(self.prefetch)]
+
+    def done(self, task, size):
+        """
+        :return: tasks to run after a task of this job returned size items
+        """
+        if size < self.page_size:
+            self._finished = True
+        if self._finished:
+            return []
+        return [self._next_task()]
+
+    def _next_task(self):
+        offset = self._next_offset
+        self._next_offset += self.page_size
+        kwargs = dict(self.kwargs, offset=offset, limit=self.page_size)
+        return Task(self.stream, '%s:%d' % (self.stream, offset), self.method, [], kwargs)
+
+
+class SingleJob(object):
+    """
+    Fetches the result of one api call, e.g. checks.
+    """
+
+    def __init__(self, stream, method, *args, **kwargs):
+        self.stream = stream
+        self.method = method
+        self.args = list(args)
+        self.kwargs = kwargs
+        self.source = None
+
+    def start(self):
+        return [Task(self.stream, self.stream, self.method, self.args, self.kwargs)]
+
+    def done(self, task, size):
+        return []
+
+
+class PerItemJob(object):
+    """
+    Calls an api method once per item of another stream, e.g. changed_stations for every station of the stations
+    stream. The items are taken from the records of the source stream after its transform.
+    """
+
+    def __init__(self, stream, method, source, field='stationuuid', **kwargs):
+        """
+        :param str source: name of the stream whose records start the calls
+        :param str field: field of the source records passed as first argument of the api method
+        """
+        self.stream = stream
+        self.method = method
+        self.source = source
+        self.field = field
+        self.kwargs = kwargs
+
+    def start(self):
+        return []
+
+    def done(self, task, size):
+        return []
+
+    def expand(self, values):
+        """
+        :param values: values of field of the completed source records
+        :return: one task per value
+        """
+        return [Task(self.stream, '%s:%s' % (self.stream, value), self.method, [value], self.kwargs)
+                for value in values if value]
+
+
+class JsonlSink(object):
+    """
+    Writes records as json lines into one file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def encoder(self):
+        """
+        :return: picklable function encoding the records of one task to bytes, it runs in the decode workers
+        """
+        return _encode_jsonl
+
+    def open(self, size=0):
+        """
+        Opens the file for writing.
+
+        :param int size: size of the file at the last checkpoint. Data written after it is dropped
+        """
+        self._file = open(self.path, 'ab')
+        self._file.truncate(size)
+        self._file.seek(size)
+
+    def write(self, data, key):
+        self._file.write(data)
+
+    def size(self):
+        self._file.flush()
+        return self._file.tell()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class CsvSink(JsonlSink):
+    """
+    Writes records as csv rows with a header line into one file. Fields which are not in columns are dropped.
+    """
+
+    def __init__(self, path, columns):
+        """
+        :param list columns: names of the columns
+        """
+        super(CsvSink, self).__init__(path)
+        self.columns = list(columns)
+
+    def encoder(self):
+        return _CsvEncoder(self.columns)
+
+    def open(self, size=0):
+        super(CsvSink, self).open(size)
+        if self._file.tell() == 0:
+            self._file.write(_CsvEncoder(self.columns).header())
+
+
+class ColumnarSink(object):
+    """
+    Writes the records of every task into its own binary columnar file in a directory, see write_snapshot. The
+    files can be opened with Snapshot and are rewritten as a whole when a task is repeated.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def encoder(self):
+        return _ColumnarEncoder(self.directory)
+
+    def open(self, size=0):
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+
+    def write(self, data, key):
+        pass
+
+    def size(self):
+        return None
+
+    def close(self):
+        pass
+
+
+def _encode_jsonl(records, key):
+    return ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+
+
+class _CsvEncoder(object):
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    def header(self):
+        return self._encode([dict(zip(self.columns, self.columns))])
+
+    def __call__(self, records, key):
+        return self._encode(records)
+
+    def _encode(self, records):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, self.columns, extrasaction='ignore', lineterminator='\n')
+        writer.writerows(records)
+        return buffer.getvalue().encode('utf-8')
+
+
+class _ColumnarEncoder(object):
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, records, key):
+        from .snapshot import write_snapshot
+
+        write_snapshot(records, os.path.join(self.directory, re.sub(r'[^\w.-]', '_', key) + '.snap'))
+        return b''
+
+
+def process_page(outputformat, text, key, transform, encoder, fields):
+    """
+    Decode stage, runs in a worker process: decodes the response of a task, transforms and encodes its records.
+
+    :param str outputformat: json or xml
+    :param str text: the response
+    :param transform: function applied to every record, returning the record to keep or None to drop it
+    :param encoder: encoder of the sink of the stream
+    :param fields: names of the fields whose values are returned for per item jobs
+    :return: tuple of the number of decoded records, the number of records after the transform, the encoded bytes
+        and a dict mapping the fields to lists of values
+    """
+    if outputformat == 'xml':
+        import xml.etree.ElementTree as ET
+        from .streaming import element_to_dict
+
+        records = [element_to_dict(element) for element in ET.fromstring(text)]
+    else:
+        records = json.loads(text)
+        if isinstance(records, dict):
+            records = [records]
+    size = len(records)
+    if transform is not None:
+        records = [record for record in (transform(record) for record in records) if record is not None]
+    values = dict((field, [record.get(field) for record in records]) for field in fields)
+    return size, len(records), encoder(records, key), values
+
+
+class PipelineStats(object):
+    """
+    Throughput counters of a pipeline run.
+    """
+
+    def __init__(self):
+        self.start = time.time()
+        self.tasks = 0
+        self.skipped = 0
+        self.records = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.streams = {}
+
+    @property
+    def elapsed(self):
+        return time.time() - self.start
+
+    def rates(self):
+        """
+        :return: dict with tasks, records, input bytes and output bytes per second
+        """
+        elapsed = max(self.elapsed, 1e-9)
+        return {'tasks': self.tasks / elapsed, 'records': self.records / elapsed,
+                'bytes_in': self.bytes_in / elapsed, 'bytes_out': self.bytes_out / elapsed}
+
+    def __repr__(self):
+        rates = self.rates()
+        return '<PipelineStats tasks=%d skipped=%d records=%d elapsed=%.1fs %.0f records/s %.0f KB/s in>' % (
+            self.tasks, self.skipped, self.records, self.elapsed, rates['records'], rates['bytes_in'] / 1024.0)
+
+
+class Pipeline(object):
+    """
+    Exports api results to files with the stages fetch (concurrent requests on a thread pool), decode and transform
+    (on a process pool, so parsing does not compete for the GIL), and sink (files written by the calling thread).
+
+    At most max_pending responses are fetched but not yet decoded and at most max_pending are being decoded, so
+    fetching slows down when decoding or writing falls behind. With a checkpoint file, every finished task is recorded
+    after its records were written. A rerun with the same checkpoint skips finished tasks and truncates the sink files
+    to the last checkpoint, so every record is written exactly once.
+
+    Example:
+        pipeline = Pipeline(facade, [PagedJob('stations', 'stations'), SingleJob('checks', 'checks'),
+                                     PerItemJob('changes', 'changed_stations', source='stations')],
+                            {'stations': JsonlSink('stations.jsonl'), 'checks': JsonlSink('checks.jsonl'),
+                             'changes': JsonlSink('changes.jsonl')},
+                            checkpoint='export.checkpoint', report=print)
+        pipeline.run()
+    """
+
+    def __init__(self, facade, jobs, sinks, transforms=None, fetch_workers=8, decode_workers=None, max_pending=16,
+                 checkpoint=None, report=None, report_interval=10.0):
+        """
+        :param ApiFacade facade: facade sending the requests. Its pool_size should be at least fetch_workers
+        :param list jobs: PagedJob, SingleJob and PerItemJob objects
+        :param dict sinks: maps stream names to sinks
+        :param dict transforms: maps stream names to functions applied to every record. With decode workers they
+            have to be picklable, i.e. defined at module level
+        :param int fetch_workers: number of requests running at the same time
+        :param int decode_workers: number of decode processes, None for one per cpu, 0 to decode in the calling thread
+        :param int max_pending: bound of the queues between the stages
+        :param str checkpoint: path of the checkpoint file, None disables checkpointing
+        :param report: function called with the PipelineStats every report_interval seconds and at the end
+        """
+        self.facade = facade
+        self.jobs = dict((job.stream, job) for job in jobs)
+        self.sinks = sinks
+        self.transforms = transforms or {}
+        self.fetch_workers = fetch_workers
+        self.decode_workers = decode_workers
+        self.max_pending = max(max_pending, 1)
+        self.checkpoint = checkpoint
+        self.report = report
+        self.report_interval = report_interval
+        self._children = {}
+        for job in jobs:
+            if job.source is not None:
+                self._children.setdefault(job.source, []).append(job)
+
+    def run(self):
+        """
+        Runs all jobs until they are finished. If a request or decoding fails, the exception is raised after the
+        running tasks were stopped, finished tasks stay recorded in the checkpoint.
+
+        :return: PipelineStats
+        """
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+        stats = PipelineStats()
+        finished = self._read_checkpoint()
+        sizes = finished.pop(None, {})
+        for stream, sink in self.sinks.items():
+            sink.open(sizes.get(stream, 0))
+        encoders = dict((stream, sink.encoder()) for stream, sink in self.sinks.items())
+        checkpoint = open(self.checkpoint, 'a') if self.checkpoint else None
+
+        ready = deque()
+        for job in self.jobs.values():
+            ready.extend(job.start())
+        fetching = {}
+        fetched = deque()
+        decoding = {}
+        fetch_executor = ThreadPoolExecutor(self.fetch_workers)
+        if self.decode_workers == 0:
+            decode_executor = _InlineExecutor()
+        else:
+            decode_executor = ProcessPoolExecutor(self.decode_workers)
+        last_report = time.time()
+        try:
+            while ready or fetching or fetched or decoding:
+                while ready and len(fetching) + len(fetched) < self.max_pending:
+                    task = ready.popleft()
+                    entry = finished.get(task.key)
+                    if entry is not None:
+                        stats.skipped += 1
+                        ready.extend(self._follow_ups(task, entry['size'], [Task(*t) for t in entry['spawned']]))
+                        continue
+                    fetching[fetch_executor.submit(self._fetch, task)] = task
+                while fetched and len(decoding) < self.max_pending:
+                    task, outputformat, text = fetched.popleft()
+                    stats.bytes_in += len(text)
+                    fields = [job.field for job in self._children.get(task.stream, ())]
+                    future = decode_executor.submit(process_page, outputformat, text, task.key,
+                                                    self.transforms.get(task.stream), encoders[task.stream], fields)
+                    decoding[future] = task
+                if not fetching and not decoding:
+                    continue
+                completed, _ = wait(list(fetching) + list(decoding), timeout=self.report_interval,
+                                    return_when=FIRST_COMPLETED)
+                for future in completed:
+                    if future in fetching:
+                        task = fetching.pop(future)
+                        fetched.append((task,) + future.result())
+                        continue
+                    task = decoding.pop(future)
+                    ready.extend(self._write(task, stats, checkpoint, *future.result()))
+                if self.report is not None and time.time() - last_report >= self.report_interval:
+                    last_report = time.time()
+                    self.report(stats)
+        finally:
+            for future in fetching:
+                future.cancel()
+            fetch_executor.shutdown(wait=True)
+            decode_executor.shutdown(wait=True)
+            for sink in self.sinks.values():
+                sink.close()
+            if checkpoint is not None:
+                checkpoint.close()
+        if self.report is not None:
+            self.report(stats)
+        return stats
+
+    def _fetch(self, task):
+        method = getattr(self.facade, task.method)
+        return method.__self__.output_format, method(*task.args, encoding=False, **task.kwargs)
+
+    def _write(self, task, stats, checkpoint, size, count, data, values):
+        sink = self.sinks[task.stream]
+        sink.write(data, task.key)
+        spawned = []
+        for job in self._children.get(task.stream, ()):
+            spawned.extend(job.expand(values[job.field]))
+        stats.tasks += 1
+        stats.records += count
+        stats.bytes_out += len(data)
+        stats.streams[task.stream] = stats.streams.get(task.stream, 0) + count
+        if checkpoint is not None:
+            sizes = dict((stream, s.size()) for stream, s in self.sinks.items())
+            checkpoint.write(json.dumps({'key': task.key, 'size': size, 'spawned': spawned,
+                                         'sizes': dict((k, v) for k, v in sizes.items() if v is not None)}) + '\n')
+            checkpoint.flush()
+        return self._follow_ups(task, size, spawned)
+
+    def _follow_ups(self, task, size, spawned):
+        return self.jobs[task.stream].done(task, size) + spawned
+
+    def _read_checkpoint(self):
+        """
+        :return: dict mapping the keys of finished tasks to their checkpoint entries, the key None holds the sink
+            sizes of the last entry
+        """
+        finished = {}
+        if not self.checkpoint or not os.path.exists(self.checkpoint):
+            return finished
+        with open(self.checkpoint) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # the last line may be incomplete after a crash
+                    break
+                finished[entry['key']] = entry
+                finished[None] = entry['sizes']
+        return finished
+
+
+class _InlineExecutor(object):
+    """
+    Executor running the submitted functions immediately in the calling thread.
+    """
+
+    def submit(self, func, *args, **kwargs):
+        from concurrent.futures import Future
+
+        future = Future()
+        try:
+            future.set_result(func(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def shutdown(self, wait=True):
+        pass
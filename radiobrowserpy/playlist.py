@@ -0,0 +1,268 @@
+import re
+import xml.etree.ElementTree as ET
+
+FIELD_ALIASES = {
+    'title': 'name',
+    'location': 'url',
+    'file': 'url',
+    'image': 'favicon',
+    'logo': 'favicon',
+    'tvg-logo': 'favicon',
+    'info': 'homepage',
+    'length': 'duration',
+}
+
+
+def _field(name):
+    name = name.lower()
+    return FIELD_ALIASES.get(name, name)
+
+
+class _LineParser(object):
+    """
+    Base of the incremental parsers of line based playlists. Splits the fed bytes into lines without decoding the
+    whole body, only the values of the recognized lines are decoded.
+    """
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self._buffer = b''
+
+    def feed(self, data):
+        """
+        :param bytes data: next chunk of the response body
+        :return: list of the stations completed by this chunk
+        """
+        buffer = self._buffer + data if self._buffer else data
+        items = []
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end == -1:
+                break
+            self._line(buffer[start:end].strip(), items)
+            start = end + 1
+        self._buffer = buffer[start:]
+        return items
+
+    def close(self):
+        """
+        :return: list of the remaining stations
+        """
+        items = []
+        if self._buffer.strip():
+            self._line(self._buffer.strip(), items)
+        self._buffer = b''
+        self._finish(items)
+        return items
+
+    def _decode(self, value):
+        return value.decode(self.encoding, 'replace')
+
+    def _line(self, line, items):
+        raise NotImplementedError()
+
+    def _finish(self, items):
+        pass
+
+
+class M3uParser(_LineParser):
+    """
+    Incremental parser for (extended) m3u playlists. Returns a dict with the keys 'name' and 'url' per entry plus the
+    attributes of the #EXTINF line, e.g. tvg-logo.
+    """
+    _attribute = re.compile(br'([\w-]+)="([^"]*)"')
+
+    def __init__(self, encoding='utf-8'):
+        super(M3uParser, self).__init__(encoding)
+        self._info = None
+
+    def _line(self, line, items):
+        if not line:
+            return
+        if line.startswith(b'#'):
+            if line.startswith(b'#EXTINF:'):
+                self._info = line[8:]
+            return
+        station = {}
+        if self._info is not None:
+            head, _, title = self._info.partition(b',')
+            for key, value in self._attribute.findall(head):
+                station[_field(self._decode(key))] = self._decode(value)
+            station['name'] = self._decode(title.strip())
+            self._info = None
+        station['url'] = self._decode(line)
+        items.append(station)
+
+
+class PlsParser(_LineParser):
+    """
+    Incremental parser for pls playlists. Returns a dict with the keys 'url', 'name' and 'duration' per entry. An entry
+    is returned once a line of a later entry or the end of the playlist was read.
+    """
+    _key = re.compile(br'^([A-Za-z]+)(\d+)$')
+
+    def __init__(self, encoding='utf-8'):
+        super(PlsParser, self).__init__(encoding)
+        self._entries = {}
+
+    def _line(self, line, items):
+        key, separator, value = line.partition(b'=')
+        if not separator:
+            return
+        match = self._key.match(key.strip())
+        if match is None:
+            return
+        number = int(match.group(2))
+        for pending in sorted(n for n in self._entries if n < number):
+            self._flush(pending, items)
+        self._entries.setdefault(number, {})[_field(self._decode(match.group(1)))] = self._decode(value.strip())
+
+    def _flush(self, number, items):
+        entry = self._entries.pop(number)
+        if 'url' in entry:
+            items.append(entry)
+
+    def _finish(self, items):
+        for number in sorted(self._entries):
+            self._flush(number, items)
+
+
+class XspfParser(object):
+    """
+    Incremental parser for xspf playlists. Returns a dict per track with the child elements of the track, named like
+    the station attributes ('name', 'url', 'favicon', 'homepage', ...). Parsed tracks are removed from the tree.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._stack = []
+
+    def feed(self, data):
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self):
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self):
+        items = []
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                self._stack.append(element)
+                continue
+            self._stack.pop()
+            if _local_name(element.tag) == 'track':
+                station = {}
+                for child in element:
+                    station[_field(_local_name(child.tag))] = (child.text or '').strip()
+                items.append(station)
+                if self._stack:
+                    self._stack[-1].remove(element)
+        return items
+
+
+def _local_name(name):
+    for separator in ('}', '#', '/', ':'):
+        name = name.rsplit(separator, 1)[-1]
+    return name
+
+
+class TtlParser(object):
+    """
+    Incremental parser for the turtle (rdf) output. Every statement about a subject becomes a dict of the local names
+    of its predicates, e.g. schema:name becomes 'name'. The subject is stored under '@id'. Supports the subset of
+    turtle the webservice writes: prefixes, iris, prefixed names, literals and predicate lists.
+    """
+    _token = re.compile(r'\s*(<[^>]*>|"""(?:[^"\\]|\\.|"(?!""))*"""|"(?!"")(?:[^"\\\n]|\\.)*"(?:@[\w-]+|\^\^\S+?'
+                        r'(?=[\s;,.]))?|[;,]|\.(?=\s|$)|[^\s;,<"]+?(?=[\s;,]|\.(?:\s|$)))')
+    _delimiters = ' \t\r\n;,.'
+    _escapes = {'t': '\t', 'n': '\n', 'r': '\r', '"': '"', "'": "'", '\\': '\\'}
+
+    def __init__(self, encoding='utf-8'):
+        self.encoding = encoding
+        self._text = ''
+        self._tokens = []
+        self._bytes = b''
+
+    def feed(self, data):
+        data = self._bytes + data
+        try:
+            text = data.decode(self.encoding)
+            self._bytes = b''
+        except UnicodeDecodeError as e:
+            text = data[:e.start].decode(self.encoding)
+            self._bytes = data[e.start:]
+        self._text += text
+        return self._parse(final=False)
+
+    def close(self):
+        self._text += self._bytes.decode(self.encoding, 'replace')
+        self._bytes = b''
+        items = self._parse(final=True)
+        if self._text.strip() or self._tokens:
+            raise ValueError('incomplete turtle statement')
+        return items
+
+    def _parse(self, final):
+        items = []
+        position = 0
+        while True:
+            match = self._token.match(self._text, position)
+            if match is None:
+                break
+            if not final and match.group(1) not in (';', ',', '.') and (
+                    match.end() == len(self._text) or self._text[match.end()] not in self._delimiters):
+                # the token might continue in the next chunk
+                break
+            position = match.end()
+            token = match.group(1)
+            if token != '.':
+                self._tokens.append(token)
+                continue
+            statement, self._tokens = self._tokens, []
+            station = self._statement(statement)
+            if station is not None:
+                items.append(station)
+        self._text = self._text[position:]
+        return items
+
+    def _statement(self, tokens):
+        if not tokens or tokens[0].startswith('@') or tokens[0].upper() in ('PREFIX', 'BASE'):
+            return None
+        station = {'@id': self._value(tokens[0])}
+        predicate = None
+        for token in tokens[1:]:
+            if token in (';', ','):
+                if token == ';':
+                    predicate = None
+                continue
+            if predicate is None:
+                predicate = 'type' if token == 'a' else _field(_local_name(self._value(token)))
+                continue
+            value = self._value(token)
+            if predicate in station and predicate != '@id':
+                previous = station[predicate]
+                station[predicate] = (previous if isinstance(previous, list) else [previous]) + [value]
+            else:
+                station[predicate] = value
+        return station
+
+    def _value(self, token):
+        if token.startswith('<'):
+            return token[1:-1]
+        if token.startswith('"'):
+            quote = '"""' if token.startswith('"""') else '"'
+            end = token.rindex(quote)
+            return re.sub(r'\\(.)', lambda m: self._escapes.get(m.group(1), m.group(1)), token[len(quote):end])
+        return token
+
+
+def parse(parser, data):
+    """
+    Parses a whole response body with an incremental parser.
+
+    :return: list of stations
+    """
+    return parser.feed(data) + parser.close()
@@ -1,30 +1,509 @@
-import requests
-import xml.etree.ElementTree as ET
+import codecs
 import json
-from future.utils import PY3
+import time
+from urllib.parse import urlencode
 
+from .compression import TransferStats, accept_encoding, decompress_chunks
+from .constants import MUTATING_ENDPOINTS
+from .instrumentation import RequestEvent
+from .streaming import STREAM_CHUNK_SIZE, JsonArrayParser, XmlElementParser, element_to_dict
+from .jsonbackend import load_backend
+from .singleflight import SingleFlight
+
+# requests, xml.etree and the playlist and table modules are imported on first use, which keeps importing the
+# package cheap for short-lived processes
 HEADER = {'user-agent': 'radiokodilib/0.0.1'}
 
 
-class RadioBrowserRequest:
+def transient_errors():
+    """
+    :return: tuple of the requests exceptions worth retrying or failing over on
+    """
+    import requests
+
+    return requests.exceptions.ConnectionError, requests.exceptions.Timeout
+
+
+def connect_errors():
+    """
+    :return: tuple of the requests exceptions raised before a request was sent, which are safe to retry even for
+        endpoints with side effects
+    """
+    import requests
+
+    return requests.exceptions.ConnectTimeout,
+
+
+def coalesced(event, leader):
+    """
+    Marks the event of a call which got the result of another call's request and copies the status of that request.
+    """
+    if leader is not event:
+        event.coalesced = True
+        event.status = leader.status
+        event.cached = leader.cached
+
+
+def normalize_params(params):
+    """
+    Drops unset parameters and converts the remaining values to strings the same way requests does, so every http
+    client sends identical query strings.
+
+    :param dict params: request parameters, may be None
+    :return: dict of str parameters or None
+    """
+    if params is None:
+        return None
+    return dict((key, str(value)) for key, value in params.items() if value is not None)
+
+
+def request_key(url, params):
+    """
+    :return: a string identifying a request by its url and normalized parameters
+    """
+    params = normalize_params(params)
+    if not params:
+        return url
+    return url + '?' + urlencode(sorted(params.items()))
+
+
+class BufferedResponse(object):
+    """
+    Minimal response object for bodies which were not received through requests, e.g. by the asyncio client. Offers
+    the attributes the decoders of ResponseDecoder use.
+    """
+
+    def __init__(self, content, encoding='utf-8', status_code=200, headers=None, decoded=None):
+        """
+        :param bytes content: body of the response
+        :param str encoding: charset of the body
+        :param int status_code: http status of the response
+        :param headers: response headers
+        :param dict decoded: if set, decoded results of the body are memorized in this dict, so repeated decoding of
+            the same response returns the same object
+        """
+        from requests.structures import CaseInsensitiveDict
+
+        self.content = content
+        self.encoding = encoding or 'utf-8'
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers or {})
+        self.decoded = decoded
+
+    @classmethod
+    def from_response(cls, response):
+        """
+        Copies the body of a requests response, e.g. to store it in a cache.
+        """
+        return cls(response.content, response.encoding, response.status_code, dict(response.headers))
 
-    def __init__(self, app_name, app_version):
-        self.header = {'user-agent': app_name + '/' + app_version}
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, 'replace')
 
-    def __call__(self, url, outputformat='json', encoding=False, params=None):
-        r = requests.get(url, params=params)
+
+class ResponseDecoder(object):
+    """
+    Decodes webservice responses into python objects according to the output format. json responses are decoded from
+    the response bytes with json_loads, subclasses set it from a backend of jsonbackend.load_backend.
+    """
+    json_backend = 'json'
+    json_loads = staticmethod(json.loads)
+
+    def decode(self, response, outputformat='json', encoding=False):
+        """
+        Decodes a response.
+
+        :param response: response of the webservice
+        :param str outputformat: format of the response
+        :param encoding: if True and a decoder for the output format exists, the response becomes encoded in a
+            python object. 'table' decodes station lists into a StationTable. Otherwise the plain text is returned
+        """
+        memo = getattr(response, 'decoded', None)
+        if memo is not None:
+            key = (outputformat, encoding)
+            if key not in memo:
+                memo[key] = self._decode(response, outputformat, encoding)
+            return memo[key]
+        return self._decode(response, outputformat, encoding)
+
+    def stream_parser(self, outputformat, encoding, stream=True):
+        """
+        Returns an incremental parser for streamed responses of the output format. A parser has the methods feed(chunk)
+        and close(), both return a list of parsed items.
+
+        :param stream: True or 'dict'. With 'dict', formats which would yield other objects (e.g. xml elements)
+            yield dicts instead
+        :return: a parser or None if the response should be streamed as plain text
+        """
+        if not encoding:
+            return None
+        if hasattr(self, '_stream_' + outputformat):
+            return getattr(self, '_stream_' + outputformat)(stream == 'dict')
+        return None
+
+    def _stream_json(self, as_dict):
+        return JsonArrayParser()
+
+    def _stream_xml(self, as_dict):
+        return XmlElementParser(as_dict)
+
+    def _stream_m3u(self, as_dict):
+        from .playlist import M3uParser
+        return M3uParser()
+
+    def _stream_pls(self, as_dict):
+        from .playlist import PlsParser
+        return PlsParser()
+
+    def _stream_xspf(self, as_dict):
+        from .playlist import XspfParser
+        return XspfParser()
+
+    def _stream_ttl(self, as_dict):
+        from .playlist import TtlParser
+        return TtlParser()
+
+    def _decode(self, response, outputformat, encoding):
+        if encoding == 'table':
+            return self._to_table(self._decode(response, outputformat, True))
         if hasattr(self, '_to_' + outputformat) and encoding:
             func = getattr(self, '_to_' + outputformat)
-            return func(r)
-        return self._to_plain(r)
+            return func(response)
+        return self._to_plain(response)
 
     def _to_json(self, request):
-        return json.loads(request.text)
+        return self.json_loads(request.content)
 
     def _to_xml(self, request):
-        if PY3:
-            return ET.fromstring(request.text)
-        return ET.fromstring(request.text.encode('UTF-8'))
+        import xml.etree.ElementTree as ET
+        return ET.fromstring(request.content)
+
+    def _to_m3u(self, request):
+        from .playlist import M3uParser, parse
+        return parse(M3uParser(), request.content)
+
+    def _to_pls(self, request):
+        from .playlist import PlsParser, parse
+        return parse(PlsParser(), request.content)
+
+    def _to_xspf(self, request):
+        from .playlist import XspfParser, parse
+        return parse(XspfParser(), request.content)
+
+    def _to_ttl(self, request):
+        from .playlist import TtlParser, parse
+        return parse(TtlParser(), request.content)
 
     def _to_plain(self, request):
         return request.text
+
+    def _to_table(self, decoded):
+        import xml.etree.ElementTree as ET
+        from .table import StationTable
+
+        if isinstance(decoded, list):
+            return StationTable(decoded)
+        if isinstance(decoded, ET.Element):
+            return StationTable(element_to_dict(element) for element in decoded)
+        return decoded
+
+
+class BaseRequest(ResponseDecoder):
+    """
+    Cache handling and instrumentation shared by the http clients. Subclasses set the attributes cache (a
+    ResponseCache or None), validators (a ValidatorStore or None) and instrumentation (an Instrumentation or None).
+    """
+
+    def _start_event(self, endpoint, family, url, params):
+        if self.instrumentation is None:
+            return RequestEvent(endpoint, family, url, params)
+        return self.instrumentation.start(endpoint, family, url, params)
+
+    def _finish_event(self, event, error=None):
+        if self.instrumentation is not None:
+            self.instrumentation.finish(event, error)
+
+    def _decode_event(self, event, response, outputformat, encoding):
+        """
+        Decodes a response and records its status and parse time in the event.
+        """
+        event.status = response.status_code
+        start = time.time()
+        result = self.decode(response, outputformat, encoding)
+        event.add_time('parse', time.time() - start)
+        return result
+
+    def _lookup(self, endpoint, url, params):
+        """
+        Looks up a request in the caches.
+
+        :return: tuple of a fresh cached response (or None), the stored response to revalidate (or None) and the
+            conditional headers to send
+        """
+        if self.cache is not None:
+            response = self.cache.get(endpoint, url, params)
+            if response is not None:
+                return response, None, None
+        if self.validators is not None:
+            stored = self.validators.get(endpoint, url, params)
+            if stored is not None:
+                return None, stored, self.validators.conditional_headers(stored)
+        return None, None, None
+
+    def _store(self, endpoint, url, params, response, stored):
+        """
+        Stores a received response in the caches.
+
+        :param response: BufferedResponse received from the webservice
+        :param stored: the response which was revalidated, if any
+        :return: the response to decode. On 304 Not Modified this is the stored response
+        """
+        if response.status_code == 304 and stored is not None:
+            self.validators.refresh(stored, response)
+            response = stored
+        elif response.status_code == 200 and self.validators is not None:
+            response = self.validators.set(endpoint, url, params, response)
+        if self.cache is not None and response.status_code == 200:
+            self.cache.set(endpoint, url, params, response)
+        return response
+
+
+class RadioBrowserRequest(BaseRequest):
+
+    def __init__(self, app_name, app_version, pool_connections=10, pool_maxsize=10, keep_alive=True, headers=None,
+                 timeout=None, cache=None, validators=None, scheduler=None, mirrors=None, coalesce=False,
+                 json_backend='auto', instrumentation=None):
+        """
+        Inits a request object which owns a pooled http session. All requests made through one instance share its
+        connection pool, so connections to the webservice are kept alive and reused between api calls.
+
+        :param str app_name: name of the application, sent in the user-agent header
+        :param str app_version: version of the application, sent in the user-agent header
+        :param int pool_connections: number of hosts the session keeps connection pools for
+        :param int pool_maxsize: maximum number of connections kept per host
+        :param bool keep_alive: if False, every request asks the server to close the connection afterwards
+        :param dict headers: additional default headers sent with every request
+        :param timeout: default timeout in seconds for every request, either a float or a (connect, read) tuple.
+            None waits forever
+        :param ResponseCache cache: if set, responses of read-only endpoints are served from this cache
+        :param ValidatorStore validators: if set, ETag and Last-Modified validators of responses are stored and sent
+            with repeated requests, a 304 Not Modified answer is served from the stored body
+        :param RequestScheduler scheduler: if set, all requests are rate limited and retried by this scheduler
+        :param MirrorPool mirrors: if set, requests are sent to the fastest healthy mirror of the pool and fail over to
+            the next mirror
+        :param bool coalesce: if True, concurrent identical requests (same url, parameters and decoding) are sent only
+            once and all callers get the result of this request. Note that they get the same python object, which
+            must therefore not be modified. Endpoints with side effects are never coalesced
+        :param json_backend: library decoding json responses: 'auto' (the fastest installed one), 'orjson', 'ujson',
+            'json' or a function taking bytes. Streamed json is always decoded with the stdlib
+        :param Instrumentation instrumentation: if set, its hooks are called with a RequestEvent before and after every
+            request
+
+        Responses are requested compressed (gzip, deflate and br if brotli is installed) and decompressed while
+        reading. The bytes received on the wire and after decompression are counted in transfer_stats.
+        """
+        self.header = {'user-agent': app_name + '/' + app_version, 'accept-encoding': accept_encoding()}
+        if headers is not None:
+            self.header.update(headers)
+        if not keep_alive:
+            self.header['connection'] = 'close'
+        self.timeout = timeout
+        self.cache = cache
+        self.validators = validators
+        self.scheduler = scheduler
+        self.mirrors = mirrors
+        self.singleflight = SingleFlight() if coalesce else None
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.json_backend, self.json_loads = load_backend(json_backend)
+        self.transfer_stats = TransferStats()
+        self.instrumentation = instrumentation
+        self.transient_errors = transient_errors()
+        self.connect_errors = connect_errors()
+        self.session = requests.Session()
+        self.session.headers.update(self.header)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def __call__(self, url, outputformat='json', encoding=False, params=None, timeout=None, endpoint=None,
+                 family=None, stream=False):
+        """
+        Sends a request to the webservice.
+
+        :param str url: url of the request
+        :param str outputformat: format of the response
+        :param bool encoding: if True and supported by the output format, the response becomes decoded
+        :param dict params: request parameters
+        :param timeout: timeout of this request, overrides the default timeout
+        :param str endpoint: name of the api method, used to look up cache settings
+        :param str family: endpoint family of the api method, used by the scheduler
+        :param stream: if True, an iterator is returned which yields the decoded elements of the response (e.g.
+            single station dicts or station elements) while the body is still downloading. 'dict' yields xml elements
+            as dicts. Without encoding it yields text chunks. Streamed responses bypass all caches. The connection
+            is released when the iterator is exhausted, closed or garbage collected
+        :return: the response text, the decoded response or an iterator when streaming
+        :raises requests.HTTPError: if a streamed request fails with an http error status
+        """
+        if timeout is None:
+            timeout = self.timeout
+        event = self._start_event(endpoint, family, url, params)
+        try:
+            if stream:
+                event.stream = True
+                r = self._send(family, url, params, timeout, event=event, endpoint=endpoint)
+                if r.status_code >= 400:
+                    r.close()
+                    r.raise_for_status()
+                items = self._iter_stream(r, self.stream_parser(outputformat, encoding, stream), event)
+                # runs the generator into its try block, so its finally closes the response even if it is never
+                # iterated
+                next(items)
+                return items
+            if self.singleflight is None or endpoint in MUTATING_ENDPOINTS:
+                result = self._fetch(url, outputformat, encoding, params, timeout, endpoint, family, event)
+            else:
+                result, leader = self.singleflight.do((request_key(url, params), outputformat, encoding),
+                                                      lambda: (self._fetch(url, outputformat, encoding, params,
+                                                                           timeout, endpoint, family, event), event))
+                coalesced(event, leader)
+        except Exception as e:
+            self._finish_event(event, e)
+            raise
+        self._finish_event(event)
+        return result
+
+    def _fetch(self, url, outputformat, encoding, params, timeout, endpoint, family, event):
+        r, stored, headers = self._lookup(endpoint, url, params)
+        if r is None:
+            r = self._send(family, url, params, timeout, headers, event, endpoint, read=True)
+            if self.cache is not None or self.validators is not None:
+                r = self._store(endpoint, url, params, r, stored)
+        else:
+            event.cached = True
+        return self._decode_event(event, r, outputformat, encoding)
+
+    def _send(self, family, url, params, timeout, headers=None, event=None, endpoint=None, read=False):
+        """
+        Sends a request through the scheduler and the mirrors, if configured.
+
+        :param bool read: if True, the body is read while the request holds its scheduler slot and a BufferedResponse
+            is returned. Otherwise the streamed response is returned once the headers arrived
+        """
+        # bodies are always read by _iter_body, which decompresses them and counts the transferred bytes
+        def send():
+            if self.mirrors is None:
+                response = self.session.get(url, params=params, timeout=timeout, headers=headers, stream=True)
+            else:
+                response = self._send_to_mirrors(url, params, timeout, headers, endpoint)
+            if event is not None:
+                event.status = response.status_code
+                event.timings['ttfb'] = response.elapsed.total_seconds()
+            return self._read(response, event) if read else response
+
+        if self.scheduler is None:
+            return send()
+        return self.scheduler.call(family, send, self.transient_errors, endpoint, self.connect_errors)
+
+    def _send_to_mirrors(self, url, params, timeout, headers, endpoint=None):
+        # like the scheduler, requests with side effects only fail over if they cannot have reached the mirror
+        mutating = endpoint in MUTATING_ENDPOINTS
+        response = None
+        error = None
+        for mirror in self.mirrors.candidates(self.session):
+            if response is not None:
+                response.close()
+            try:
+                response = self.session.get(self.mirrors.rewrite(url, mirror), params=params, timeout=timeout,
+                                            headers=headers, stream=True)
+            except self.transient_errors as e:
+                self.mirrors.report(mirror, failed=True)
+                if mutating and not isinstance(e, self.connect_errors):
+                    raise
+                response, error = None, e
+                continue
+            if response.status_code >= 500:
+                self.mirrors.report(mirror, failed=True)
+                if mutating:
+                    return response
+                continue
+            self.mirrors.report(mirror, response.elapsed.total_seconds())
+            return response
+        if response is None:
+            if error is None:
+                import requests
+
+                raise requests.exceptions.ConnectionError('no mirror of the webservice is available')
+            raise error
+        return response
+
+    def _iter_body(self, response, event):
+        """
+        :return: generator of the decompressed chunks of the body of a response sent with stream=True
+        """
+        chunks = response.raw.stream(STREAM_CHUNK_SIZE, decode_content=False)
+        return decompress_chunks(chunks, response.headers.get('content-encoding'), [self.transfer_stats, event],
+                                 response.url)
+
+    def _read(self, response, event):
+        """
+        Reads the body of a response sent with stream=True and releases the connection to the pool.
+
+        :return: BufferedResponse with the decompressed body
+        """
+        start = time.time()
+        try:
+            content = b''.join(self._iter_body(response, event))
+        finally:
+            response.close()
+        event.timings['download'] = time.time() - start
+        return BufferedResponse(content, response.encoding, response.status_code, dict(response.headers))
+
+    def _iter_stream(self, response, parser, event):
+        # the download time of a stream includes the time the consumer spends between the items
+        start = time.time()
+        error = None
+        body = self._iter_body(response, event)
+        try:
+            yield None  # primed by __call__
+            if parser is None:
+                decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')('replace')
+                for chunk in body:
+                    yield decoder.decode(chunk)
+                tail = decoder.decode(b'', True)
+                if tail:
+                    yield tail
+                return
+            for chunk in body:
+                parse_start = time.time()
+                items = parser.feed(chunk)
+                event.add_time('parse', time.time() - parse_start)
+                for item in items:
+                    yield item
+            parse_start = time.time()
+            items = parser.close()
+            event.add_time('parse', time.time() - parse_start)
+            for item in items:
+                yield item
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            body.close()
+            response.close()
+            event.timings['download'] = time.time() - start - (event.timings['parse'] or 0.0)
+            self._finish_event(event, error)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Closes all pooled connections of the session.
+        """
+        self.session.close()
@@ -0,0 +1,247 @@
+import posixpath
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+from .cache import MemoryCache
+from .singleflight import SingleFlight
+
+# playlists are recognized by the extension of the url path, m3u8 is left alone because it is an hls stream
+PLAYLIST_EXTENSIONS = {'.pls': 'pls', '.m3u': 'm3u', '.xspf': 'xspf'}
+
+PLAYLIST_TYPES = {
+    'audio/x-scpls': 'pls',
+    'audio/scpls': 'pls',
+    'audio/x-mpegurl': 'm3u',
+    'audio/mpegurl': 'm3u',
+    'application/xspf+xml': 'xspf',
+}
+
+# content types which say nothing about the body, playlists served with them are recognized by the url extension.
+# Any other type which is neither a playlist nor audio, e.g. an html error page, fails the resolution
+GENERIC_TYPES = ('', 'text/plain', 'application/octet-stream')
+
+SOURCES = ('cache', 'station', 'playlist', 'service')
+
+
+def playlist_kind(url):
+    """
+    :return: 'pls', 'm3u' or 'xspf' if the url points to a playlist, otherwise None
+    """
+    return PLAYLIST_EXTENSIONS.get(posixpath.splitext(urlsplit(url).path)[1].lower())
+
+
+def service_url(result):
+    """
+    :param result: decoded result of playable_url in any output format
+    :return: the playable url or None if the webservice could not resolve the station
+    """
+    if isinstance(result, dict):
+        if str(result.get('ok', 'true')).lower() == 'false':
+            return None
+        return result.get('url') or None
+    if isinstance(result, list):
+        for entry in result:
+            if isinstance(entry, dict) and entry.get('url'):
+                return entry['url']
+        return None
+    if hasattr(result, 'iter'):
+        for element in result.iter():
+            if element.get('url'):
+                return None if element.get('ok') == 'false' else element.get('url')
+    return None
+
+
+class PlayableUrlResolver(object):
+
+    def __init__(self, facade, backend=None, ttl=3600, index=None, local=True, timeout=5, max_playlist_bytes=65536,
+                 max_depth=2, user_agent='radiobrowserpy/0.0.1', clock=time.time):
+        """
+        Resolves stations to playable stream urls and caches the result per station uuid.
+
+        A station record is resolved without calling the webservice: its url_resolved is used, or its url if that is
+        not a playlist. pls, m3u and xspf playlists are downloaded from the station and their first entry is used.
+        Only stations without usable record, e.g. given by uuid alone, are resolved with playable_url, which also
+        counts a click for them.
+
+        Cache entries expire after ttl seconds and are dropped as soon as a station record with another
+        lastchangetime is resolved or passed to update. Concurrent resolutions of the same station run once.
+
+        :param ApiFacade facade: facade used for playable_url
+        :param backend: storage of the entries, a MemoryCache with 4096 entries by default. Any object with get, set,
+            delete and clear methods works, e.g. a DiskCache to keep resolutions across restarts
+        :param ttl: seconds a resolved url is used
+        :param StationIndex index: if set, station records of uuids are looked up in it, e.g. the index of a
+            StationSync
+        :param bool local: if False, every station is resolved with playable_url
+        :param timeout: timeout in seconds for downloading a playlist
+        :param int max_playlist_bytes: playlists are only read up to this size
+        :param int max_depth: number of nested playlists followed
+        :param str user_agent: user agent sent when downloading playlists
+        :param clock: function returning the current unix time
+        """
+        self.facade = facade
+        self.backend = MemoryCache(4096) if backend is None else backend
+        self.ttl = ttl
+        self.index = index
+        self.local = local
+        self.timeout = timeout
+        self.max_playlist_bytes = max_playlist_bytes
+        self.max_depth = max_depth
+        self.user_agent = user_agent
+        self.clock = clock
+        self.stats = dict((source, 0) for source in SOURCES + ('failed',))
+        self._lock = threading.Lock()
+        self._singleflight = SingleFlight()
+        self._session = None
+
+    def resolve(self, station):
+        """
+        :param station: station dict or uuid
+        :return: the playable url or None if the station could not be resolved
+        """
+        if isinstance(station, dict):
+            uuid = station['stationuuid']
+        else:
+            uuid = station
+            station = self.index.get(uuid) if self.index is not None else None
+        lastchange = station.get('lastchangetime') if station is not None else None
+        url = self._cached(uuid, lastchange)
+        if url is not None:
+            self._count('cache')
+            return url
+        return self._singleflight.do(uuid, lambda: self._resolve(uuid, station, lastchange))
+
+    def resolve_many(self, stations, max_workers=16):
+        """
+        Resolves stations concurrently on a bounded thread pool. Like ApiFacade.batch, a station whose resolution
+        raised an exception has the exception instance as its result.
+
+        :param stations: iterable of station dicts or uuids
+        :return: list of urls, None or exceptions, one per station
+        """
+        def run(station):
+            try:
+                return self.resolve(station)
+            except Exception as e:
+                return e
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(run, stations))
+
+    def update(self, stations):
+        """
+        Drops the entries of stations whose lastchangetime differs from the one they were resolved with, e.g. for the
+        results of changed_stations.
+        """
+        for station in stations:
+            entry = self.backend.get(station['stationuuid'])
+            if entry is not None and entry[1] is not None and entry[1] != station.get('lastchangetime'):
+                self.backend.delete(station['stationuuid'])
+
+    def invalidate(self, stationuuid):
+        self.backend.delete(stationuuid)
+
+    def clear(self):
+        self.backend.clear()
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def _cached(self, uuid, lastchange):
+        entry = self.backend.get(uuid)
+        if entry is None:
+            return None
+        expires, resolved_lastchange, url = entry
+        if expires <= self.clock():
+            return None
+        if lastchange is not None and resolved_lastchange is not None and lastchange != resolved_lastchange:
+            self.backend.delete(uuid)
+            return None
+        return url
+
+    def _resolve(self, uuid, station, lastchange):
+        source, url = None, None
+        if self.local and station is not None:
+            source, url = self._resolve_station(station)
+        if url is None:
+            source, url = 'service', service_url(self.facade.playable_url(uuid, encoding=True))
+        if url is None:
+            self._count('failed')
+            return None
+        self._count(source)
+        self.backend.set(uuid, (self.clock() + self.ttl, lastchange, url))
+        return url
+
+    def _resolve_station(self, station):
+        if station.get('url_resolved'):
+            return 'station', station['url_resolved']
+        url = station.get('url')
+        if not url:
+            return None, None
+        if playlist_kind(url) is None:
+            return 'station', url
+        return 'playlist', self._resolve_playlist(url, self.max_depth)
+
+    def _resolve_playlist(self, url, depth):
+        """
+        :return: the first entry of the playlist, None if it could not be read
+        """
+        import requests
+
+        try:
+            entry = self._first_entry(url)
+        except (requests.exceptions.RequestException, ValueError, SyntaxError):
+            # SyntaxError is the base of the ParseError of broken xspf files
+            return None
+        if entry is not None and entry != url and playlist_kind(entry) is not None:
+            return self._resolve_playlist(entry, depth - 1) if depth > 1 else None
+        return entry
+
+    def _first_entry(self, url):
+        from .playlist import M3uParser, PlsParser, XspfParser
+
+        with self._get_session().get(url, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                return None
+            content_type = response.headers.get('content-type', '').split(';')[0].strip().lower()
+            kind = PLAYLIST_TYPES.get(content_type)
+            if kind is None and content_type.startswith('audio/'):
+                # a stream behind a playlist name
+                return url
+            if kind is None and content_type not in GENERIC_TYPES:
+                return None
+            kind = kind or playlist_kind(url)
+            base = response.url or url
+            parser = {'pls': PlsParser, 'm3u': M3uParser, 'xspf': XspfParser}[kind]()
+            size = 0
+            # stop at the first entry, the rest of the playlist is not needed
+            for chunk in response.iter_content(4096):
+                size += len(chunk)
+                entries = parser.feed(chunk)
+                if entries or size >= self.max_playlist_bytes:
+                    break
+            else:
+                entries = parser.close()
+        for entry in entries:
+            if entry.get('url'):
+                entry = urljoin(base, entry['url'].strip())
+                return entry if urlsplit(entry).scheme in ('http', 'https') else None
+        return None
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+
+                self._session = requests.Session()
+                self._session.headers['user-agent'] = self.user_agent
+            return self._session
+
+    def _count(self, source):
+        with self._lock:
+            self.stats[source] += 1
@@ -0,0 +1,212 @@
+import email.utils
+import random
+import threading
+import time
+import weakref
+
+from .constants import MUTATING_ENDPOINTS
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+class TokenBucket(object):
+    """
+    Thread safe token bucket. Tokens refill continuously with rate per second up to capacity, every request takes one.
+    """
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        """
+        :param float rate: tokens added per second
+        :param int capacity: maximum number of tokens, i.e. the allowed burst. Defaults to max(1, rate)
+        :param clock: monotonic clock function
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1, rate))
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Takes a token.
+
+        :return: seconds to wait before the token may be used
+        """
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+class RequestScheduler(object):
+
+    def __init__(self, rates=None, default_rate=None, max_concurrency=None, retries=3, backoff=0.5, max_backoff=30.0,
+                 jitter=True, retry_statuses=RETRY_STATUSES, sleep=time.sleep):
+        """
+        Schedules the requests of a RadioBrowserRequest or AsyncRadioBrowserRequest. Requests are throttled with one
+        token bucket per endpoint family, the number of simultaneous requests is bounded and transient failures
+        (connection errors, timeouts and the retry_statuses) are retried with exponential backoff. A Retry-After
+        header of the webservice is respected.
+
+        Requests of endpoints with side effects (constants.MUTATING_ENDPOINTS: votes, clicks counted by playable_url and
+        station edits) are only retried if they cannot have reached the webservice, i.e. after a failed connection
+        attempt or a 429 Too Many Requests. Retrying them after a timeout or a 5xx could vote, click or add a station
+        twice.
+
+        The endpoint families are 'radio' (RadioApi), 'play' (PlayRadioApi) and 'search' (SearchRadioApi). Requests
+        without family, e.g. arbitrary requests, use the default rate.
+
+        :param dict rates: requests per second per family, either a number or a (rate, burst) tuple
+        :param default_rate: requests per second of families without own rate, None for unlimited
+        :param int max_concurrency: maximum number of simultaneous requests, None for unlimited. A request holds its
+            slot until its body was read, except for streamed responses, whose slot is released once the headers
+            arrived
+        :param int retries: number of retries of a failing request
+        :param float backoff: delay in seconds before the first retry, doubled for every further retry
+        :param float max_backoff: maximum delay between two attempts, also caps Retry-After
+        :param bool jitter: if True, delays are randomized between zero and the backoff ("full jitter")
+        :param retry_statuses: http status codes which are retried
+        :param sleep: sleep function of the synchronous client
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.retry_statuses = frozenset(retry_statuses)
+        self.sleep = sleep
+        self.max_concurrency = max_concurrency
+        self._buckets = {}
+        for family, rate in (rates or {}).items():
+            self._buckets[family] = self._bucket(rate)
+        self._default_bucket = None if default_rate is None else self._bucket(default_rate)
+        self._semaphore = None if max_concurrency is None else threading.BoundedSemaphore(max_concurrency)
+        self._async_semaphores = weakref.WeakKeyDictionary()
+
+    @staticmethod
+    def _bucket(rate):
+        if isinstance(rate, tuple):
+            return TokenBucket(*rate)
+        return TokenBucket(rate)
+
+    def call(self, family, send, transient_errors=(), endpoint=None, connect_errors=()):
+        """
+        Sends a request through the scheduler.
+
+        :param str family: endpoint family of the request
+        :param send: function sending the request and returning the response
+        :param tuple transient_errors: exception types which are retried
+        :param str endpoint: name of the api method
+        :param tuple connect_errors: exception types raised before the request was sent, the only errors retried for
+            mutating endpoints
+        :return: the response of the last attempt
+        """
+        transient_errors, retry_statuses = self._retryable(endpoint, transient_errors, connect_errors)
+        for attempt in range(self.retries + 1):
+            wait = self._reserve(family)
+            if wait:
+                self.sleep(wait)
+            try:
+                if self._semaphore is None:
+                    response = send()
+                else:
+                    with self._semaphore:
+                        response = send()
+            except transient_errors:
+                if attempt == self.retries:
+                    raise
+                self.sleep(self.delay(attempt))
+                continue
+            if response.status_code not in retry_statuses or attempt == self.retries:
+                return response
+            if hasattr(response, 'close'):
+                response.close()
+            self.sleep(self.delay(attempt, response))
+
+    async def acall(self, family, send, transient_errors=(), endpoint=None, connect_errors=()):
+        """
+        Asynchronous variant of call, send is a coroutine function.
+        """
+        import asyncio
+
+        transient_errors, retry_statuses = self._retryable(endpoint, transient_errors, connect_errors)
+        semaphore = self._async_semaphore()
+        for attempt in range(self.retries + 1):
+            wait = self._reserve(family)
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                if semaphore is None:
+                    response = await send()
+                else:
+                    async with semaphore:
+                        response = await send()
+            except transient_errors:
+                if attempt == self.retries:
+                    raise
+                await asyncio.sleep(self.delay(attempt))
+                continue
+            if response.status_code not in retry_statuses or attempt == self.retries:
+                return response
+            if hasattr(response, 'close'):
+                response.close()
+            await asyncio.sleep(self.delay(attempt, response))
+
+    def _retryable(self, endpoint, transient_errors, connect_errors):
+        """
+        :return: tuple of the exception types and the statuses which are retried for an endpoint
+        """
+        if endpoint in MUTATING_ENDPOINTS:
+            return connect_errors, self.retry_statuses & frozenset([429])
+        return transient_errors, self.retry_statuses
+
+    def delay(self, attempt, response=None):
+        """
+        :param int attempt: number of the failed attempt, starting at 0
+        :param response: the failed response, if any
+        :return: seconds to wait before the next attempt
+        """
+        retry_after = self._retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        delay = min(self.backoff * 2 ** attempt, self.max_backoff)
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        return delay
+
+    def _reserve(self, family):
+        bucket = self._buckets.get(family, self._default_bucket)
+        if bucket is None:
+            return 0
+        return bucket.reserve()
+
+    def _async_semaphore(self):
+        import asyncio
+
+        if self.max_concurrency is None:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._async_semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @staticmethod
+    def _retry_after(response):
+        if response is None:
+            return None
+        value = response.headers.get('retry-after')
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0.0, email.utils.mktime_tz(date) - time.time())
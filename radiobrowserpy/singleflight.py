@@ -0,0 +1,71 @@
+import threading
+
+
+class _Call(object):
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    """
+    Deduplicates concurrent calls: while a call for a key is running, further calls with the same key wait for it and
+    get its result (or its exception) instead of running again.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """
+        :param key: hashable key of the call
+        :param func: function without arguments doing the work
+        :return: the result of func, possibly computed for another caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        return call.result
+
+
+class AsyncSingleFlight(object):
+    """
+    asyncio variant of SingleFlight for coroutine functions.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, func):
+        """
+        :param key: hashable key of the call
+        :param func: coroutine function without arguments doing the work
+        :return: the result of func, possibly computed for another caller
+        """
+        import asyncio
+
+        future = self._calls.get(key)
+        if future is None:
+            future = self._calls[key] = asyncio.ensure_future(func())
+            future.add_done_callback(lambda f: self._calls.pop(key, None))
+        return await asyncio.shield(future)
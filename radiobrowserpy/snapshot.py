@@ -0,0 +1,201 @@
+import mmap
+import os
+import struct
+from array import array
+
+from .table import NUMERIC_COLUMNS, _int
+
+MAGIC = b'RBSNAP01'
+_HEADER = struct.Struct('<8sQII')
+_NAME_LENGTH = struct.Struct('<H')
+
+
+def _align(position):
+    return (position + 7) & ~7
+
+
+def write_snapshot(stations, path):
+    """
+    Writes a station list into a binary snapshot file which can be opened with Snapshot. The file is written to a
+    temporary file first and then moved to path, so processes which have the old snapshot open keep a consistent copy.
+
+    Layout: header, column names, one int64 array per numeric column, one uint64 offset array plus utf-8 blob per
+    string column and a uint32 array of the row numbers sorted by stationuuid.
+
+    :param stations: list of station dicts, e.g. the decoded result of ApiFacade.stations, or a StationTable
+    :param str path: path of the snapshot file
+    """
+    stations = [s if isinstance(s, dict) else s.to_dict() for s in stations]
+    names = []
+    for station in stations:
+        for name in station:
+            if name not in names:
+                names.append(name)
+    numeric = [name for name in names if name in NUMERIC_COLUMNS]
+    strings = [name for name in names if name not in NUMERIC_COLUMNS]
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, len(stations), len(numeric), len(strings)))
+        for name in numeric + strings:
+            encoded = name.encode('utf-8')
+            f.write(_NAME_LENGTH.pack(len(encoded)) + encoded)
+        _pad(f)
+        for name in numeric:
+            array('q', (_int(station.get(name)) for station in stations)).tofile(f)
+        for name in strings:
+            offsets = array('Q', [0])
+            blob = bytearray()
+            for station in stations:
+                value = station.get(name)
+                if value is not None:
+                    blob += (value if isinstance(value, str) else str(value)).encode('utf-8')
+                offsets.append(len(blob))
+            offsets.tofile(f)
+            f.write(blob)
+            _pad(f)
+        if 'stationuuid' in strings:
+            order = sorted(range(len(stations)), key=lambda i: stations[i].get('stationuuid') or '')
+            array('I', order).tofile(f)
+    os.replace(tmp_path, path)
+
+
+def _pad(f):
+    position = f.tell()
+    f.write(b'\0' * (_align(position) - position))
+
+
+class Snapshot(object):
+    """
+    Read-only, memory-mapped station snapshot written by write_snapshot. Nothing is parsed or copied on open, rows and
+    columns are read from the mapped file on access. All processes which open the same file share its pages through
+    the page cache.
+
+    Example:
+        write_snapshot(ApiFacade(encoding=True).stations(), 'stations.snap')
+        with Snapshot('stations.snap') as snapshot:
+            station = snapshot.get('9617a958-0601-11e8-ae97-52543be04c81')
+    """
+
+    def __init__(self, path):
+        """
+        :param str path: path of the snapshot file
+        :raises ValueError: if the file is no station snapshot or truncated
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise ValueError('%s is no station snapshot' % path)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+        self._numeric = {}
+        self._strings = {}
+        self._uuid_order = None
+        try:
+            self._map_columns(path)
+        except ValueError:
+            self.close()
+            raise
+        except (struct.error, IndexError):
+            self.close()
+            raise ValueError('%s is a truncated station snapshot' % path)
+
+    def _map_columns(self, path):
+        magic, self._length, numeric_count, string_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError('%s is no station snapshot' % path)
+        position = _HEADER.size
+        names = []
+        for _ in range(numeric_count + string_count):
+            length, = _NAME_LENGTH.unpack_from(self._mmap, position)
+            position += _NAME_LENGTH.size
+            names.append(self._region(position, length).tobytes().decode('utf-8'))
+            position += length
+        position = _align(position)
+        self.column_names = names
+        for name in names[:numeric_count]:
+            self._numeric[name] = self._region(position, 8 * self._length).cast('q')
+            position += 8 * self._length
+        for name in names[numeric_count:]:
+            offsets = self._region(position, 8 * (self._length + 1)).cast('Q')
+            position += 8 * (self._length + 1)
+            self._strings[name] = (offsets, position)
+            self._region(position, offsets[self._length])
+            position = _align(position + offsets[self._length])
+        if 'stationuuid' in self._strings:
+            self._uuid_order = self._region(position, 4 * self._length).cast('I')
+
+    def _region(self, position, size):
+        if position + size > len(self._mmap):
+            raise IndexError('snapshot region beyond the end of the file')
+        return self._view[position:position + size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        """
+        Unmaps the file. Rows and columns can not be accessed afterwards.
+        """
+        for column in self._numeric.values():
+            column.release()
+        for offsets, _ in self._strings.values():
+            offsets.release()
+        if self._uuid_order is not None:
+            self._uuid_order.release()
+        self._numeric = {}
+        self._strings = {}
+        self._uuid_order = None
+        self._view.release()
+        self._mmap.close()
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('station index out of range')
+        return dict((name, self.value(index, name)) for name in self.column_names)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield self[index]
+
+    def value(self, index, name):
+        """
+        :return: the value of one column of the row at index
+        """
+        if name in self._numeric:
+            return self._numeric[name][index]
+        offsets, start = self._strings[name]
+        return self._mmap[start + offsets[index]:start + offsets[index + 1]].decode('utf-8')
+
+    def column(self, name):
+        """
+        :return: all values of a column as list
+        """
+        if name in self._numeric:
+            return self._numeric[name].tolist()
+        return [self.value(index, name) for index in range(self._length)]
+
+    def get(self, stationuuid):
+        """
+        Looks up a station by its uuid with a binary search over the uuid index of the file.
+
+        :return: the station dict or None
+        """
+        if self._uuid_order is None:
+            return None
+        low, high = 0, self._length
+        while low < high:
+            middle = (low + high) // 2
+            if self.value(self._uuid_order[middle], 'stationuuid') < stationuuid:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._length and self.value(self._uuid_order[low], 'stationuuid') == stationuuid:
+            return self[self._uuid_order[low]]
+        return None
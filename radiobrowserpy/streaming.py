@@ -0,0 +1,189 @@
+import codecs
+import json
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = ' \t\n\r'
+
+
+class JsonArrayParser(object):
+    """
+    Incremental parser for json responses. Bytes are fed in chunks as they arrive and every complete element of the
+    top level array is returned as soon as it was received, so only one element is held in memory at a time. A top
+    level value which is no array is returned as a whole on close().
+
+    Example:
+        parser = JsonArrayParser()
+        for chunk in chunks:
+            for station in parser.feed(chunk):
+                ...
+        parser.close()
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8')('strict')
+        self._buffer = ''
+        self._is_array = None
+        self._done = False
+
+    def feed(self, data):
+        """
+        :param bytes data: next chunk of the response body
+        :return: list of the elements completed by this chunk
+        :raises ValueError: if the elements are not separated by commas
+        """
+        if isinstance(data, bytes):
+            data = self._text_decoder.decode(data)
+        self._buffer += data
+        if self._is_array is None:
+            self._buffer = self._buffer.lstrip(_WHITESPACE + u'\ufeff')
+            if not self._buffer:
+                return []
+            self._is_array = self._buffer[0] == '['
+            if self._is_array:
+                self._buffer = self._buffer[1:]
+        if not self._is_array or self._done:
+            return []
+        return self._parse()
+
+    def close(self):
+        """
+        Finishes parsing.
+
+        :return: list of remaining elements, i.e. the whole value if the response was no array
+        :raises ValueError: if the response was incomplete or no valid json
+        """
+        self._buffer += self._text_decoder.decode(b'', final=True)
+        if self._is_array is False:
+            value = json.loads(self._buffer)
+            self._buffer = ''
+            return [value]
+        if self._is_array is None or not self._done:
+            raise ValueError('incomplete json response')
+        if self._buffer.strip(_WHITESPACE):
+            raise ValueError('extra data after json array')
+        return []
+
+    def _parse(self):
+        items = []
+        buffer = self._buffer
+        pos = 0
+        end = len(buffer)
+        while True:
+            while pos < end and buffer[pos] in _WHITESPACE:
+                pos += 1
+            if pos == end:
+                break
+            if buffer[pos] == ']':
+                pos += 1
+                self._done = True
+                break
+            if buffer[pos] == ',':
+                pos += 1
+                continue
+            try:
+                item, item_end = self._decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break
+            next_pos = item_end
+            while next_pos < end and buffer[next_pos] in _WHITESPACE:
+                next_pos += 1
+            if next_pos == end:
+                # a number at the end of the buffer might continue in the next chunk
+                break
+            if buffer[next_pos] not in ',]':
+                if next_pos == item_end and isinstance(item, (int, float)) and not isinstance(item, bool):
+                    # the rest of a number split across chunks, e.g. '3' of '3.5' followed by '.'
+                    break
+                raise ValueError('invalid json array')
+            items.append(item)
+            pos = next_pos
+        self._buffer = buffer[pos:]
+        return items
+
+
+def iter_json(chunks):
+    """
+    Yields the elements of a json array from an iterable of body chunks.
+    """
+    parser = JsonArrayParser()
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+    for item in parser.close():
+        yield item
+
+
+class XmlElementParser(object):
+    """
+    Incremental parser for xml responses. Bytes are fed in chunks as they arrive and every complete child element of
+    the root element (e.g. one <station/>) is returned as soon as it was parsed. Returned elements are removed from the
+    tree, so memory stays bounded no matter how many elements the response has.
+    """
+
+    def __init__(self, as_dict=False):
+        """
+        :param bool as_dict: if True, elements are returned as dicts of their attributes and the text of their
+            children instead of Element objects
+        """
+        import xml.etree.ElementTree as ET
+
+        self.as_dict = as_dict
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._root = None
+        self._depth = 0
+
+    def feed(self, data):
+        """
+        :param bytes data: next chunk of the response body
+        :return: list of the elements completed by this chunk
+        """
+        self._parser.feed(data)
+        return self._read_events()
+
+    def close(self):
+        """
+        Finishes parsing.
+
+        :return: list of remaining elements
+        :raises ParseError: if the response was incomplete or no valid xml
+        """
+        self._parser.close()
+        return self._read_events()
+
+    def _read_events(self):
+        items = []
+        for event, element in self._parser.read_events():
+            if event == 'start':
+                self._depth += 1
+                if self._depth == 1:
+                    self._root = element
+                continue
+            self._depth -= 1
+            if self._depth == 1:
+                self._root.remove(element)
+                items.append(element_to_dict(element) if self.as_dict else element)
+        return items
+
+
+def element_to_dict(element):
+    """
+    Converts a station element of a xml response to a dict of its attributes and the text of its child elements.
+    """
+    result = dict(element.attrib)
+    for child in element:
+        result[child.tag] = child.text
+    return result
+
+
+def iter_xml(chunks, as_dict=False):
+    """
+    Yields the child elements of the root element of a xml response from an iterable of body chunks.
+    """
+    parser = XmlElementParser(as_dict)
+    for chunk in chunks:
+        for item in parser.feed(chunk):
+            yield item
+    for item in parser.close():
+        yield item
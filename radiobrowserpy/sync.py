@@ -0,0 +1,78 @@
+import threading
+import time
+
+from .index import StationIndex
+
+MAX_DELTA_AGE = 30 * 24 * 60 * 60
+
+
+class StationSync(object):
+
+    def __init__(self, facade, index=None, page_size=10000, overlap=60, clock=time.time):
+        """
+        Keeps a local snapshot of all stations up to date. The first sync loads the full station list, later syncs only
+        apply the changed and deleted stations since the last sync. A full reload is only done again when the last
+        sync is older than the 30 days the webservice keeps changes for.
+
+        :param ApiFacade facade: facade with json output format
+        :param StationIndex index: the snapshot to keep up to date, a new StationIndex by default
+        :param int page_size: number of stations requested per page of a full reload
+        :param int overlap: seconds the requested change window reaches back before the last sync, to not miss changes
+            made while the last sync was running
+        :param clock: function returning the current unix time
+        """
+        self.facade = facade
+        self.index = StationIndex() if index is None else index
+        self.page_size = page_size
+        self.overlap = overlap
+        self.clock = clock
+        self.watermark = None
+        self._lock = threading.Lock()
+
+    def sync(self):
+        """
+        Brings the snapshot up to date.
+
+        :return: dict with the keys 'full' (True if the whole list was reloaded), 'changed' and 'deleted' (number of
+            applied changes and deletions)
+        """
+        with self._lock:
+            now = self.clock()
+            if self.watermark is None or now - self.watermark + self.overlap >= MAX_DELTA_AGE:
+                result = self.reload()
+            else:
+                result = self.apply_deltas(int(now - self.watermark) + self.overlap)
+            self.watermark = now
+            return result
+
+    def reload(self):
+        """
+        Replaces the snapshot with the full station list.
+        """
+        seen = set()
+        for station in self.facade.iter_stations(page_size=self.page_size):
+            self.index.add(station)
+            seen.add(station['stationuuid'])
+        stale = [station['stationuuid'] for station in self.index if station['stationuuid'] not in seen]
+        for uuid in stale:
+            self.index.remove(uuid)
+        return {'full': True, 'changed': len(seen), 'deleted': len(stale)}
+
+    def apply_deltas(self, seconds):
+        """
+        Applies the station changes and deletions of the last seconds to the snapshot.
+        """
+        latest = {}
+        for station in self.facade.changed_stations(seconds=seconds, encoding=True):
+            current = latest.get(station['stationuuid'])
+            if current is None or station.get('lastchangetime', '') >= current.get('lastchangetime', ''):
+                latest[station['stationuuid']] = station
+        for station in latest.values():
+            self.index.add(station)
+        deleted = 0
+        for station in self.facade.deleted_stations(encoding=True):
+            current = self.index.get(station['stationuuid'])
+            if current is not None and station.get('lastchangetime', '') >= current.get('lastchangetime', ''):
+                self.index.remove(station['stationuuid'])
+                deleted += 1
+        return {'full': False, 'changed': len(latest), 'deleted': deleted}
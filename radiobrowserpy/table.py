@@ -0,0 +1,194 @@
+from array import array
+from sys import intern
+
+NUMERIC_COLUMNS = ('id', 'votes', 'negativevotes', 'bitrate', 'clickcount', 'clicktrend', 'lastcheckok', 'hls')
+CATEGORICAL_COLUMNS = ('country', 'countrycode', 'state', 'language', 'codec', 'tags')
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        try:
+            return int(float(value))
+        except (TypeError, ValueError):
+            return 0
+
+
+class _CategoricalColumn(object):
+    """
+    Dictionary encoded column: every distinct value is stored once, rows hold a small integer code.
+    """
+    __slots__ = ('values', 'codes', '_lookup')
+
+    def __init__(self):
+        self.values = []
+        self.codes = array('I')
+        self._lookup = {}
+
+    def append(self, value):
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, index):
+        return self.values[self.codes[index]]
+
+    def code(self, value):
+        return self._lookup.get(value)
+
+
+class StationRow(object):
+    """
+    Lightweight read-only view of one row of a StationTable. Supports the dict methods station code usually needs,
+    i.e. station['name'], station.get('tags'), keys(), items() and to_dict().
+    """
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        try:
+            column = self._table._columns[key]
+        except KeyError:
+            raise KeyError(key)
+        return column[self._index]
+
+    def __contains__(self, key):
+        return key in self._table._columns
+
+    def __iter__(self):
+        return iter(self._table.column_names)
+
+    def __len__(self):
+        return len(self._table.column_names)
+
+    def __eq__(self, other):
+        if isinstance(other, StationRow):
+            other = other.to_dict()
+        return self.to_dict() == other
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'StationRow(%r)' % self.to_dict()
+
+    def get(self, key, default=None):
+        column = self._table._columns.get(key)
+        if column is None:
+            return default
+        return column[self._index]
+
+    def keys(self):
+        return list(self._table.column_names)
+
+    def items(self):
+        return [(name, self[name]) for name in self._table.column_names]
+
+    def to_dict(self):
+        return dict(self.items())
+
+
+class StationTable(object):
+    """
+    Compact columnar representation of a station list. Numeric attributes like bitrate, votes and clickcount are stored
+    in arrays, categorical attributes like country, language, codec and tags are dictionary encoded and all other
+    strings are interned. Rows are accessed through StationRow views, which hold no data themselves. Numeric
+    attributes are returned as int.
+
+    Select it with encoding='table', e.g. ApiFacade(encoding='table').stations().
+    """
+
+    def __init__(self, stations=()):
+        """
+        :param stations: iterable of station dicts
+        """
+        self.column_names = []
+        self._columns = {}
+        self._length = 0
+        for station in stations:
+            self.append(station)
+
+    def append(self, station):
+        """
+        Appends a station dict as new row.
+        """
+        for name in station:
+            if name not in self._columns:
+                self._add_column(name)
+        for name in self.column_names:
+            value = station.get(name)
+            column = self._columns[name]
+            if isinstance(column, array):
+                column.append(_int(value))
+            elif isinstance(value, str):
+                column.append(intern(value))
+            else:
+                column.append(value)
+        self._length += 1
+
+    def _add_column(self, name):
+        if name in NUMERIC_COLUMNS:
+            column = array('q', [0]) * self._length
+        elif name in CATEGORICAL_COLUMNS:
+            column = _CategoricalColumn()
+            for _ in range(self._length):
+                column.append(None)
+        else:
+            column = [None] * self._length
+        self.column_names.append(name)
+        self._columns[name] = column
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [StationRow(self, i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('station index out of range')
+        return StationRow(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield StationRow(self, index)
+
+    def column(self, name):
+        """
+        :return: all values of a column as list
+        """
+        column = self._columns[name]
+        if isinstance(column, _CategoricalColumn):
+            return [column.values[code] for code in column.codes]
+        return list(column)
+
+    def categories(self, name):
+        """
+        :return: the distinct values of a categorical column
+        """
+        return list(self._columns[name].values)
+
+    def where(self, name, value):
+        """
+        :return: list of the rows whose column has the value
+        """
+        column = self._columns[name]
+        if isinstance(column, _CategoricalColumn):
+            code = column.code(value)
+            if code is None:
+                return []
+            return [StationRow(self, i) for i, c in enumerate(column.codes) if c == code]
+        return [StationRow(self, i) for i, v in enumerate(column) if v == value]
+
+    def to_dicts(self):
+        """
+        :return: the stations as list of dicts
+        """
+        return [row.to_dict() for row in self]
@@ -0,0 +1,302 @@
+"""
+Offline benchmark of representative api calls against a local stand-in webservice.
+
+The fake webservice serves synthetic station lists (or a recorded one, see --recorded) as json, xml, m3u and pls with
+a configurable number of stations and latency. Every case is measured for requests per second, latency percentiles,
+parse time and peak python memory. Results can be saved as a baseline and compared against it, the exit code is 1
+if a case regressed by more than the tolerance.
+
+    python -m radiobrowserpy.test.benchmark --stations 5000 --save baseline.json
+    python -m radiobrowserpy.test.benchmark --stations 5000 --compare baseline.json
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from xml.sax.saxutils import quoteattr
+
+from ..apifacade import ApiFacade
+from ..instrumentation import Instrumentation
+from .fakeserver import FakeWebservice
+
+COUNTRIES = ('Germany', 'Austria', 'France', 'Italy', 'Spain', 'The United States Of America', 'Brazil', 'Japan')
+TAGS = ('jazz', 'pop', 'rock', 'news', 'classical', 'dance', 'talk', 'oldies', 'electronic', 'country')
+CODECS = ('MP3', 'AAC', 'AAC+', 'OGG')
+
+# lower is better for all metrics except requests_per_sec
+METRICS = ('requests_per_sec', 'p50_ms', 'p90_ms', 'p99_ms', 'parse_ms', 'peak_memory_kb')
+
+
+def synthetic_stations(count):
+    """
+    :return: list of count station dicts with the fields and value shapes of the webservice
+    """
+    stations = []
+    for i in range(count):
+        country = COUNTRIES[i % len(COUNTRIES)]
+        stations.append({
+            'changeuuid': '%08x-0601-11e8-ae97-52543be04c81' % (i + 1000000),
+            'stationuuid': '%08x-0601-11e8-ae97-52543be04c81' % i,
+            'name': 'Radio %d %s' % (i, TAGS[i % len(TAGS)].title()),
+            'url': 'http://stream%d.example.com/live.mp3' % i,
+            'url_resolved': 'http://stream%d.example.com:8000/live.mp3' % i,
+            'homepage': 'http://radio%d.example.com/' % i,
+            'favicon': 'http://radio%d.example.com/favicon.png' % i,
+            'tags': ','.join(TAGS[(i + k) % len(TAGS)] for k in range(1 + i % 3)),
+            'country': country,
+            'countrycode': country[:2].upper(),
+            'state': '',
+            'language': 'german' if country in ('Germany', 'Austria') else 'english',
+            'votes': i % 997,
+            'lastchangetime': '2019-01-%02d 10:00:00' % (1 + i % 28),
+            'codec': CODECS[i % len(CODECS)],
+            'bitrate': (64, 128, 192, 320)[i % 4],
+            'hls': 0,
+            'lastcheckok': 1 if i % 11 else 0,
+            'lastchecktime': '2019-02-01 12:00:00',
+            'lastcheckoktime': '2019-02-01 12:00:00',
+            'clicktimestamp': '2019-02-01 13:00:00',
+            'clickcount': i % 5003,
+            'clicktrend': i % 7 - 3,
+        })
+    return stations
+
+
+def to_json(stations):
+    return json.dumps(stations)
+
+
+def to_xml(stations):
+    rows = []
+    for station in stations:
+        attributes = ' '.join('%s=%s' % (key, quoteattr(str(value))) for key, value in station.items())
+        rows.append('<station %s/>' % attributes)
+    return '<result>%s</result>' % ''.join(rows)
+
+
+def to_m3u(stations):
+    rows = ['#EXTM3U']
+    for station in stations:
+        rows.append('#EXTINF:1,%s' % station['name'])
+        rows.append(station['url'])
+    return '\n'.join(rows) + '\n'
+
+
+def to_pls(stations):
+    rows = ['[playlist]', 'NumberOfEntries=%d' % len(stations)]
+    for i, station in enumerate(stations, 1):
+        rows.extend(['File%d=%s' % (i, station['url']), 'Title%d=%s' % (i, station['name']), 'Length%d=-1' % i])
+    rows.append('Version=2')
+    return '\n'.join(rows) + '\n'
+
+
+def countries_of(stations):
+    counts = {}
+    for station in stations:
+        counts[station['country']] = counts.get(station['country'], 0) + 1
+    return [{'name': name, 'value': name, 'stationcount': count} for name, count in sorted(counts.items())]
+
+
+def benchmark_routes(stations):
+    """
+    :return: route table for FakeWebservice serving the station list in all benchmarked formats
+    """
+    station = stations[0]
+    playable = {'ok': 'true', 'message': 'retrieved station url', 'stationuuid': station['stationuuid'],
+                'name': station['name'], 'url': station['url']}
+    jazz = [s for s in stations if 'jazz' in s['tags']]
+    uuid = station['stationuuid']
+    routes = {
+        '/json/stations/': (200, {'Content-Type': 'application/json'}, to_json(stations)),
+        '/xml/stations/': (200, {'Content-Type': 'text/xml'}, to_xml(stations)),
+        '/json/stations/search/': (200, {'Content-Type': 'application/json'}, to_json(jazz)),
+        '/m3u/stations/search/': (200, {'Content-Type': 'audio/mpegurl'}, to_m3u(jazz)),
+        '/json/countries/': (200, {'Content-Type': 'application/json'}, json.dumps(countries_of(stations))),
+        '/v2/json/url/' + uuid: (200, {'Content-Type': 'application/json'}, json.dumps(playable)),
+        '/v2/pls/url/' + uuid: (200, {'Content-Type': 'audio/x-scpls'}, to_pls([station])),
+    }
+    # encoded once here, otherwise the server encodes a copy of the body per request inside the traced process and
+    # peak_memory_kb grows with the payload
+    return dict((path, (status, headers, body.encode('utf-8'))) for path, (status, headers, body) in routes.items())
+
+
+def benchmark_cases(stations):
+    """
+    :return: list of (name, facade options, function calling the facade)
+    """
+    uuid = stations[0]['stationuuid']
+    return [
+        ('stations_json', {}, lambda facade: facade.stations()),
+        ('stations_xml', {'output_format': 'xml'}, lambda facade: facade.stations()),
+        ('stations_json_stream', {}, lambda facade: sum(1 for _ in facade.stations(stream=True))),
+        ('search_json', {}, lambda facade: facade.search(tag='jazz')),
+        ('search_m3u', {'search_format': 'm3u'}, lambda facade: facade.search(tag='jazz')),
+        ('countries', {}, lambda facade: facade.countries()),
+        ('playable_url_json', {}, lambda facade: facade.playable_url(uuid)),
+        ('playable_url_pls', {'playable_format': 'pls'}, lambda facade: facade.playable_url(uuid)),
+    ]
+
+
+def percentile(values, q):
+    """
+    :param values: sorted list of numbers
+    :param float q: percentile between 0 and 1
+    :return: the value at the percentile, interpolating between neighbours
+    """
+    if not values:
+        return None
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def run_case(call, options, iterations=20, concurrency=1, warmup=2):
+    """
+    Measures one case.
+
+    :param call: function calling the facade
+    :param dict options: keyword arguments of ApiFacade
+    :param int iterations: number of measured calls
+    :param int concurrency: number of threads calling at the same time
+    :param int warmup: number of unmeasured calls before the measurement
+    :return: dict of the METRICS
+    """
+    parse_times = []
+    instrumentation = Instrumentation(post_hooks=[lambda event: parse_times.append(event.timings['parse'] or 0.0)])
+    with ApiFacade(encoding=True, pool_size=max(concurrency, 1), instrumentation=instrumentation,
+                   **options) as facade:
+        for _ in range(warmup):
+            call(facade)
+        del parse_times[:]
+
+        latencies = []
+        lock = threading.Lock()
+
+        def timed(_):
+            start = time.time()
+            call(facade)
+            elapsed = time.time() - start
+            with lock:
+                latencies.append(elapsed)
+
+        start = time.time()
+        if concurrency > 1:
+            with ThreadPoolExecutor(concurrency) as executor:
+                list(executor.map(timed, range(iterations)))
+        else:
+            for i in range(iterations):
+                timed(i)
+        duration = time.time() - start
+
+        # a separate call, tracemalloc slows down the measured ones
+        tracemalloc.start()
+        try:
+            call(facade)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        'requests_per_sec': iterations / duration,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p90_ms': percentile(latencies, 0.9) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'parse_ms': sum(parse_times) / len(parse_times) * 1000 if parse_times else 0.0,
+        'peak_memory_kb': peak / 1024.0,
+    }
+
+
+def run(stations, latency=0.0, iterations=20, concurrency=1, cases=None):
+    """
+    Starts the stand-in webservice and measures the cases.
+
+    :param list stations: station dicts served by the webservice
+    :param float latency: seconds the webservice waits before every response
+    :param cases: names of the cases to run, all if None
+    :return: dict mapping case names to their results
+    """
+    results = {}
+    with FakeWebservice(benchmark_routes(stations), latency=latency) as server, \
+            mock.patch('radiobrowserpy.api.BASEURL', server.url):
+        for name, options, call in benchmark_cases(stations):
+            if cases is None or name in cases:
+                results[name] = run_case(call, options, iterations, concurrency)
+    return results
+
+
+def compare(results, baseline, tolerance=0.2, metrics=METRICS):
+    """
+    Compares results with a baseline.
+
+    :param float tolerance: allowed relative change to the worse, e.g. 0.2 for 20%
+    :param metrics: names of the compared metrics, lower values are better except for requests_per_sec
+    :return: list of (case, metric, baseline value, value) which regressed
+    """
+    regressions = []
+    for name, values in sorted(results.items()):
+        if name not in baseline:
+            continue
+        for metric in metrics:
+            old, new = baseline[name].get(metric), values.get(metric)
+            if not old or new is None:
+                continue
+            if metric == 'requests_per_sec':
+                regressed = new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance)
+            if regressed:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def format_results(results, metrics=METRICS):
+    lines = ['%-22s' % 'case' + ''.join('%16s' % metric for metric in metrics)]
+    for name, values in sorted(results.items()):
+        lines.append('%-22s' % name + ''.join('%16.2f' % values[metric] for metric in metrics))
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmark of radiobrowserpy against a local webservice.')
+    parser.add_argument('--stations', type=int, default=2000, help='number of synthetic stations served')
+    parser.add_argument('--recorded', help='json file with a recorded station list to serve instead')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the webservice waits per response')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--cases', help='comma separated names of the cases to run')
+    parser.add_argument('--save', help='write the results as baseline to this json file')
+    parser.add_argument('--compare', help='compare the results with this baseline json file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args(argv)
+
+    if args.recorded:
+        with open(args.recorded, 'rb') as f:
+            stations = json.loads(f.read().decode('utf-8'))
+    else:
+        stations = synthetic_stations(args.stations)
+    cases = args.cases.split(',') if args.cases else None
+    results = run(stations, args.latency, args.iterations, args.concurrency, cases)
+    print(format_results(results))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print('REGRESSION %s %s: %.2f -> %.2f' % (name, metric, old, new))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import StreamRequestHandler, TCPServer, ThreadingMixIn
+from urllib.parse import urlsplit, parse_qsl
+
+
+class _ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _ThreadingTCPServer(ThreadingMixIn, TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+
+
+class FakeWebservice(object):
+    """
+    Local stand-in for the radio-browser.info webservice. Serves canned responses from a route table on a free port of
+    localhost and records every request it receives.
+
+    A route maps a request path (without query) to a tuple (status, headers, body) or to a callable which gets the
+    request handler and returns such a tuple.
+    """
+
+    def __init__(self, routes=None, latency=0):
+        self.routes = dict(routes or {})
+        self.latency = latency
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d/' % self._server.server_address[:2]
+
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body are written separately, with nagle small responses would wait for a delayed ack
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                service._handle(self)
+
+            do_POST = do_GET
+
+            def log_message(self, *args):
+                pass
+
+        self._server = _ThreadingServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _handle(self, handler):
+        parts = urlsplit(handler.path)
+        with self._lock:
+            self.requests.append({'path': parts.path, 'params': dict(parse_qsl(parts.query)),
+                                  'headers': dict((k.lower(), v) for k, v in handler.headers.items()),
+                                  'client': handler.client_address})
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            self._respond(handler, parts)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def _respond(self, handler, parts):
+        if self.latency:
+            time.sleep(self.latency)
+        route = self.routes.get(parts.path)
+        if route is None:
+            status, headers, body = 404, {}, b'not found'
+        elif callable(route):
+            status, headers, body = route(handler)
+        else:
+            status, headers, body = route
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        handler.send_response(status)
+        for key, value in headers.items():
+            handler.send_header(key, value)
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        if handler.command != 'HEAD':
+            handler.wfile.write(body)
+
+
+class FakeStreamServer(object):
+    """
+    Local stand-in for internet radio stream servers (shoutcast, icecast). Serves endless streams from a route table on
+    a free port of localhost and records every request it receives.
+
+    A route maps a request path to a dict with the optional keys status (the status line, default 'HTTP/1.0 200 OK',
+    e.g. 'ICY 200 OK' for shoutcast v1), headers, chunk (bytes sent repeatedly as stream data), delay (seconds before
+    the response), interval (seconds between two chunks), size (bytes after which the connection is closed) and
+    metaint and title (icy metadata, interleaved every metaint bytes if the client sent Icy-MetaData: 1).
+    """
+
+    def __init__(self, routes=None):
+        self.routes = dict(routes or {})
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        # simultaneous requests per path
+        self.active_paths = {}
+        self.max_active_paths = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d/' % self._server.server_address[:2]
+
+    def start(self):
+        service = self
+
+        class Handler(StreamRequestHandler):
+
+            def handle(self):
+                service._handle(self)
+
+        self._server = _ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, args=(0.05,))
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def _handle(self, handler):
+        line = handler.rfile.readline(65537).decode('latin-1')
+        headers = {}
+        while True:
+            header = handler.rfile.readline(65537).decode('latin-1')
+            if not header.strip():
+                break
+            key, _, value = header.partition(':')
+            headers[key.strip().lower()] = value.strip()
+        path = urlsplit(line.split(' ')[1] if line.count(' ') >= 2 else '/').path
+        with self._lock:
+            self.requests.append({'path': path, 'line': line.strip(), 'headers': headers})
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            self.active_paths[path] = self.active_paths.get(path, 0) + 1
+            self.max_active_paths[path] = max(self.max_active_paths.get(path, 0), self.active_paths[path])
+        try:
+            self._respond(handler, self.routes.get(path), headers.get('icy-metadata') == '1')
+        except (IOError, OSError):
+            # the client closed the connection
+            pass
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.active_paths[path] -= 1
+
+    def _respond(self, handler, route, metadata):
+        if route is None:
+            handler.wfile.write(b'HTTP/1.0 404 Not Found\r\nContent-Type: text/plain\r\n\r\nnot found')
+            return
+        if self._stopped.wait(route.get('delay', 0)):
+            return
+        head = [route.get('status', 'HTTP/1.0 200 OK')]
+        head.extend('%s: %s' % item for item in route.get('headers', {}).items())
+        metaint = route.get('metaint') if metadata else None
+        if metaint:
+            head.append('icy-metaint: %d' % metaint)
+        handler.wfile.write(('\r\n'.join(head) + '\r\n\r\n').encode('utf-8'))
+        chunk, size, sent = route.get('chunk', b''), route.get('size', 1 << 20), 0
+        block = b''
+        if metaint:
+            title = ("StreamTitle='%s';" % route.get('title', '')).encode('utf-8')
+            length = (len(title) + 15) // 16
+            block = bytes(bytearray([length])) + title.ljust(length * 16, b'\0')
+        position = 0
+        while chunk and sent < size:
+            data = chunk
+            if metaint:
+                # a metadata block follows every metaint stream bytes
+                parts, rest = [], chunk
+                while len(rest) >= metaint - position:
+                    parts.extend([rest[:metaint - position], block])
+                    rest, position = rest[metaint - position:], 0
+                parts.append(rest)
+                position += len(rest)
+                data = b''.join(parts)
+            handler.wfile.write(data)
+            handler.wfile.flush()
+            sent += len(chunk)
+            if self._stopped.wait(route.get('interval', 0)):
+                return
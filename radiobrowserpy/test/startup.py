@@ -0,0 +1,101 @@
+"""
+Benchmark of the import and startup cost of the package, as paid by cli tools and short-lived processes.
+
+Every scenario runs in fresh interpreters. The time of the statements is measured inside the interpreter, so the
+startup of python itself is not included. Results can be saved and compared like the ones of the request benchmark.
+
+    python -m radiobrowserpy.test.startup --save startup.json
+    python -m radiobrowserpy.test.startup --compare startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from .benchmark import compare, format_results
+
+SCENARIOS = [
+    ('import_package', 'import radiobrowserpy'),
+    ('import_facade', 'from radiobrowserpy import ApiFacade'),
+    ('create_facade', 'from radiobrowserpy import ApiFacade; ApiFacade().close()'),
+    ('import_async_facade', 'from radiobrowserpy import AsyncApiFacade'),
+    ('import_index', 'from radiobrowserpy import StationIndex'),
+]
+
+METRICS = ('median_ms', 'min_ms', 'modules')
+
+# heavy dependencies, reported if a scenario imported them
+HEAVY_MODULES = ('requests', 'aiohttp', 'asyncio', 'xml.etree.ElementTree', 'concurrent.futures')
+
+_PROBE = '''
+import json, sys, time
+before = set(sys.modules)
+start = time.perf_counter()
+%s
+elapsed = time.perf_counter() - start
+loaded = set(sys.modules) - before
+print(json.dumps({'seconds': elapsed, 'modules': len(loaded), 'heavy': sorted(m for m in %r if m in loaded)}))
+'''
+
+
+def measure(statement, repeat=5):
+    """
+    Runs a statement in repeat fresh interpreters.
+
+    :return: dict with the median and minimum time in ms, the number of newly imported modules and the heavy
+        dependencies which were imported
+    """
+    env = dict(os.environ)
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.check_output([sys.executable, '-c', _PROBE % (statement, HEAVY_MODULES)], env=env)
+        runs.append(json.loads(output.decode('utf-8').strip().splitlines()[-1]))
+    times = sorted(run['seconds'] * 1000 for run in runs)
+    return {'median_ms': times[len(times) // 2], 'min_ms': times[0], 'modules': runs[-1]['modules'],
+            'heavy': runs[-1]['heavy']}
+
+
+def run(repeat=5, scenarios=None):
+    """
+    :param scenarios: names of the scenarios to run, all if None
+    :return: dict mapping scenario names to their results
+    """
+    return dict((name, measure(statement, repeat)) for name, statement in SCENARIOS
+                if scenarios is None or name in scenarios)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import and startup cost of radiobrowserpy.')
+    parser.add_argument('--repeat', type=int, default=5, help='number of fresh interpreters per scenario')
+    parser.add_argument('--scenarios', help='comma separated names of the scenarios to run')
+    parser.add_argument('--save', help='write the results as baseline to this json file')
+    parser.add_argument('--compare', help='compare the results with this baseline json file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.repeat, args.scenarios.split(',') if args.scenarios else None)
+    print(format_results(results, METRICS))
+    for name, values in sorted(results.items()):
+        if values['heavy']:
+            print('%s imports %s' % (name, ', '.join(values['heavy'])))
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, ('median_ms', 'modules'))
+        for name, metric, old, new in regressions:
+            print('REGRESSION %s %s: %.2f -> %.2f' % (name, metric, old, new))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,7 +4,6 @@ import xml.etree.ElementTree as ET
 from ..request import RadioBrowserRequest
 from ..api import RadioApi, PlayRadioApi, SearchRadioApi
 from ..apifacade import ApiFacade
-from builtins import str
 
 
 class TestRequest(unittest.TestCase):
@@ -0,0 +1,90 @@
+import json
+import unittest
+from unittest import mock
+
+from ..api import ENDPOINTS, RadioApi, SearchRadioApi
+from ..apifacade import ApiFacade
+from .fakeserver import FakeWebservice
+
+
+def _station(handler):
+    uuid = handler.path.split('?')[0].rsplit('/', 1)[-1]
+    return 200, {'Content-Type': 'application/json'}, json.dumps([{'stationuuid': uuid}])
+
+
+class TestEndpointRegistry(unittest.TestCase):
+
+    def test_registry(self):
+        endpoint = ENDPOINTS['stations_bytag']
+        self.assertEqual(endpoint.path, 'bytag/{}')
+        self.assertIs(endpoint.api, SearchRadioApi)
+        self.assertEqual(endpoint.family, 'search')
+        self.assertIn('ttl', endpoint.formats)
+        self.assertIs(ENDPOINTS['countries'].api, RadioApi)
+        self.assertEqual(ENDPOINTS['playable_url'].formats, ('json', 'xml', 'm3u', 'pls'))
+
+    def test_registry_keys_are_endpoint_names(self):
+        self.assertEqual(list(ENDPOINTS), [endpoint.name for endpoint in ENDPOINTS.values()])
+        self.assertTrue(all(getattr(endpoint.api, name).__name__ == name for name, endpoint in ENDPOINTS.items()))
+        self.assertNotIn('func', ENDPOINTS)
+        self.assertRaises(AttributeError, getattr, ApiFacade(), 'func')
+
+    def test_facade_binds_methods(self):
+        facade = ApiFacade()
+        self.assertIn('stations_bytag', vars(facade))
+        self.assertEqual(facade.stations_bytag.__self__, facade._search_api)
+        self.assertIs(facade.endpoints, ENDPOINTS)
+        self.assertEqual(facade.formats, RadioApi.formats)
+        self.assertRaises(AttributeError, getattr, facade, 'stations_bytags')
+
+    def test_urls_follow_format(self):
+        facade = ApiFacade()
+        build = facade.stations_bytag.build
+        self.assertTrue(build(facade._search_api, 'jazz')[0].endswith('/json/stations/bytag/jazz'))
+        facade.set_search_format('xml')
+        self.assertTrue(build(facade._search_api, 'jazz')[0].endswith('/xml/stations/bytag/jazz'))
+        self.assertTrue(facade.search.build(facade._search_api)[0].endswith('/xml/stations/search/'))
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.uuids = ['uuid-%d' % i for i in range(12)]
+        routes = dict(('/json/stations/byuuid/' + uuid, _station) for uuid in self.uuids)
+        routes['/json/countries/'] = (200, {'Content-Type': 'application/json'}, '[]')
+        self.server = FakeWebservice(routes, latency=0.05).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.facade = ApiFacade(encoding=True)
+        self.addCleanup(self.facade.close)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_preserves_order(self):
+        calls = [('stations_byuuid', [uuid]) for uuid in self.uuids] + ['countries']
+        results = self.facade.batch(calls, max_workers=6)
+        self.assertEqual([r[0]['stationuuid'] for r in results[:-1]], self.uuids)
+        self.assertEqual(results[-1], [])
+        self.assertGreater(self.server.max_active, 1)
+
+    def test_returns_exceptions(self):
+        results = self.facade.batch([('stations_byuuid', [], {}), ('stations_byuuid', [self.uuids[0]])])
+        self.assertIsInstance(results[0], TypeError)
+        self.assertEqual(results[1], [{'stationuuid': self.uuids[0]}])
+
+    def test_per_host_limit(self):
+        self.facade.batch([('stations_byuuid', [uuid]) for uuid in self.uuids], max_workers=8, per_host=2)
+        self.assertLessEqual(self.server.max_active, 2)
+
+    def test_per_host_with_call_options(self):
+        results = self.facade.batch([('countries', [], {'encoding': False}),
+                                     ('stations_byuuid', [self.uuids[0]], {'encoding': True, 'stream': True})],
+                                    per_host=2)
+        self.assertEqual(results[0], '[]')
+        self.assertEqual(list(results[1]), [{'stationuuid': self.uuids[0]}])
+
+
+if __name__ == '__main__':
+    unittest.main()
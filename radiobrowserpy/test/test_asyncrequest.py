@@ -0,0 +1,108 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from ..apifacade import AsyncApiFacade
+from ..asyncrequest import aiohttp
+from .fakeserver import FakeWebservice
+
+COUNTRIES = [{'name': 'Germany', 'value': 'Germany', 'stationcount': 2}]
+STATIONS = [{'name': 'Jazz FM', 'stationuuid': '9617a958-0601-11e8-ae97-52543be04c81', 'tags': 'jazz'}]
+
+
+@unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+class TestAsyncApiFacade(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/countries/': (200, {'Content-Type': 'application/json'}, json.dumps(COUNTRIES)),
+            '/json/stations/bytag/jazz': (200, {'Content-Type': 'application/json'}, json.dumps(STATIONS)),
+            '/xml/countries/': (200, {'Content-Type': 'text/xml'}, '<result><country name="Germany"/></result>'),
+        }).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _run(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_endpoints_are_awaitable(self):
+        async def main():
+            async with AsyncApiFacade(encoding=True, appname='myapp') as facade:
+                return await asyncio.gather(facade.countries(), facade.stations_bytag('jazz'))
+
+        countries, stations = self._run(main())
+        self.assertEqual(countries, COUNTRIES)
+        self.assertEqual(stations, STATIONS)
+        self.assertEqual(self.server.requests[0]['headers']['user-agent'], 'myapp/0.0.1')
+
+    def test_concurrent_requests_share_pool(self):
+        async def main():
+            async with AsyncApiFacade(pool_size=2) as facade:
+                return await asyncio.gather(*[facade.countries(hidebroken=True) for _ in range(20)])
+
+        results = self._run(main())
+        self.assertEqual([json.loads(r) for r in results], [COUNTRIES] * 20)
+        self.assertEqual(self.server.requests[0]['params']['hidebroken'], 'True')
+        self.assertLessEqual(len(set(r['client'] for r in self.server.requests)), 2)
+
+    def test_xml_format(self):
+        async def main():
+            async with AsyncApiFacade(output_format='xml', encoding=True) as facade:
+                return await facade.countries()
+
+        root = self._run(main())
+        self.assertEqual(root.find('country').get('name'), 'Germany')
+
+    def test_stream(self):
+        async def main():
+            async with AsyncApiFacade(search_format='json', encoding=True) as facade:
+                return [station async for station in facade.stations_bytag('jazz', stream=True)]
+
+        self.assertEqual(self._run(main()), STATIONS)
+
+    def test_stream_error_status(self):
+        async def main():
+            async with AsyncApiFacade(encoding=True) as facade:
+                return [station async for station in facade.stations(stream=True)]
+
+        with self.assertRaises(aiohttp.ClientResponseError) as context:
+            self._run(main())
+        self.assertEqual(context.exception.status, 404)
+
+    def test_batch(self):
+        async def main():
+            async with AsyncApiFacade(encoding=True) as facade:
+                return await facade.batch(['countries', ('stations_bytag', ['jazz']), ('stations_byuuid', [], {})] +
+                                          ['countries'] * 10, max_workers=3, per_host=2)
+
+        results = self._run(main())
+        self.assertEqual(results[:2], [COUNTRIES, STATIONS])
+        self.assertIsInstance(results[2], TypeError)
+        self.assertEqual(results[3:], [COUNTRIES] * 10)
+        self.assertLessEqual(self.server.max_active, 2)
+
+    def test_request_class_lookup(self):
+        from ..asyncrequest import AsyncRadioBrowserRequest
+
+        class Default(AsyncApiFacade):
+            request_class = None
+
+        class Custom(AsyncApiFacade):
+            request_class = type('CustomRequest', (AsyncRadioBrowserRequest,), {})
+
+        async def main():
+            async with Default() as default, Custom() as custom:
+                return type(default._radiorequest), type(custom._radiorequest)
+
+        self.assertEqual(self._run(main()), (AsyncRadioBrowserRequest, Custom.request_class))
+        self.assertIsNone(AsyncApiFacade.request_class)
+        self.assertIsNone(Default.request_class)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from .benchmark import METRICS, compare, main, percentile, run, synthetic_stations
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_run(self):
+        results = run(synthetic_stations(30), iterations=3, concurrency=2)
+        self.assertEqual(set(results), {'stations_json', 'stations_xml', 'stations_json_stream', 'search_json',
+                                        'search_m3u', 'countries', 'playable_url_json', 'playable_url_pls'})
+        for metrics in results.values():
+            self.assertEqual(set(metrics), set(METRICS))
+            self.assertGreater(metrics['requests_per_sec'], 0)
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+
+    def test_stream_memory_is_flat(self):
+        small, large = [run(synthetic_stations(count), iterations=1, cases=['stations_json_stream'])
+                        ['stations_json_stream']['peak_memory_kb'] for count in (1000, 4000)]
+        self.assertLess(large, small * 1.5)
+
+    def test_compare(self):
+        baseline = {'countries': {'requests_per_sec': 100.0, 'p50_ms': 10.0, 'parse_ms': 0.0}}
+        results = {'countries': {'requests_per_sec': 70.0, 'p50_ms': 11.0, 'parse_ms': 1.0},
+                   'stations_json': {'requests_per_sec': 1.0}}
+        self.assertEqual(compare(results, baseline, 0.2), [('countries', 'requests_per_sec', 100.0, 70.0)])
+        self.assertEqual(compare(results, baseline, 0.5), [])
+
+    def test_percentile(self):
+        self.assertEqual(percentile([1, 2, 3, 4, 5], 0.5), 3)
+        self.assertEqual(percentile([1, 2], 0.5), 1.5)
+        self.assertIsNone(percentile([], 0.5))
+
+    def test_main(self):
+        self.assertEqual(main(['--stations', '10', '--iterations', '1', '--cases', 'countries']), 0)
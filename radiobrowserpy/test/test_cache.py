@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade
+from ..cache import ResponseCache, ValidatorStore, MemoryCache, DiskCache
+from ..request import BufferedResponse
+from .fakeserver import FakeWebservice
+
+COUNTRIES = [{'name': 'Germany', 'value': 'Germany', 'stationcount': 2}]
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_memory_lru(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(len(cache), 2)
+
+    def test_disk_roundtrip_and_eviction(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = DiskCache(directory, maxsize=2)
+        for key in ['a', 'b', 'c']:
+            cache.set(key, BufferedResponse(key.encode('utf-8')))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(DiskCache(directory).get('c').text, 'c')
+
+    def test_disk_eviction_lists_rarely(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache = DiskCache(directory, maxsize=100)
+        with mock.patch('radiobrowserpy.cache.os.listdir', wraps=os.listdir) as listdir:
+            for i in range(300):
+                cache.set(str(i), i)
+            cache.set('299', 299)
+            cache.delete('299')
+        self.assertLess(listdir.call_count, 30)
+        self.assertEqual(len(cache), 90)
+
+    def test_ttl_expiry_and_key(self):
+        cache = ResponseCache(ttls={'countries': 10})
+        with mock.patch('radiobrowserpy.cache.time.time', return_value=100):
+            cache.set('countries', 'http://host/countries', {'b': 1, 'a': None}, 'response')
+            self.assertEqual(cache.get('countries', 'http://host/countries', {'b': '1'}), 'response')
+        with mock.patch('radiobrowserpy.cache.time.time', return_value=111):
+            self.assertIsNone(cache.get('countries', 'http://host/countries', {'b': 1}))
+        self.assertIsNone(cache.ttl('vote_for_station'))
+        self.assertIsNone(cache.ttl('stations'))
+
+
+class TestCachedRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/countries/': (200, {'Content-Type': 'application/json'}, json.dumps(COUNTRIES)),
+            '/json/vote/abc': (200, {'Content-Type': 'application/json'}, '{"ok": true}'),
+        }).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_read_only_endpoint_cached(self):
+        with ApiFacade(encoding=True, cache=True) as facade:
+            self.assertEqual(facade.countries(), COUNTRIES)
+            self.assertEqual(facade.countries(), COUNTRIES)
+            self.assertEqual(len(self.server.requests), 1)
+            facade.countries(reverse=True)
+            self.assertEqual(len(self.server.requests), 2)
+
+    def test_mutating_endpoint_bypasses_cache(self):
+        with ApiFacade(encoding=True, cache=ResponseCache(default_ttl=60)) as facade:
+            facade.vote_for_station('abc')
+            facade.vote_for_station('abc')
+        self.assertEqual(len(self.server.requests), 2)
+
+
+def _stations(handler):
+    if handler.headers.get('If-None-Match') == '"v1"':
+        return 304, {'ETag': '"v1"'}, b''
+    return 200, {'Content-Type': 'application/json', 'ETag': '"v1"'}, json.dumps(COUNTRIES)
+
+
+class TestConditionalRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({'/json/stations/': _stations}).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_not_modified_served_from_store(self):
+        with ApiFacade(encoding=True, conditional=True) as facade:
+            first = facade.stations()
+            second = facade.stations()
+        self.assertEqual(first, COUNTRIES)
+        self.assertIs(first, second)
+        self.assertNotIn('if-none-match', self.server.requests[0]['headers'])
+        self.assertEqual(self.server.requests[1]['headers']['if-none-match'], '"v1"')
+
+    def test_mutating_endpoints_not_stored(self):
+        store = ValidatorStore()
+        response = BufferedResponse(b'{}', headers={'ETag': '"x"'})
+        self.assertIs(store.set('vote_for_station', 'http://host/vote/1', None, response), response)
+        self.assertIsNone(store.get('vote_for_station', 'http://host/vote/1', None))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import asyncio
+import gzip
+import json
+import unittest
+import zlib
+
+from ..apifacade import ApiFacade
+from ..asyncrequest import AsyncRadioBrowserRequest, aiohttp
+from ..compression import Decompressor, TransferStats, accept_encoding, brotli, decompress_chunks
+from ..request import RadioBrowserRequest
+from .fakeserver import FakeWebservice
+
+STATIONS = [{'name': 'Jazz FM %d' % i, 'stationuuid': str(i), 'tags': 'jazz,smooth jazz'} for i in range(200)]
+BODY = json.dumps(STATIONS).encode('utf-8')
+
+
+def compressed(handler, body=BODY):
+    accepted = handler.headers.get('accept-encoding', '')
+    if 'gzip' in accepted:
+        return 200, {'Content-Type': 'application/json', 'Content-Encoding': 'gzip'}, gzip.compress(body)
+    return 200, {'Content-Type': 'application/json'}, body
+
+
+class TestDecompressor(unittest.TestCase):
+
+    def _roundtrip(self, encoding, data):
+        chunks = [data[i:i + 7] for i in range(0, len(data), 7)]
+        return b''.join(decompress_chunks(chunks, encoding))
+
+    def test_encodings(self):
+        self.assertEqual(self._roundtrip('gzip', gzip.compress(BODY)), BODY)
+        self.assertEqual(self._roundtrip('deflate', zlib.compress(BODY)), BODY)
+        self.assertEqual(self._roundtrip(None, BODY), BODY)
+
+    def test_raw_deflate(self):
+        compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+        data = compressor.compress(BODY) + compressor.flush()
+        self.assertEqual(self._roundtrip('deflate', data), BODY)
+
+    def test_counts(self):
+        data = zlib.compress(BODY)
+        decompressor = Decompressor('deflate')
+        body = decompressor.decompress(data[:100]) + decompressor.decompress(data[100:]) + decompressor.flush()
+        self.assertEqual((body, decompressor.wire_bytes, decompressor.content_bytes), (BODY, len(data), len(BODY)))
+        stats = TransferStats()
+        decompressor.record(stats, 'http://x/')
+        self.assertEqual((stats.wire_bytes, stats.last['content_encoding']), (len(data), 'deflate'))
+
+    def test_accept_encoding(self):
+        self.assertEqual('br' in accept_encoding(), brotli is not None)
+        self.assertIn('gzip', accept_encoding())
+
+    @unittest.skipIf(brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        decompressor = Decompressor('br')
+        self.assertEqual(decompressor.decompress(brotli.compress(BODY)) + decompressor.flush(), BODY)
+
+    def test_stats(self):
+        stats = TransferStats()
+        data = gzip.compress(BODY)
+        b''.join(decompress_chunks([data], 'gzip', stats, 'http://x/'))
+        self.assertEqual(stats.last, {'url': 'http://x/', 'content_encoding': 'gzip', 'wire_bytes': len(data),
+                                      'content_bytes': len(BODY)})
+        self.assertEqual(stats.requests, 1)
+        self.assertLess(stats.ratio, 0.5)
+        stats.reset()
+        self.assertIsNone(stats.ratio)
+
+
+class TestCompressedTransfer(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({'/json/stations': compressed}).start()
+        self.url = self.server.url + 'json/stations'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_negotiates_and_decodes(self):
+        with RadioBrowserRequest('myapp', '1.2') as radiorequest:
+            self.assertEqual(radiorequest(self.url, 'json', encoding=True), STATIONS)
+            self.assertEqual(radiorequest(self.url), BODY.decode('utf-8'))
+            stats = radiorequest.transfer_stats
+        self.assertEqual(self.server.requests[0]['headers']['accept-encoding'], accept_encoding())
+        self.assertEqual(stats.requests, 2)
+        self.assertEqual(stats.content_bytes, 2 * len(BODY))
+        self.assertEqual(stats.wire_bytes, 2 * len(gzip.compress(BODY)))
+
+    def test_keeps_connection_alive(self):
+        with RadioBrowserRequest('myapp', '1.2') as radiorequest:
+            radiorequest(self.url)
+            radiorequest(self.url)
+        clients = [r['client'] for r in self.server.requests]
+        self.assertEqual(clients[0], clients[1])
+
+    def test_stream(self):
+        with RadioBrowserRequest('myapp', '1.2') as radiorequest:
+            self.assertEqual(list(radiorequest(self.url, 'json', encoding=True, stream=True)), STATIONS)
+            self.assertEqual(''.join(radiorequest(self.url, stream=True)), BODY.decode('utf-8'))
+            self.assertEqual(radiorequest.transfer_stats.last['content_encoding'], 'gzip')
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async(self):
+        async def main():
+            async with AsyncRadioBrowserRequest('myapp', '1.2') as radiorequest:
+                result = await radiorequest(self.url, 'json', encoding=True)
+                streamed = [item async for item in radiorequest(self.url, 'json', encoding=True, stream=True)]
+                return result, streamed, radiorequest.transfer_stats
+
+        result, streamed, stats = asyncio.run(main())
+        self.assertEqual(result, STATIONS)
+        self.assertEqual(streamed, STATIONS)
+        self.assertEqual(stats.wire_bytes, 2 * len(gzip.compress(BODY)))
+
+
+class TestFacadeStats(unittest.TestCase):
+
+    def test_facade_exposes_stats(self):
+        with ApiFacade() as facade:
+            self.assertIs(facade.transfer_stats, facade._radiorequest.transfer_stats)
@@ -0,0 +1,134 @@
+import socket
+import unittest
+
+from ..health import StationProber, audio_info, probe_target, summarize
+from .fakeserver import FakeStreamServer
+
+AUDIO = b'\xff\xfb\x90\x00' * 256
+
+
+def closed_port_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return 'http://127.0.0.1:%d/live' % port
+
+
+class TestStationProber(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeStreamServer({
+            '/shoutcast': {'status': 'ICY 200 OK', 'chunk': AUDIO, 'metaint': 1500, 'title': 'Artist - Song',
+                           'headers': {'content-type': 'audio/mpeg', 'icy-name': 'Jazz FM', 'icy-genre': 'jazz',
+                                       'icy-br': '128', 'icy-sr': '44100'}},
+            '/icecast': {'chunk': AUDIO, 'headers': {'Content-Type': 'audio/ogg; charset=binary',
+                                                     'ice-audio-info': 'ice-samplerate=48000;ice-bitrate=96'}},
+            '/moved': {'status': 'HTTP/1.0 302 Found', 'headers': {'Location': '/icecast'}},
+            '/loop': {'status': 'HTTP/1.0 302 Found', 'headers': {'Location': '/loop'}},
+            '/silent': {'headers': {'content-type': 'audio/mpeg'}, 'size': 0},
+            '/hanging': {'delay': 5, 'chunk': AUDIO},
+            '/slow': {'chunk': AUDIO[:100], 'interval': 0.1},
+            '/short': {'chunk': AUDIO, 'delay': 0.05, 'size': 1},
+        }).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_icy_headers_and_metadata(self):
+        result = StationProber(metadata=True, read_bytes=1000).run([self.server.url + 'shoutcast'])[0]
+        self.assertTrue(result.ok, result)
+        self.assertEqual((result.protocol, result.status, result.content_type), ('ICY', 200, 'audio/mpeg'))
+        self.assertEqual((result.name, result.genre, result.bitrate, result.samplerate), ('Jazz FM', 'jazz', 128,
+                                                                                          44100))
+        self.assertEqual((result.metaint, result.title), (1500, 'Artist - Song'))
+        self.assertGreater(result.bytes_read, 1500)
+        self.assertTrue(0 < result.timings['ttfb'] <= result.latency <= result.timings['total'])
+        request = self.server.requests[0]
+        self.assertEqual(request['line'], 'GET /shoutcast HTTP/1.0')
+        self.assertEqual(request['headers']['icy-metadata'], '1')
+
+    def test_station_records_and_redirects(self):
+        station = {'stationuuid': 'a', 'url': self.server.url + 'broken', 'url_resolved': self.server.url + 'moved'}
+        played = {'ok': 'true', 'stationuuid': 'b', 'url': self.server.url + 'icecast'}
+        first, second = StationProber(read_bytes=512).run([station, played])
+        self.assertEqual((first.stationuuid, first.ok, first.redirects), ('a', True, 1))
+        self.assertEqual(first.final_url, self.server.url + 'icecast')
+        self.assertEqual((second.stationuuid, second.ok, second.bytes_read), ('b', True, 512))
+        self.assertEqual((second.content_type, second.bitrate, second.samplerate), ('audio/ogg', 96, 48000))
+        self.assertNotIn('icy-metadata', self.server.requests[-1]['headers'])
+
+    def test_failures(self):
+        urls = ['missing', 'loop', 'silent', 'hanging']
+        targets = [self.server.url + url for url in urls] + [closed_port_url(), 'ftp://example.com/live', None]
+        results = StationProber(timeout=0.5, max_redirects=2).run(targets)
+        self.assertEqual([result.error for result in results],
+                         ['http', 'redirects', 'empty', 'timeout', 'connect', 'url', 'url'])
+        self.assertFalse(any(result.ok for result in results))
+        self.assertEqual(results[0].status, 404)
+        self.assertLess(results[3].timings['total'], 1.5)
+
+    def test_slow_stream_is_healthy(self):
+        result = StationProber(timeout=0.5, read_bytes=100000).run([self.server.url + 'slow'])[0]
+        self.assertTrue(result.ok, result)
+        self.assertTrue(0 < result.bytes_read < 100000)
+
+    def test_concurrency_limits(self):
+        seen = []
+        targets = [('uuid-%d' % i, self.server.url + 'short') for i in range(40)]
+        results = StationProber(concurrency=10, per_host=None, read_bytes=64).run(targets, callback=seen.append)
+        self.assertEqual([result.stationuuid for result in results], ['uuid-%d' % i for i in range(40)])
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(len(seen), 40)
+        self.assertLessEqual(self.server.max_active, 10)
+        self.assertGreater(self.server.max_active, 1)
+
+        self.server.max_active = 0
+        StationProber(concurrency=10, per_host=3, read_bytes=64).run(targets[:12])
+        self.assertLessEqual(self.server.max_active, 3)
+
+    def test_per_host_limit_follows_redirects(self):
+        port = self.server.url.split(':')[2].rstrip('/')
+        self.server.routes['/hop'] = {'status': 'HTTP/1.0 302 Found',
+                                      'headers': {'Location': 'http://localhost:%s/short' % port}}
+        targets = [self.server.url + 'hop'] * 10 + ['http://localhost:%s/short' % port] * 10
+        results = StationProber(concurrency=20, per_host=3, read_bytes=64).run(targets)
+        self.assertTrue(all(result.ok for result in results), results)
+        self.assertLessEqual(self.server.max_active_paths['/short'], 3)
+        self.assertGreater(self.server.max_active_paths['/short'], 1)
+
+    def test_errors_stay_per_target(self):
+        seen = []
+
+        def callback(result):
+            seen.append(result)
+            if len(seen) == 1:
+                raise RuntimeError('callback failed')
+
+        prober = StationProber(read_bytes=64)
+        with self.assertRaises(RuntimeError):
+            prober.run([self.server.url + 'short'] * 3, callback=callback)
+        self.assertEqual(len(seen), 3)
+        results = prober.run([42, ('a',), ('b', self.server.url + 'short')])
+        self.assertEqual([result.error for result in results], ['url', 'url', None])
+
+    def test_summarize(self):
+        results = StationProber(timeout=0.5).run([self.server.url + 'icecast', self.server.url + 'missing',
+                                                  self.server.url + 'short'])
+        summary = summarize(results)
+        self.assertEqual((summary['probed'], summary['ok'], summary['failed']), (3, 2, 1))
+        self.assertEqual(summary['errors'], {'http': 1})
+        self.assertLessEqual(summary['latency_p50'], summary['latency_p90'])
+        self.assertEqual(results[0].as_dict()['bitrate'], 96)
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_probe_target(self):
+        self.assertEqual(probe_target({'stationuuid': 'a', 'url': 'u', 'url_resolved': ''}), ('a', 'u'))
+        self.assertEqual(probe_target('http://example.com/'), (None, 'http://example.com/'))
+
+    def test_audio_info(self):
+        self.assertEqual(audio_info('ice-samplerate=44100;ice-bitrate=128;channels=2'),
+                         {'samplerate': '44100', 'bitrate': '128', 'channels': '2'})
+        self.assertEqual(audio_info(None), {})
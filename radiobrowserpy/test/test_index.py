@@ -0,0 +1,46 @@
+import unittest
+
+from ..index import StationIndex
+
+STATIONS = [
+    {'stationuuid': 'a', 'name': 'Jazz Radio Berlin', 'country': 'Germany', 'state': 'Berlin', 'language': 'german',
+     'tags': 'jazz,smooth jazz', 'codec': 'MP3', 'bitrate': '128', 'votes': '10'},
+    {'stationuuid': 'b', 'name': 'Radio Bremen Vier', 'country': 'Germany', 'state': 'Bremen',
+     'language': 'german,english', 'tags': 'pop,rock', 'codec': 'AAC', 'bitrate': '64', 'votes': '42'},
+    {'stationuuid': 'c', 'name': 'KJAZZ', 'country': 'United States of America', 'state': 'California',
+     'language': 'english', 'tags': 'jazz', 'codec': 'MP3', 'bitrate': '320', 'votes': '7'},
+]
+
+
+class TestStationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = StationIndex(STATIONS)
+
+    def uuids(self, stations):
+        return [s['stationuuid'] for s in stations]
+
+    def test_substring_and_exact(self):
+        self.assertEqual(self.uuids(self.index.search(name='jazz')), ['a', 'c'])
+        self.assertEqual(self.uuids(self.index.search(name='kjazz', name_exact='true')), ['c'])
+        self.assertEqual(self.uuids(self.index.search(country='germany', country_exact='true', state='bre')), ['b'])
+        self.assertEqual(self.uuids(self.index.stations_bytagexact('jazz')), ['a', 'c'])
+        self.assertEqual(self.uuids(self.index.stations_bytag('ja')), ['a', 'c'])
+        self.assertEqual(self.uuids(self.index.stations_bylanguageexact('english')), ['c', 'b'])
+
+    def test_tag_list_bitrate_and_order(self):
+        self.assertEqual(self.uuids(self.index.search(tag_list='jazz,smooth jazz')), ['a'])
+        self.assertEqual(self.uuids(self.index.search(bitrate_min=100, order='votes', reverse='true')), ['a', 'c'])
+        self.assertEqual(self.uuids(self.index.search(order='votes', offset=1, limit=1)), ['a'])
+
+    def test_add_and_remove(self):
+        self.index.remove('a')
+        self.assertEqual(self.uuids(self.index.search(tag='jazz')), ['c'])
+        self.index.add(dict(STATIONS[2], name='KJAZZ 88.1', bitrate='64'))
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.uuids(self.index.search(bitrate_max=100)), ['c', 'b'])
+        self.assertEqual(self.index.get('c')['name'], 'KJAZZ 88.1')
+
+
+if __name__ == '__main__':
+    unittest.main()
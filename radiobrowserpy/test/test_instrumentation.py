@@ -0,0 +1,142 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade, AsyncApiFacade
+from ..asyncrequest import aiohttp
+from ..instrumentation import Histogram, Instrumentation, MetricsAggregator, RequestEvent
+from .fakeserver import FakeWebservice
+
+COUNTRIES = [{'name': 'Germany', 'value': 'Germany', 'stationcount': 2}]
+STATIONS = [{'name': 'Jazz FM', 'stationuuid': '9617a958-0601-11e8-ae97-52543be04c81', 'tags': 'jazz'}]
+
+
+class TestHistogram(unittest.TestCase):
+
+    def test_buckets(self):
+        histogram = Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [(0.1, 2), (1.0, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.count, 4)
+        self.assertAlmostEqual(histogram.sum, 2.65)
+
+    def test_quantile(self):
+        histogram = Histogram((1.0, 2.0))
+        self.assertIsNone(histogram.quantile(0.5))
+        for value in (0.5, 1.5, 1.5, 1.5):
+            histogram.observe(value)
+        self.assertAlmostEqual(histogram.quantile(0.25), 1.0)
+        self.assertAlmostEqual(histogram.quantile(1.0), 2.0)
+
+
+class TestMetricsAggregator(unittest.TestCase):
+
+    def _event(self, endpoint, status=200, total=0.2, error=None):
+        event = RequestEvent(endpoint, 'radio', 'http://x/' + endpoint, None)
+        event.status = status
+        event.wire_bytes = event.content_bytes = 100
+        event.timings['total'] = event.timings['download'] = total
+        event.error = error
+        return event
+
+    def test_counts_per_endpoint(self):
+        aggregator = MetricsAggregator()
+        aggregator(self._event('countries'))
+        aggregator(self._event('countries', status=None, error=ValueError()))
+        aggregator(self._event('tags', total=3.0))
+        summary = aggregator.summary()
+        self.assertEqual(summary['countries']['requests'], 2)
+        self.assertEqual(summary['countries']['errors'], 1)
+        self.assertEqual(summary['countries']['throughput'], 500)
+        self.assertEqual(aggregator['tags'].statuses, {200: 1})
+        self.assertGreater(summary['tags']['latency'][0.5], 2.5)
+
+    def test_prometheus(self):
+        aggregator = MetricsAggregator()
+        aggregator(self._event('countries'))
+        aggregator(self._event('tags', status=None, error=ValueError()))
+        text = aggregator.to_prometheus()
+        self.assertIn('# TYPE radiobrowser_request_duration_seconds histogram', text)
+        self.assertIn('radiobrowser_requests_total{endpoint="countries",status="200"} 1', text)
+        self.assertIn('radiobrowser_requests_total{endpoint="tags",status="error"} 1', text)
+        self.assertIn('radiobrowser_errors_total{endpoint="tags"} 1', text)
+        self.assertIn('radiobrowser_request_duration_seconds_bucket{endpoint="countries",phase="total",le="0.25"} 1',
+                      text)
+        self.assertIn('radiobrowser_request_duration_seconds_bucket{endpoint="countries",phase="total",le="0.1"} 0',
+                      text)
+        self.assertIn('radiobrowser_request_duration_seconds_count{endpoint="countries",phase="total"} 1', text)
+        self.assertIn('radiobrowser_response_bytes_total{endpoint="countries",kind="wire"} 100', text)
+        self.assertTrue(text.endswith('\n'))
+
+
+class TestInstrumentedRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/countries/': (200, {'Content-Type': 'application/json'}, json.dumps(COUNTRIES)),
+            '/json/stations/bytag/jazz': (200, {'Content-Type': 'application/json'}, json.dumps(STATIONS)),
+        }).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.pre = []
+        self.post = []
+        self.instrumentation = Instrumentation([self.pre.append], [self.post.append], MetricsAggregator())
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_hooks(self):
+        with ApiFacade(encoding=True, instrumentation=self.instrumentation) as facade:
+            facade.countries()
+        self.assertEqual(len(self.pre), 1)
+        event = self.post[0]
+        self.assertIs(event, self.pre[0])
+        self.assertEqual(event.endpoint, 'countries')
+        self.assertEqual(event.family, 'radio')
+        self.assertEqual(event.url, self.server.url + 'json/countries/')
+        self.assertEqual(event.status, 200)
+        self.assertEqual(event.content_bytes, len(json.dumps(COUNTRIES)))
+        for phase in ('ttfb', 'download', 'parse', 'total'):
+            self.assertIsNotNone(event.timings[phase], phase)
+        self.assertIsNone(event.timings['dns'])
+        self.assertEqual(facade.metrics.summary()['countries']['requests'], 1)
+
+    def test_errors_and_cache_hits(self):
+        with ApiFacade(encoding=True, instrumentation=self.instrumentation, cache=True) as facade:
+            facade.countries()
+            facade.countries()
+            with mock.patch.object(facade._radiorequest.session, 'get', side_effect=ValueError('refused')):
+                self.assertRaises(ValueError, facade.stations_bytag, 'jazz')
+        self.assertTrue(self.post[1].cached)
+        self.assertIsNone(self.post[1].timings['ttfb'])
+        self.assertIsNotNone(self.post[2].error)
+        self.assertEqual(self.instrumentation.aggregator['stations_bytag'].errors, 1)
+
+    def test_stream(self):
+        with ApiFacade(encoding=True, instrumentation=self.instrumentation) as facade:
+            stations = facade.stations_bytag('jazz', stream=True)
+            self.assertEqual(self.post, [])
+            self.assertEqual(list(stations), STATIONS)
+        event = self.post[0]
+        self.assertTrue(event.stream)
+        self.assertEqual(event.wire_bytes, len(json.dumps(STATIONS)))
+        self.assertIsNotNone(event.timings['parse'])
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async(self):
+        async def main():
+            async with AsyncApiFacade(encoding=True, instrumentation=True) as facade:
+                await facade.countries()
+                await facade.countries()
+                return facade.metrics
+
+        metrics = asyncio.run(main())
+        countries = metrics['countries']
+        self.assertEqual(countries.requests, 2)
+        self.assertEqual(countries.statuses, {200: 2})
+        # the second request reuses the pooled connection
+        self.assertEqual(countries.timings['connect'].count, 1)
+        self.assertEqual(countries.content_bytes, 2 * len(json.dumps(COUNTRIES)))
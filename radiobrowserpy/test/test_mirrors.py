@@ -0,0 +1,132 @@
+import asyncio
+import json
+import socket
+import threading
+import unittest
+
+from ..apifacade import ApiFacade, AsyncApiFacade
+from ..asyncrequest import aiohttp
+from ..mirrors import MirrorPool
+from .fakeserver import FakeWebservice
+
+COUNTRIES = [{'name': 'Germany'}]
+
+
+def _routes(status=200):
+    return {
+        '/json/stats': (200, {'Content-Type': 'application/json'}, '{}'),
+        '/json/countries/': (status, {'Content-Type': 'application/json'}, json.dumps(COUNTRIES)),
+    }
+
+
+def _closed_port_url():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return 'http://127.0.0.1:%d/' % port
+
+
+class TestMirrorPool(unittest.TestCase):
+
+    def _server(self, routes, latency=0):
+        server = FakeWebservice(routes, latency).start()
+        self.addCleanup(server.stop)
+        return server
+
+    def test_routes_to_fastest(self):
+        slow = self._server(_routes(), latency=0.2)
+        fast = self._server(_routes())
+        with ApiFacade(encoding=True, mirrors=[slow.url, fast.url]) as facade:
+            self.assertEqual(facade.countries(), COUNTRIES)
+            self.assertEqual(facade.countries(), COUNTRIES)
+        self.assertEqual([r['path'] for r in fast.requests], ['/json/stats', '/json/countries/', '/json/countries/'])
+        self.assertEqual([r['path'] for r in slow.requests], ['/json/stats'])
+
+    def test_failover(self):
+        broken = self._server(_routes(status=503))
+        healthy = self._server(_routes(), latency=0.1)
+        pool = MirrorPool(resolver=lambda: [_closed_port_url(), broken.url, healthy.url])
+        with ApiFacade(encoding=True, mirrors=pool) as facade:
+            self.assertEqual(facade.countries(), COUNTRIES)
+            self.assertEqual(pool.candidates()[0], healthy.url)
+            facade.countries()
+        self.assertEqual(len([r for r in broken.requests if r['path'] == '/json/countries/']), 1)
+
+    def test_probes_with_the_app_session_once(self):
+        server = self._server(_routes())
+        pool = MirrorPool([server.url])
+        with ApiFacade(encoding=True, mirrors=pool, appname='myapp') as facade:
+            threads = [threading.Thread(target=facade.countries) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        probes = [r for r in server.requests if r['path'] == '/json/stats']
+        self.assertEqual(len(probes), 1)
+        self.assertEqual(probes[0]['headers']['user-agent'], 'myapp/0.0.1')
+
+    def test_mutating_endpoints_do_not_fail_over(self):
+        routes = dict(_routes(), **{'/json/vote/a': (503, {}, 'busy')})
+        first, second = self._server(routes), self._server(routes, latency=0.1)
+        with ApiFacade(mirrors=MirrorPool([first.url, second.url])) as facade:
+            self.assertEqual(facade.vote_for_station('a'), 'busy')
+        votes = [r for r in first.requests + second.requests if r['path'] == '/json/vote/a']
+        self.assertEqual(len(votes), 1)
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async_refresh_runs_in_executor(self):
+        server = self._server(_routes())
+        threads = []
+
+        def resolver():
+            threads.append(threading.current_thread())
+            return [server.url]
+
+        async def main():
+            async with AsyncApiFacade(encoding=True, mirrors=resolver) as facade:
+                return await facade.countries()
+
+        self.assertEqual(asyncio.run(main()), COUNTRIES)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async_stream_fails_over(self):
+        broken = self._server(_routes(status=503))
+        healthy = self._server(_routes(), latency=0.1)
+
+        async def main():
+            async with AsyncApiFacade(encoding=True, mirrors=[broken.url, healthy.url]) as facade:
+                return [country async for country in facade.countries(stream=True)]
+
+        self.assertEqual(asyncio.run(main()), COUNTRIES)
+        self.assertEqual(len([r for r in broken.requests if r['path'] == '/json/countries/']), 1)
+        self.assertEqual(len([r for r in healthy.requests if r['path'] == '/json/countries/']), 1)
+
+    def test_empty_pool(self):
+        import requests
+
+        with ApiFacade(mirrors=[]) as facade:
+            with self.assertRaisesRegex(requests.exceptions.ConnectionError, 'no mirror'):
+                facade.countries()
+
+        if aiohttp is None:
+            return
+
+        async def main():
+            async with AsyncApiFacade(mirrors=lambda: []) as facade:
+                return await facade.countries()
+
+        with self.assertRaisesRegex(aiohttp.ClientConnectionError, 'no mirror'):
+            asyncio.run(main())
+
+    def test_rewrite(self):
+        pool = MirrorPool(['https://de1.api.radio-browser.info'], probe_path=None)
+        self.assertEqual(pool.rewrite('http://www.radio-browser.info/webservice/json/tags/', pool.mirrors[0]),
+                         'https://de1.api.radio-browser.info/json/tags/')
+        self.assertRaises(ValueError, MirrorPool)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import json
+import time
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade, AsyncApiFacade
+from ..asyncrequest import aiohttp
+from ..scheduler import RequestScheduler
+from .fakeserver import FakeWebservice
+
+STATIONS = [{'name': 'station %d' % i} for i in range(23)]
+
+
+class _Stations(object):
+    def __init__(self, fail_offsets=(), slow_offsets=()):
+        self.fail_offsets = set(fail_offsets)
+        self.slow_offsets = set(slow_offsets)
+
+    def __call__(self, handler):
+        params = dict(p.split('=') for p in handler.path.split('?')[1].split('&'))
+        offset, limit = int(params['offset']), int(params['limit'])
+        if offset in self.fail_offsets:
+            self.fail_offsets.remove(offset)
+            return 500, {}, b'error'
+        if offset in self.slow_offsets:
+            self.slow_offsets.remove(offset)
+            time.sleep(0.5)
+        return 200, {'Content-Type': 'application/json'}, json.dumps(STATIONS[offset:offset + limit])
+
+
+class TestPagination(unittest.TestCase):
+
+    def setUp(self):
+        self.stations = _Stations()
+        routes = {'/json/stations/': self.stations, '/json/stations/search/': self.stations}
+        self.server = FakeWebservice(routes).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def _offsets(self):
+        return [r['params']['offset'] for r in self.server.requests]
+
+    def test_iter_stations(self):
+        with ApiFacade() as facade:
+            self.assertEqual(list(facade.iter_stations(page_size=5, prefetch=2, order='votes')), STATIONS)
+        params = sorted((r['params'] for r in self.server.requests), key=lambda p: int(p['offset']))
+        self.assertEqual(params[0], {'order': 'votes', 'reverse': 'False', 'offset': '0', 'limit': '5'})
+        self.assertEqual([int(p['offset']) for p in params][:5], [0, 5, 10, 15, 20])
+
+    def test_offset_and_limit(self):
+        with ApiFacade() as facade:
+            self.assertEqual(list(facade.iter_search(name='station', page_size=4, offset=3, limit=6)), STATIONS[3:9])
+
+    def test_prefetch_stops_at_limit(self):
+        with ApiFacade() as facade:
+            self.assertEqual(list(facade.iter_stations(page_size=4, prefetch=5, offset=3, limit=6)), STATIONS[3:9])
+        self.assertEqual(sorted(int(r['params']['offset']) for r in self.server.requests), [3, 7])
+
+    def test_retry_timed_out_page(self):
+        self.stations.slow_offsets = {10}
+        with ApiFacade(timeout=0.2) as facade:
+            self.assertEqual(list(facade.iter_stations(page_size=5, prefetch=0)), STATIONS)
+        self.assertEqual(self._offsets(), ['0', '5', '10', '10', '15', '20'])
+
+    def test_error_page_is_not_retried(self):
+        self.stations.fail_offsets = {10}
+        with ApiFacade() as facade:
+            with self.assertRaises(ValueError):
+                list(facade.iter_stations(page_size=5, prefetch=0))
+        self.assertEqual(self._offsets(), ['0', '5', '10'])
+
+    def test_scheduler_retries_failed_page(self):
+        self.stations.fail_offsets = {10}
+        with ApiFacade(scheduler=RequestScheduler(backoff=0)) as facade:
+            self.assertEqual(list(facade.iter_stations(page_size=5, prefetch=0, retries=5)), STATIONS)
+        self.assertEqual(self._offsets(), ['0', '5', '10', '10', '15', '20'])
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async(self):
+        async def main():
+            async with AsyncApiFacade() as facade:
+                return [station async for station in facade.iter_stations(page_size=5)]
+
+        self.assertEqual(asyncio.run(main()), STATIONS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from urllib.parse import urlsplit, parse_qsl
+
+from ..apifacade import ApiFacade
+from ..pipeline import ColumnarSink, CsvSink, JsonlSink, PagedJob, PerItemJob, Pipeline, SingleJob
+from ..snapshot import Snapshot
+from .fakeserver import FakeWebservice
+
+STATIONS = [{'stationuuid': 'uuid-%02d' % i, 'name': 'Radio %d' % i, 'votes': i} for i in range(23)]
+CHECKS = [{'stationuuid': 'uuid-00', 'ok': 1, 'bitrate': 128}]
+
+
+def upper_name(station):
+    if station['votes'] == 5:
+        return None
+    return dict(station, name=station['name'].upper())
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.failing = set()
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeWebservice({
+            '/json/stations/': self._stations,
+            '/json/checks/': (200, {'Content-Type': 'application/json'}, json.dumps(CHECKS)),
+        }).start()
+        for station in STATIONS:
+            self.server.routes['/json/stations/changed/' + station['stationuuid']] = self._changes
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+        shutil.rmtree(self.directory)
+
+    def _stations(self, handler):
+        params = dict(parse_qsl(urlsplit(handler.path).query))
+        offset, limit = int(params['offset']), int(params['limit'])
+        if offset in self.failing:
+            return 200, {'Content-Type': 'application/json'}, '[{"broken'
+        return 200, {'Content-Type': 'application/json'}, json.dumps(STATIONS[offset:offset + limit])
+
+    def _changes(self, handler):
+        uuid = urlsplit(handler.path).path.rsplit('/', 1)[-1]
+        return 200, {'Content-Type': 'application/json'}, json.dumps([{'stationuuid': uuid, 'changeuuid': 'c'}])
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _pipeline(self, sinks=None, **kwargs):
+        jobs = [PagedJob('stations', 'stations', page_size=5, prefetch=2), SingleJob('checks', 'checks'),
+                PerItemJob('changes', 'changed_stations', source='stations')]
+        if sinks is None:
+            sinks = dict((stream, JsonlSink(self._path(stream + '.jsonl')))
+                         for stream in ('stations', 'checks', 'changes'))
+        facade = ApiFacade(pool_size=4)
+        self.addCleanup(facade.close)
+        return Pipeline(facade, jobs, sinks, fetch_workers=4, **kwargs)
+
+    def _read(self, name):
+        with open(self._path(name)) as f:
+            return [json.loads(line) for line in f]
+
+    def test_export(self):
+        reports = []
+        stats = self._pipeline(decode_workers=0, report=reports.append).run()
+        self.assertEqual(sorted(s['stationuuid'] for s in self._read('stations.jsonl')),
+                         [s['stationuuid'] for s in STATIONS])
+        self.assertEqual(self._read('checks.jsonl'), CHECKS)
+        self.assertEqual(len(self._read('changes.jsonl')), len(STATIONS))
+        self.assertEqual(stats.streams, {'stations': 23, 'checks': 1, 'changes': 23})
+        self.assertEqual(stats.tasks, 6 + 1 + 23)
+        self.assertIs(reports[-1], stats)
+        self.assertGreater(stats.rates()['records'], 0)
+
+    def test_process_pool_and_transform(self):
+        self._pipeline(decode_workers=2, transforms={'stations': upper_name}).run()
+        stations = self._read('stations.jsonl')
+        self.assertEqual(len(stations), 22)
+        self.assertIn('RADIO 1', [s['name'] for s in stations])
+        # dropped records start no per item calls
+        self.assertNotIn('uuid-05', [c['stationuuid'] for c in self._read('changes.jsonl')])
+
+    def test_resume(self):
+        checkpoint = self._path('export.checkpoint')
+        self.failing.add(10)
+        self.assertRaises(ValueError, self._pipeline(decode_workers=0, checkpoint=checkpoint).run)
+        first_run = len(self.server.requests)
+
+        self.failing.clear()
+        stats = self._pipeline(decode_workers=0, checkpoint=checkpoint).run()
+        self.assertGreater(stats.skipped, 0)
+        self.assertEqual(stats.skipped + stats.tasks, 6 + 1 + 23)
+        self.assertLess(len(self.server.requests) - first_run, 6 + 1 + 23)
+        uuids = sorted(s['stationuuid'] for s in self._read('stations.jsonl'))
+        self.assertEqual(uuids, [s['stationuuid'] for s in STATIONS])
+        self.assertEqual(sorted(c['stationuuid'] for c in self._read('changes.jsonl')), uuids)
+
+        # a finished export is not fetched again
+        requests = len(self.server.requests)
+        self._pipeline(decode_workers=0, checkpoint=checkpoint).run()
+        self.assertEqual(len(self.server.requests), requests)
+        self.assertEqual(len(self._read('stations.jsonl')), len(STATIONS))
+
+    def test_csv_and_columnar_sinks(self):
+        sinks = {'stations': CsvSink(self._path('stations.csv'), ['stationuuid', 'name']),
+                 'checks': ColumnarSink(self._path('checks')), 'changes': JsonlSink(self._path('changes.jsonl'))}
+        self._pipeline(sinks, decode_workers=0).run()
+        with open(self._path('stations.csv')) as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), len(STATIONS))
+        self.assertEqual(set(rows[0]), {'stationuuid', 'name'})
+        with Snapshot(os.path.join(self._path('checks'), 'checks.snap')) as snapshot:
+            self.assertEqual(snapshot.get('uuid-00')['bitrate'], 128)
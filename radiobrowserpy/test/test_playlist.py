@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade
+from ..playlist import M3uParser, PlsParser, XspfParser, TtlParser, parse
+from .fakeserver import FakeWebservice
+
+M3U = b'#EXTM3U\n#EXTINF:-1 tvg-logo="http://a.example/logo.png",Radio A\r\nhttp://a.example/stream\n\n' \
+      b'http://b.example\n'
+PLS = b'[playlist]\nNumberOfEntries=2\nFile1=http://a.example\nTitle1=A\nLength1=-1\nFile2=http://b.example\n' \
+      b'Title2=B\nVersion=2\n'
+XSPF = b'<?xml version="1.0" encoding="UTF-8"?><playlist version="1" xmlns="http://xspf.org/ns/0/"><trackList>' \
+       b'<track><title>A</title><location>http://a.example</location><image>http://a.example/logo.png</image>' \
+       b'</track><track><title>B</title><location>http://b.example</location></track></trackList></playlist>'
+TTL = u'''@prefix schema: <http://schema.org/> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+<http://www.radio-browser.info/station/a> a schema:RadioStation ;
+    schema:name "Radio \\"München\\"" ;
+    schema:url <http://a.example> ;
+    schema:bitrate "128"^^xsd:integer ;
+    schema:keywords "pop", "rock" .
+'''.encode('utf-8')
+
+
+def _byte_by_byte(parser, data):
+    items = []
+    for i in range(len(data)):
+        items.extend(parser.feed(data[i:i + 1]))
+    return items + parser.close()
+
+
+class TestPlaylistParsers(unittest.TestCase):
+
+    def test_m3u(self):
+        stations = parse(M3uParser(), M3U)
+        self.assertEqual(stations, [{'name': 'Radio A', 'url': 'http://a.example/stream',
+                                     'favicon': 'http://a.example/logo.png'}, {'url': 'http://b.example'}])
+        self.assertEqual(_byte_by_byte(M3uParser(), M3U), stations)
+
+    def test_pls(self):
+        parser = PlsParser()
+        split = PLS.index(b'Title2')
+        self.assertEqual(parser.feed(PLS[:split]), [{'url': 'http://a.example', 'name': 'A', 'duration': '-1'}])
+        self.assertEqual(parser.feed(PLS[split:]) + parser.close(), [{'url': 'http://b.example', 'name': 'B'}])
+
+    def test_xspf(self):
+        stations = _byte_by_byte(XspfParser(), XSPF)
+        self.assertEqual(stations, [{'name': 'A', 'url': 'http://a.example', 'favicon': 'http://a.example/logo.png'},
+                                    {'name': 'B', 'url': 'http://b.example'}])
+
+    def test_ttl(self):
+        stations = parse(TtlParser(), TTL)
+        self.assertEqual(stations, [{'@id': 'http://www.radio-browser.info/station/a', 'type': 'schema:RadioStation',
+                                     'name': u'Radio "München"', 'url': 'http://a.example', 'bitrate': '128',
+                                     'keywords': ['pop', 'rock']}])
+        self.assertEqual(_byte_by_byte(TtlParser(), TTL), stations)
+        self.assertRaises(ValueError, parse, TtlParser(), b'<http://a> schema:name "x"')
+
+
+class TestPlaylistEncoding(unittest.TestCase):
+
+    def test_search_formats(self):
+        with FakeWebservice({
+            '/m3u/stations/bytag/pop': (200, {'Content-Type': 'audio/mpegurl'}, M3U),
+            '/v2/pls/url/a': (200, {'Content-Type': 'audio/x-scpls'}, PLS),
+        }) as server, mock.patch('radiobrowserpy.api.BASEURL', server.url):
+            with ApiFacade(search_format='m3u', encoding=True) as facade:
+                self.assertEqual(facade.stations_bytag('pop')[0]['name'], 'Radio A')
+                self.assertEqual([s['url'] for s in facade.stations_bytag('pop', stream=True)],
+                                 ['http://a.example/stream', 'http://b.example'])
+                facade.set_playable_format('pls')
+                self.assertEqual(facade.playable_url('a')[1]['name'], 'B')
+
+
+if __name__ == '__main__':
+    unittest.main()
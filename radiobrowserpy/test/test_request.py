@@ -0,0 +1,73 @@
+import json
+import unittest
+
+from ..apifacade import ApiFacade
+from ..jsonbackend import load_backend
+from ..request import RadioBrowserRequest
+from .fakeserver import FakeWebservice
+
+COUNTRIES = [{'name': 'Germany', 'value': 'Germany', 'stationcount': 2}]
+
+
+class TestPooledSession(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/countries': (200, {'Content-Type': 'application/json'}, json.dumps(COUNTRIES)),
+        }).start()
+        self.url = self.server.url + 'json/countries'
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_sends_user_agent(self):
+        with RadioBrowserRequest('myapp', '1.2', headers={'x-extra': 'yes'}) as radiorequest:
+            self.assertEqual(radiorequest(self.url, 'json', encoding=True), COUNTRIES)
+        headers = self.server.requests[0]['headers']
+        self.assertEqual(headers['user-agent'], 'myapp/1.2')
+        self.assertEqual(headers['x-extra'], 'yes')
+
+    def test_reuses_connection(self):
+        with RadioBrowserRequest('myapp', '1.2') as radiorequest:
+            radiorequest(self.url)
+            radiorequest(self.url)
+        clients = [r['client'] for r in self.server.requests]
+        self.assertEqual(clients[0], clients[1])
+
+    def test_no_keep_alive(self):
+        with RadioBrowserRequest('myapp', '1.2', keep_alive=False) as radiorequest:
+            radiorequest(self.url)
+            radiorequest(self.url)
+        clients = [r['client'] for r in self.server.requests]
+        self.assertNotEqual(clients[0], clients[1])
+
+    def test_facade_shares_session(self):
+        with ApiFacade(pool_size=4, timeout=5) as facade:
+            radiorequest = facade._radio_api.radiorequest
+            self.assertIs(radiorequest, facade._play_api.radiorequest)
+            self.assertIs(radiorequest, facade._search_api.radiorequest)
+            self.assertEqual(radiorequest.timeout, 5)
+
+
+class TestJsonBackend(unittest.TestCase):
+
+    def test_load_backend(self):
+        self.assertEqual(load_backend('json'), ('json', json.loads))
+        self.assertIn(load_backend()[0], ('orjson', 'ujson', 'json'))
+        self.assertRaises(ValueError, load_backend, 'yaml')
+
+    def test_custom_backend_gets_bytes(self):
+        received = []
+
+        def loads(data):
+            received.append(data)
+            return json.loads(data)
+
+        with FakeWebservice({'/json/countries': (200, {}, json.dumps(COUNTRIES))}) as server:
+            with RadioBrowserRequest('myapp', '1.2', json_backend=loads) as radiorequest:
+                self.assertEqual(radiorequest(server.url + 'json/countries', 'json', encoding=True), COUNTRIES)
+        self.assertIsInstance(received[0], bytes)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade
+from ..index import StationIndex
+from ..resolver import PlayableUrlResolver, playlist_kind, service_url
+from .fakeserver import FakeWebservice
+
+PLS = '[playlist]\nNumberOfEntries=2\nFile1=http://stream.example.com/pls\nFile2=http://backup.example.com/\n'
+M3U = '#EXTM3U\n#EXTINF:-1,Radio\nhttp://stream.example.com/m3u\n'
+XSPF = ('<?xml version="1.0"?><playlist xmlns="http://xspf.org/ns/0/"><trackList><track>'
+        '<location>http://stream.example.com/xspf</location></track></trackList></playlist>')
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestPlayableUrlResolver(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/lists/a.pls': (200, {'Content-Type': 'audio/x-scpls'}, PLS),
+            '/lists/b.m3u': (200, {'Content-Type': 'audio/x-mpegurl'}, M3U),
+            '/lists/c.xspf': (200, {'Content-Type': 'application/xspf+xml'}, XSPF),
+            '/lists/nested.m3u': (200, {}, '/lists/a.pls\n'),
+            '/lists/stream.m3u': (200, {'Content-Type': 'audio/mpeg'}, b'\xff\xfb' * 100),
+            '/lists/moved.m3u': (302, {'Location': '/other/relative.m3u'}, ''),
+            '/other/relative.m3u': (200, {'Content-Type': 'text/plain'}, 'live/stream.mp3\n'),
+            '/lists/error.pls': (200, {'Content-Type': 'text/html'}, '<html>File1=http://stream.example.com/html'),
+            '/lists/local.m3u': (200, {'Content-Type': 'audio/x-mpegurl'}, 'file:///etc/passwd\n'),
+            '/v2/json/url/a': lambda handler: self._playable(),
+            '/v2/json/url/gone': (200, {'Content-Type': 'application/json'},
+                                  json.dumps({'ok': 'false', 'message': 'station not found'})),
+        }).start()
+        self.calls = 0
+        self.clicked = threading.Event()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.facade = ApiFacade(pool_size=16)
+        self.clock = Clock()
+        self.resolver = PlayableUrlResolver(self.facade, ttl=60, clock=self.clock)
+
+    def tearDown(self):
+        self.resolver.close()
+        self.facade.close()
+        self.server.stop()
+
+    def _playable(self):
+        self.calls += 1
+        # lets concurrent resolutions of the station pile up
+        time.sleep(0.05)
+        body = {'ok': 'true', 'stationuuid': 'a', 'url': 'http://stream.example.com/service'}
+        return 200, {'Content-Type': 'application/json'}, json.dumps(body)
+
+    def _service_requests(self):
+        return [r for r in self.server.requests if r['path'].startswith('/v2/')]
+
+    def test_service_resolution_is_cached(self):
+        self.assertEqual(self.resolver.resolve('a'), 'http://stream.example.com/service')
+        self.assertEqual(self.resolver.resolve('a'), 'http://stream.example.com/service')
+        self.assertEqual(self.calls, 1)
+        self.clock.now += 61
+        self.resolver.resolve('a')
+        self.assertEqual(self.calls, 2)
+        self.assertIsNone(self.resolver.resolve('gone'))
+        self.assertEqual(self.resolver.stats, {'cache': 1, 'station': 0, 'playlist': 0, 'service': 2, 'failed': 1})
+
+    def test_station_records_resolve_locally(self):
+        url = self.server.url + 'lists/'
+        stations = [
+            {'stationuuid': '1', 'url': url + 'a.pls', 'url_resolved': 'http://stream.example.com/resolved'},
+            {'stationuuid': '2', 'url': 'http://stream.example.com/direct', 'url_resolved': ''},
+            {'stationuuid': '3', 'url': url + 'a.pls', 'url_resolved': ''},
+            {'stationuuid': '4', 'url': url + 'b.m3u'},
+            {'stationuuid': '5', 'url': url + 'c.xspf'},
+            {'stationuuid': '6', 'url': url + 'nested.m3u'},
+            {'stationuuid': '7', 'url': url + 'stream.m3u'},
+        ]
+        self.assertEqual([self.resolver.resolve(station) for station in stations], [
+            'http://stream.example.com/resolved', 'http://stream.example.com/direct', 'http://stream.example.com/pls',
+            'http://stream.example.com/m3u', 'http://stream.example.com/xspf', 'http://stream.example.com/pls',
+            url + 'stream.m3u'])
+        self.assertEqual(self._service_requests(), [])
+        self.assertEqual((self.resolver.stats['station'], self.resolver.stats['playlist']), (2, 5))
+        self.assertEqual(self.server.requests[0]['headers']['user-agent'], 'radiobrowserpy/0.0.1')
+
+    def test_broken_playlist_falls_back_to_service(self):
+        station = {'stationuuid': 'a', 'url': self.server.url + 'lists/missing.pls'}
+        self.assertEqual(self.resolver.resolve(station), 'http://stream.example.com/service')
+        self.assertEqual(self.resolver.stats['service'], 1)
+
+    def test_invalid_playlists_fall_back_to_service(self):
+        for name in ('error.pls', 'local.m3u'):
+            self.resolver.clear()
+            station = {'stationuuid': 'a', 'url': self.server.url + 'lists/' + name}
+            self.assertEqual(self.resolver.resolve(station), 'http://stream.example.com/service')
+        self.assertEqual(self.resolver.stats['service'], 2)
+
+    def test_relative_entries_follow_redirects(self):
+        station = {'stationuuid': '1', 'url': self.server.url + 'lists/moved.m3u'}
+        self.assertEqual(self.resolver.resolve(station), self.server.url + 'other/live/stream.mp3')
+
+    def test_lastchangetime_invalidates(self):
+        station = {'stationuuid': '1', 'url': 'http://old.example.com/', 'lastchangetime': '2019-01-01 10:00:00'}
+        self.assertEqual(self.resolver.resolve(station), 'http://old.example.com/')
+        self.assertEqual(self.resolver.resolve('1'), 'http://old.example.com/')
+        changed = dict(station, url='http://new.example.com/', lastchangetime='2019-02-01 10:00:00')
+        self.assertEqual(self.resolver.resolve(changed), 'http://new.example.com/')
+
+        self.resolver.update([dict(changed, lastchangetime='2019-03-01 10:00:00')])
+        self.assertIsNone(self.resolver.backend.get('1'))
+
+    def test_index_lookup(self):
+        index = StationIndex()
+        index.add({'stationuuid': 'a', 'name': 'A', 'url': 'http://stream.example.com/indexed'})
+        resolver = PlayableUrlResolver(self.facade, index=index)
+        self.assertEqual(resolver.resolve('a'), 'http://stream.example.com/indexed')
+        self.assertEqual(self.calls, 0)
+
+    def test_resolve_many(self):
+        stations = ['a'] * 10 + [{'stationuuid': '2', 'url': 'http://stream.example.com/direct'}, 'gone']
+        results = self.resolver.resolve_many(stations, max_workers=12)
+        self.assertEqual(results, ['http://stream.example.com/service'] * 10 + ['http://stream.example.com/direct',
+                                                                               None])
+        # concurrent resolutions of one station share the request
+        self.assertLess(self.calls, 10)
+
+
+class TestHelpers(unittest.TestCase):
+
+    def test_playlist_kind(self):
+        self.assertEqual(playlist_kind('http://example.com/listen.PLS?sid=1'), 'pls')
+        self.assertEqual(playlist_kind('http://example.com/live.m3u'), 'm3u')
+        self.assertIsNone(playlist_kind('http://example.com/live.m3u8'))
+        self.assertIsNone(playlist_kind('http://example.com/live'))
+
+    def test_service_url(self):
+        self.assertEqual(service_url({'ok': 'true', 'url': 'http://a/'}), 'http://a/')
+        self.assertIsNone(service_url({'ok': 'false', 'url': ''}))
+        self.assertEqual(service_url([{'name': 'A', 'url': 'http://a/'}]), 'http://a/')
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from ..apifacade import ApiFacade, AsyncApiFacade
+from ..asyncrequest import aiohttp
+from ..scheduler import RequestScheduler, TokenBucket
+from .fakeserver import FakeWebservice
+
+
+class _Flaky(object):
+    def __init__(self, failures, status=503, headers=None):
+        self.failures = failures
+        self.status = status
+        self.headers = headers or {}
+
+    def __call__(self, handler):
+        if self.failures:
+            self.failures -= 1
+            return self.status, self.headers, b'busy'
+        return 200, {'Content-Type': 'application/json'}, json.dumps([{'name': 'Germany'}])
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_reserve(self):
+        now = [0.0]
+        bucket = TokenBucket(2, capacity=2, clock=lambda: now[0])
+        self.assertEqual([bucket.reserve(), bucket.reserve()], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.reserve(), 0.5)
+        now[0] = 1.5
+        self.assertEqual(bucket.reserve(), 0.0)
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.sleeps = []
+        self.scheduler = RequestScheduler(rates={'search': (1, 1)}, retries=2, backoff=0.1, jitter=False,
+                                          sleep=self.sleeps.append)
+
+    def _facade(self, route):
+        server = FakeWebservice({'/json/countries/': route}).start()
+        self.addCleanup(server.stop)
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        facade = ApiFacade(encoding=True, scheduler=self.scheduler)
+        self.addCleanup(facade.close)
+        return server, facade
+
+    def test_retry_with_backoff(self):
+        server, facade = self._facade(_Flaky(2))
+        self.assertEqual(facade.countries(), [{'name': 'Germany'}])
+        self.assertEqual(len(server.requests), 3)
+        self.assertEqual(self.sleeps, [0.1, 0.2])
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async_stream_retry(self):
+        server, _ = self._facade(_Flaky(1))
+
+        async def main():
+            async with AsyncApiFacade(encoding=True, scheduler=self.scheduler) as facade:
+                return [country async for country in facade.countries(stream=True)]
+
+        self.assertEqual(asyncio.run(main()), [{'name': 'Germany'}])
+        self.assertEqual(len(server.requests), 2)
+
+    def test_retry_after(self):
+        server, facade = self._facade(_Flaky(1, 429, {'Retry-After': '3'}))
+        facade.countries()
+        self.assertEqual(self.sleeps, [3.0])
+
+    def test_gives_up(self):
+        server, facade = self._facade(_Flaky(5))
+        self.assertEqual(facade.countries(encoding=False), 'busy')
+        self.assertEqual(len(server.requests), 3)
+
+    def test_connection_errors(self):
+        attempts = []
+
+        def send():
+            attempts.append(1)
+            raise requests.exceptions.ConnectionError()
+
+        self.assertRaises(requests.exceptions.ConnectionError, self.scheduler.call, 'radio', send,
+                          (requests.exceptions.ConnectionError,))
+        self.assertEqual(len(attempts), 3)
+
+    def test_mutating_endpoints_are_not_retried(self):
+        server = FakeWebservice({'/json/vote/a': _Flaky(5)}).start()
+        self.addCleanup(server.stop)
+        with mock.patch('radiobrowserpy.api.BASEURL', server.url):
+            facade = ApiFacade(scheduler=self.scheduler)
+        self.addCleanup(facade.close)
+        self.assertEqual(facade.vote_for_station('a'), 'busy')
+        self.assertEqual(len(server.requests), 1)
+
+    def test_mutating_endpoints_retry_connect_errors(self):
+        attempts = []
+
+        def send(error):
+            attempts.append(1)
+            raise error()
+
+        for error, expected in ((requests.exceptions.ReadTimeout, 1), (requests.exceptions.ConnectTimeout, 3)):
+            del attempts[:]
+            self.assertRaises(error, self.scheduler.call, 'radio', lambda: send(error),
+                              (requests.exceptions.Timeout,), 'add_station', (requests.exceptions.ConnectTimeout,))
+            self.assertEqual(len(attempts), expected)
+
+    def test_rate_per_family(self):
+        response = mock.Mock(status_code=200)
+        for _ in range(3):
+            self.scheduler.call('search', lambda: response)
+            self.scheduler.call('radio', lambda: response)
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertGreater(self.sleeps[-1], 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
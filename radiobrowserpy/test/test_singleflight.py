@@ -0,0 +1,94 @@
+import asyncio
+import json
+import threading
+import time
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade, AsyncApiFacade
+from ..asyncrequest import aiohttp
+from ..instrumentation import Instrumentation
+from ..singleflight import SingleFlight
+from .fakeserver import FakeWebservice
+
+COUNTRIES = [{'name': 'Germany'}]
+
+
+class TestSingleFlight(unittest.TestCase):
+
+    def test_error_shared(self):
+        group = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        errors = []
+
+        def fail():
+            started.set()
+            release.wait()
+            raise ValueError('boom')
+
+        def follower():
+            try:
+                group.do('key', lambda: 'not called')
+            except ValueError as e:
+                errors.append(e)
+
+        leader = threading.Thread(target=lambda: self.assertRaises(ValueError, group.do, 'key', fail))
+        leader.start()
+        started.wait()
+        thread = threading.Thread(target=follower)
+        thread.start()
+        time.sleep(0.1)
+        release.set()
+        leader.join()
+        thread.join()
+        self.assertEqual(len(errors), 1)
+        self.assertEqual(group.do('key', lambda: 'again'), 'again')
+
+
+class TestCoalescedRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/countries/': (200, {'Content-Type': 'application/json'}, json.dumps(COUNTRIES)),
+            '/json/vote/a': (200, {'Content-Type': 'application/json'}, '{"ok": true}'),
+        }, latency=0.2).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_threads_share_request(self):
+        with ApiFacade(encoding=True, coalesce=True) as facade:
+            results = facade.batch(['countries'] * 8 + [('countries', [], {'reverse': True})], max_workers=9)
+        self.assertEqual(results, [COUNTRIES] * 9)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_coalesced_events(self):
+        events = []
+        with ApiFacade(encoding=True, coalesce=True, instrumentation=Instrumentation(post_hooks=[events.append])) \
+                as facade:
+            facade.batch(['countries'] * 4, max_workers=4)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(sorted(event.coalesced for event in events), [False, True, True, True])
+        self.assertEqual([event.status for event in events], [200] * 4)
+
+    def test_mutating_endpoints_are_not_coalesced(self):
+        with ApiFacade(encoding=True, coalesce=True) as facade:
+            facade.batch([('vote_for_station', ['a'])] * 4, max_workers=4)
+        self.assertEqual(len(self.server.requests), 4)
+
+    @unittest.skipIf(aiohttp is None, 'aiohttp is not installed')
+    def test_async_tasks_share_request(self):
+        async def main():
+            async with AsyncApiFacade(encoding=True, coalesce=True) as facade:
+                return await asyncio.gather(*[facade.countries() for _ in range(8)])
+
+        self.assertEqual(asyncio.run(main()), [COUNTRIES] * 8)
+        self.assertEqual(len(self.server.requests), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
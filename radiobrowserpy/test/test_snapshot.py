@@ -0,0 +1,56 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from ..snapshot import Snapshot, write_snapshot
+from ..table import StationTable
+
+STATIONS = [
+    {'stationuuid': 'c', 'name': u'Radio München', 'bitrate': '128', 'votes': '3', 'tags': 'pop'},
+    {'stationuuid': 'a', 'name': 'Jazz FM', 'bitrate': '64', 'votes': '-1'},
+    {'stationuuid': 'b', 'name': '', 'bitrate': '320', 'votes': '0', 'tags': 'jazz,rock'},
+]
+
+
+class TestSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'stations.snap')
+
+    def test_roundtrip(self):
+        write_snapshot(STATIONS, self.path)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(snapshot[0]['name'], u'Radio München')
+            self.assertEqual(snapshot[1]['tags'], '')
+            self.assertEqual(snapshot.column('bitrate'), [128, 64, 320])
+            self.assertEqual(snapshot.column('votes'), [3, -1, 0])
+            for station in STATIONS:
+                self.assertEqual(snapshot.get(station['stationuuid'])['name'], station['name'])
+            self.assertIsNone(snapshot.get('d'))
+
+    def test_from_table(self):
+        write_snapshot(StationTable(STATIONS), self.path)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual([s['stationuuid'] for s in snapshot], ['c', 'a', 'b'])
+
+    def test_invalid_file(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'x' * 64)
+        self.assertRaises(ValueError, Snapshot, self.path)
+
+    def test_truncated_file(self):
+        write_snapshot(STATIONS, self.path)
+        with open(self.path, 'rb') as f:
+            data = f.read()
+        for size in (0, 10, 30, 100, len(data) - 1):
+            with open(self.path, 'wb') as f:
+                f.write(data[:size])
+            self.assertRaises(ValueError, Snapshot, self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,23 @@
+import unittest
+
+import radiobrowserpy
+from .startup import measure
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_package_loads_no_dependencies(self):
+        self.assertEqual(measure('import radiobrowserpy', repeat=1)['heavy'], [])
+
+    def test_facade_loads_requests_on_use(self):
+        self.assertEqual(measure('from radiobrowserpy import ApiFacade, AsyncApiFacade', repeat=1)['heavy'], [])
+        self.assertEqual(measure('from radiobrowserpy import ApiFacade; ApiFacade()', repeat=1)['heavy'],
+                         ['requests'])
+
+    def test_exports(self):
+        from ..index import StationIndex
+        self.assertIs(radiobrowserpy.StationIndex, StationIndex)
+        self.assertIn('ApiFacade', dir(radiobrowserpy))
+        for name in radiobrowserpy.__all__:
+            self.assertTrue(hasattr(radiobrowserpy, name), name)
+        self.assertRaises(AttributeError, getattr, radiobrowserpy, 'missing')
@@ -0,0 +1,124 @@
+import json
+import unittest
+from unittest import mock
+
+import requests
+
+from ..apifacade import ApiFacade
+from ..streaming import JsonArrayParser, XmlElementParser, iter_json, iter_xml
+from .fakeserver import FakeWebservice
+
+STATIONS = [{'name': u'Radio München', 'bitrate': 128, 'tags': 'pop,rock'},
+            {'name': 'Jazz FM', 'bitrate': 64, 'tags': '[jazz]'},
+            {'name': 'Empty', 'bitrate': 0, 'tags': ''}]
+
+
+class TestJsonArrayParser(unittest.TestCase):
+
+    def test_byte_by_byte(self):
+        body = json.dumps(STATIONS, ensure_ascii=False, indent=1).encode('utf-8')
+        self.assertEqual(list(iter_json(body[i:i + 1] for i in range(len(body)))), STATIONS)
+
+    def test_numbers_across_chunks(self):
+        self.assertEqual(list(iter_json([b'[12', b'34, 5', b']'])), [1234, 5])
+
+    def test_scalars_byte_by_byte(self):
+        for body, expected in ((b'[3.5]', [3.5]), (b'[1e5, 2]', [1e5, 2]),
+                               (b'[-0.25E-2 ,true,null,"a"]', [-0.0025, True, None, 'a'])):
+            self.assertEqual(list(iter_json(body[i:i + 1] for i in range(len(body)))), expected)
+
+    def test_missing_separator(self):
+        parser = JsonArrayParser()
+        self.assertRaises(ValueError, parser.feed, b'[{"a": 1} {"b": 2}]')
+
+    def test_not_an_array(self):
+        self.assertEqual(list(iter_json([b'{"stations": ', b'5}'])), [{'stations': 5}])
+
+    def test_incomplete(self):
+        parser = JsonArrayParser()
+        parser.feed(b'[{"a": 1}, {"b"')
+        self.assertRaises(ValueError, parser.close)
+
+
+STATIONS_XML = (u'<result><station name="Radio München" bitrate="128"/>'
+                u'<station name="Jazz FM" bitrate="64"><tags>jazz</tags></station></result>').encode('utf-8')
+
+
+class TestXmlElementParser(unittest.TestCase):
+
+    def test_byte_by_byte(self):
+        elements = list(iter_xml(STATIONS_XML[i:i + 1] for i in range(len(STATIONS_XML))))
+        self.assertEqual([e.get('name') for e in elements], [u'Radio München', 'Jazz FM'])
+        self.assertEqual(elements[1].find('tags').text, 'jazz')
+
+    def test_as_dict_and_memory(self):
+        parser = XmlElementParser(as_dict=True)
+        items = parser.feed(STATIONS_XML[:60])
+        self.assertEqual(items, [{'name': u'Radio München', 'bitrate': '128'}])
+        self.assertEqual(len(parser._root), 0)
+        items = parser.feed(STATIONS_XML[60:]) + parser.close()
+        self.assertEqual(items, [{'name': 'Jazz FM', 'bitrate': '64', 'tags': 'jazz'}])
+
+
+class TestStreamingRequests(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/stations/': (200, {'Content-Type': 'application/json'}, json.dumps(STATIONS)),
+            '/xml/stations/': (200, {'Content-Type': 'text/xml'}, STATIONS_XML),
+        }).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_stream_stations(self):
+        with ApiFacade(encoding=True) as facade:
+            stations = facade.stations(stream=True)
+            self.assertEqual(next(stations), STATIONS[0])
+            self.assertEqual(list(stations), STATIONS[1:])
+        self.assertEqual(self.server.requests[0]['params']['limit'], '1000000')
+
+    def test_stream_plain(self):
+        with ApiFacade() as facade:
+            self.assertEqual(json.loads(''.join(facade.stations(stream=True))), STATIONS)
+
+    def test_stream_xml(self):
+        with ApiFacade(output_format='xml', encoding=True) as facade:
+            self.assertEqual([e.get('bitrate') for e in facade.stations(stream=True)], ['128', '64'])
+            self.assertEqual(list(facade.stations(stream='dict'))[1]['tags'], 'jazz')
+
+    def _track_close(self):
+        closed = []
+        close = requests.Response.close
+
+        def track(response):
+            closed.append(response.status_code)
+            close(response)
+
+        patcher = mock.patch.object(requests.Response, 'close', track)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return closed
+
+    def test_stream_error_status(self):
+        closed = self._track_close()
+        with ApiFacade(encoding=True) as facade:
+            with self.assertRaises(requests.HTTPError) as context:
+                facade.countries(stream=True)
+        self.assertEqual(context.exception.response.status_code, 404)
+        self.assertIn(404, closed)
+
+    def test_unconsumed_stream_is_closed(self):
+        closed = self._track_close()
+        with ApiFacade(encoding=True) as facade:
+            stations = facade.stations(stream=True)
+            self.assertEqual(closed, [])
+            del stations
+            self.assertEqual(closed, [200])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import json
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade
+from ..sync import StationSync, MAX_DELTA_AGE
+from .fakeserver import FakeWebservice
+
+
+def _json(data):
+    return 200, {'Content-Type': 'application/json'}, json.dumps(data)
+
+
+class TestStationSync(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeWebservice({
+            '/json/stations/': _json([
+                {'stationuuid': 'a', 'name': 'Alpha', 'lastchangetime': '2019-01-01 10:00:00'},
+                {'stationuuid': 'b', 'name': 'Beta', 'lastchangetime': '2019-01-01 10:00:00'},
+            ]),
+            '/json/stations/changed/': _json([
+                {'stationuuid': 'a', 'name': 'Alpha 1', 'lastchangetime': '2019-01-02 10:00:00'},
+                {'stationuuid': 'a', 'name': 'Alpha 2', 'lastchangetime': '2019-01-02 11:00:00'},
+                {'stationuuid': 'c', 'name': 'Gamma', 'lastchangetime': '2019-01-02 09:00:00'},
+            ]),
+            '/json/stations/deleted/': _json([
+                {'stationuuid': 'b', 'name': 'Beta', 'lastchangetime': '2019-01-02 12:00:00'},
+            ]),
+        }).start()
+        patcher = mock.patch('radiobrowserpy.api.BASEURL', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.facade = ApiFacade()
+        self.addCleanup(self.facade.close)
+        self.now = 1000000000
+        self.sync = StationSync(self.facade, clock=lambda: self.now, overlap=10)
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_full_then_delta(self):
+        self.assertEqual(self.sync.sync(), {'full': True, 'changed': 2, 'deleted': 0})
+        self.now += 300
+        self.assertEqual(self.sync.sync(), {'full': False, 'changed': 2, 'deleted': 1})
+        self.assertEqual(sorted(s['name'] for s in self.sync.index), ['Alpha 2', 'Gamma'])
+        changed = [r for r in self.server.requests if r['path'] == '/json/stations/changed/']
+        self.assertEqual(changed[0]['params']['seconds'], '310')
+
+    def test_reload_after_gap(self):
+        self.sync.sync()
+        self.now += MAX_DELTA_AGE
+        self.assertTrue(self.sync.sync()['full'])
+        reloads = [r for r in self.server.requests if r['path'] == '/json/stations/' and r['params']['offset'] == '0']
+        self.assertEqual(len(reloads), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import unittest
+from unittest import mock
+
+from ..apifacade import ApiFacade
+from ..table import StationTable
+from .fakeserver import FakeWebservice
+
+STATIONS = [
+    {'stationuuid': 'a', 'name': 'Jazz Radio', 'country': 'Germany', 'codec': 'MP3', 'bitrate': '128', 'votes': '3'},
+    {'stationuuid': 'b', 'name': 'Pop Radio', 'country': 'Germany', 'codec': 'AAC', 'bitrate': '64', 'votes': '5',
+     'homepage': 'http://pop.example'},
+]
+
+
+class TestStationTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = StationTable(STATIONS)
+
+    def test_rows(self):
+        self.assertEqual(len(self.table), 2)
+        self.assertEqual(self.table[0]['name'], 'Jazz Radio')
+        self.assertEqual(self.table[-1]['bitrate'], 64)
+        self.assertIsNone(self.table[0].get('homepage'))
+        self.assertEqual(self.table[1].to_dict()['homepage'], 'http://pop.example')
+        self.assertRaises(IndexError, self.table.__getitem__, 2)
+        self.assertFalse(hasattr(self.table[0], '__dict__'))
+
+    def test_columns(self):
+        self.assertEqual(self.table.column('votes'), [3, 5])
+        self.assertEqual(self.table.categories('country'), ['Germany'])
+        self.assertEqual([row['stationuuid'] for row in self.table.where('codec', 'AAC')], ['b'])
+
+
+class TestTableEncoding(unittest.TestCase):
+
+    def test_facade_table_encoding(self):
+        with FakeWebservice({
+            '/json/stations/': (200, {'Content-Type': 'application/json'}, json.dumps(STATIONS)),
+            '/xml/stations/': (200, {'Content-Type': 'text/xml'}, '<result><station name="X" bitrate="32"/></result>'),
+        }) as server, mock.patch('radiobrowserpy.api.BASEURL', server.url):
+            with ApiFacade(encoding='table') as facade:
+                table = facade.stations()
+                self.assertIsInstance(table, StationTable)
+                self.assertEqual(table.column('name'), ['Jazz Radio', 'Pop Radio'])
+                facade.set_output_format('xml')
+                self.assertEqual(facade.stations()[0]['bitrate'], 32)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,5 +7,7 @@ setup(
    author='chrismax',
    author_email='chrystler@web.de',
    packages=['radiobrowserpy'],
-   install_requires=['requests', 'future'],
+   python_requires='>=3.7',
+   install_requires=['requests'],
+   extras_require={'async': ['aiohttp'], 'fast': ['orjson']},
 )
\ No newline at end of file